@@ -0,0 +1,500 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Run NiFreeze over many subjects under a global budget of CPUs and memory."""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+import sys
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+from collections import deque
+from functools import partial
+from pathlib import Path
+from subprocess import Popen
+from time import sleep
+from timeit import default_timer as timer
+
+import attrs
+
+from nifreeze.utils.instrumentation import STEP_MODEL
+
+MANIFEST_COLUMNS = {
+    "brainmask": "--brainmask",
+    "gradient_file": "--gradient-file",
+    "b0_file": "--b0-file",
+}
+"""Optional columns of the manifest, and the corresponding options of ``nifreeze``."""
+
+THREAD_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "ITK_GLOBAL_DEFAULT_NUMBER_OF_THREADS",
+)
+"""Environment variables bounding the threads of the libraries used by a subject."""
+
+DEFAULT_SUBJECT_MEM_GB = 4.0
+"""Memory (GB) reserved for every subject unless otherwise requested."""
+
+MANIFEST_MISSING_INPUT_ERROR_MSG = "Manifest <{manifest}> lacks an 'input_file' column."
+"""Manifest without inputs error message."""
+
+MANIFEST_UNSUPPORTED_COLUMN_ERROR_MSG = (
+    "Manifest <{manifest}> sets the unsupported column '{column}' for <{input_file}>."
+)
+"""Manifest with values in a column that ``nifreeze`` cannot load error message."""
+
+UNSUPPORTED_COLUMNS = ("timing_file",)
+"""Columns of the manifest whose inputs ``nifreeze`` cannot load yet (e.g., PET timings)."""
+
+
+@attrs.define(frozen=True)
+class Subject:
+    """A row of the manifest."""
+
+    input_file: Path
+    """The 4D input (NIfTI or HDF5)."""
+    output_dir: Path
+    """Directory where the outputs, logs and events of the subject are written."""
+    options: tuple[str, ...] = ()
+    """Subject-specific options of ``nifreeze`` (e.g., ``--brainmask``)."""
+
+    @property
+    def name(self) -> str:
+        """Name of the subject (the input file name without extensions)."""
+        return self.input_file.name.split(".")[0]
+
+    @property
+    def events(self) -> Path:
+        """Instrumentation events of the subject (JSONL)."""
+        return self.output_dir / f"{self.name}_events.jsonl"
+
+
+@attrs.define(frozen=True)
+class Result:
+    """Outcome and throughput of a subject."""
+
+    subject: str
+    cores: int
+    returncode: int
+    elapsed: float
+    """Wall time, in seconds."""
+    volumes: int
+    """Number of volumes fitted and realigned (across all the estimators of the cascade)."""
+
+    @property
+    def throughput(self) -> float:
+        """Volumes processed per minute."""
+        return 60.0 * self.volumes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def read_manifest(manifest: Path | str, output_dir: Path | str) -> list[Subject]:
+    """
+    Read a manifest of subjects.
+
+    The manifest is a tab-separated file with a header. The ``input_file``
+    column is required; the optional ``brainmask``, ``gradient_file`` (one,
+    or two space-separated files), ``b0_file`` and ``output_dir`` columns
+    may be left empty. Relative paths are resolved from the location of
+    the manifest.
+
+    Parameters
+    ----------
+    manifest : :obj:`os.pathlike`
+        The manifest file.
+    output_dir : :obj:`os.pathlike`
+        Outputs of subjects without an ``output_dir`` are written into
+        a folder named after their input in this directory.
+
+    Returns
+    -------
+    :obj:`list` of :obj:`Subject`
+        The subjects, in the order of the manifest.
+
+    Raises
+    ------
+    :obj:`ValueError`
+        If the manifest lacks the ``input_file`` column, or a subject sets
+        any of the :data:`UNSUPPORTED_COLUMNS`.
+
+    """
+    manifest = Path(manifest)
+    root = manifest.parent
+
+    with manifest.open(newline="") as fobj:
+        reader = csv.DictReader(fobj, delimiter="\t")
+        if "input_file" not in (reader.fieldnames or ()):
+            raise ValueError(MANIFEST_MISSING_INPUT_ERROR_MSG.format(manifest=manifest))
+        rows = list(reader)
+
+    subjects = []
+    for row in rows:
+        input_file = root / row["input_file"]
+        for column in UNSUPPORTED_COLUMNS:
+            if (row.get(column) or "").strip():
+                raise ValueError(
+                    MANIFEST_UNSUPPORTED_COLUMN_ERROR_MSG.format(
+                        manifest=manifest, column=column, input_file=row["input_file"]
+                    )
+                )
+
+        options: list[str] = []
+        for column, flag in MANIFEST_COLUMNS.items():
+            if value := (row.get(column) or "").strip():
+                options += [flag, *(str(root / v) for v in value.split())]
+
+        sub_output = (row.get("output_dir") or "").strip()
+        subjects.append(
+            Subject(
+                input_file=input_file,
+                output_dir=(
+                    root / sub_output
+                    if sub_output
+                    else Path(output_dir) / input_file.name.split(".")[0]
+                ),
+                options=tuple(options),
+            )
+        )
+    return subjects
+
+
+def allocate(
+    free_cores: int,
+    free_mem: float,
+    pending: int,
+    min_cores: int = 1,
+    subject_mem: float = DEFAULT_SUBJECT_MEM_GB,
+) -> list[int]:
+    """
+    Decide how many subjects start now, and how many cores each gets.
+
+    As many subjects as the free cores (at ``min_cores`` each) and memory allow
+    are started, and the free cores are split evenly among them. Hence, subjects
+    get more cores when few remain in the queue (e.g., at the end of the batch).
+
+    Parameters
+    ----------
+    free_cores : :obj:`int`
+        Cores not assigned to running subjects.
+    free_mem : :obj:`float`
+        Memory (GB) not reserved by running subjects.
+    pending : :obj:`int`
+        Number of subjects waiting in the queue.
+    min_cores : :obj:`int`, optional
+        Minimum number of cores of a subject.
+    subject_mem : :obj:`float`, optional
+        Memory (GB) reserved for every subject.
+
+    Returns
+    -------
+    :obj:`list` of :obj:`int`
+        The cores of every subject to start.
+
+    Examples
+    --------
+    >>> allocate(free_cores=16, free_mem=64.0, pending=100, min_cores=4)
+    [4, 4, 4, 4]
+    >>> allocate(free_cores=16, free_mem=64.0, pending=3, min_cores=4)
+    [6, 5, 5]
+    >>> allocate(free_cores=16, free_mem=10.0, pending=100, min_cores=2, subject_mem=4.0)
+    [8, 8]
+
+    """
+    nstart = min(pending, free_cores // max(min_cores, 1))
+    if subject_mem > 0:
+        nstart = min(nstart, int(free_mem // subject_mem))
+    if nstart <= 0:
+        return []
+
+    cores, extra = divmod(free_cores, nstart)
+    return [cores + (i < extra) for i in range(nstart)]
+
+
+def _command(subject: Subject, cores: int, extra_args: list[str]) -> list[str]:
+    """
+    Command line running NiFreeze on one subject with the given number of cores.
+
+    Only the threads are bound to the cores: the number of model jobs is left to
+    the execution planner of the subject (unless set in ``extra_args``).
+
+    """
+    return [
+        sys.executable,
+        "-m",
+        "nifreeze.cli.run",
+        str(subject.input_file),
+        *subject.options,
+        *extra_args,
+        "--output-dir",
+        str(subject.output_dir),
+        "--nthreads",
+        str(cores),
+        "--instrumentation",
+        str(subject.events),
+    ]
+
+
+def _count_volumes(events: Path) -> int:
+    """Count the volumes fitted and realigned, as recorded by the instrumentation."""
+    if not events.exists():
+        return 0
+    lines = events.read_text().splitlines()
+    return sum(
+        1
+        for event in map(json.loads, filter(None, lines))
+        if event["step"] == STEP_MODEL and event["index"] is not None
+    )
+
+
+def run_batch(
+    subjects: list[Subject],
+    extra_args: list[str] | None = None,
+    nprocs: int | None = None,
+    mem_gb: float | None = None,
+    subject_mem_gb: float = DEFAULT_SUBJECT_MEM_GB,
+    min_cores: int = 1,
+    poll: float = 0.1,
+) -> list[Result]:
+    """
+    Process subjects concurrently under a global budget of cores and memory.
+
+    Every subject runs ``nifreeze`` in its own process, with its registration
+    threads (and the threads of the numerical libraries) bound to the cores
+    assigned by :func:`allocate`.
+    Where the platform allows, the process is also pinned to as many CPUs,
+    so that the execution planner of the subject chooses its model jobs
+    within its share of the node.
+
+    Parameters
+    ----------
+    subjects : :obj:`list` of :obj:`Subject`
+        The subjects to process.
+    extra_args : :obj:`list` of :obj:`str`, optional
+        Options of ``nifreeze`` applied to all subjects (e.g., ``["--models", "dti"]``).
+    nprocs : :obj:`int`, optional
+        Total number of cores (defaults to all the CPUs of this node).
+    mem_gb : :obj:`float`, optional
+        Total memory, in GB (defaults to the physical memory of this node).
+    subject_mem_gb : :obj:`float`, optional
+        Memory reserved for each subject, in GB.
+    min_cores : :obj:`int`, optional
+        Minimum number of cores of a subject.
+    poll : :obj:`float`, optional
+        Interval (in seconds) between checks of the running subjects.
+
+    Returns
+    -------
+    :obj:`list` of :obj:`Result`
+        The results, in order of completion.
+
+    """
+    extra_args = extra_args or []
+    nprocs = nprocs or os.cpu_count() or 1
+    mem_gb = mem_gb or _physical_memory()
+    min_cores = min(max(min_cores, 1), nprocs)
+
+    queue = deque(subjects)
+    running: dict[Popen, tuple[Subject, int, float, list[int]]] = {}
+    results: list[Result] = []
+    free_cores, free_mem = nprocs, mem_gb
+    free_cpus = _affinity_cpus(nprocs)
+
+    while queue or running:
+        # Never leave the node idle because one subject exceeds the memory budget
+        budget = free_mem if running else max(free_mem, subject_mem_gb)
+        for cores in allocate(free_cores, budget, len(queue), min_cores, subject_mem_gb):
+            subject = queue.popleft()
+            subject.output_dir.mkdir(parents=True, exist_ok=True)
+            subject.events.unlink(missing_ok=True)
+            env = os.environ | {var: str(cores) for var in THREAD_VARIABLES}
+            cpus, free_cpus = free_cpus[:cores], free_cpus[cores:]
+            with (subject.output_dir / f"{subject.name}.log").open("w") as log:
+                process = Popen(
+                    _command(subject, cores, extra_args),
+                    stdout=log,
+                    stderr=log,
+                    env=env,
+                    preexec_fn=partial(os.sched_setaffinity, 0, cpus) if cpus else None,
+                )
+            running[process] = (subject, cores, timer(), cpus)
+            free_cores -= cores
+            free_mem -= subject_mem_gb
+            print(f"Started <{subject.name}> with {cores} cores.")
+
+        sleep(poll)
+        for process in [p for p in running if p.poll() is not None]:
+            subject, cores, start, cpus = running.pop(process)
+            free_cpus += cpus
+            free_cores += cores
+            free_mem += subject_mem_gb
+            results.append(
+                Result(
+                    subject=subject.name,
+                    cores=cores,
+                    returncode=process.returncode,
+                    elapsed=timer() - start,
+                    volumes=_count_volumes(subject.events),
+                )
+            )
+            print(
+                f"Finished <{subject.name}> (exit code {process.returncode}): "
+                f"{results[-1].throughput:.1f} vols./min."
+            )
+
+    return results
+
+
+def _affinity_cpus(nprocs: int) -> list[int]:
+    """CPUs subjects may be pinned to (empty if affinity cannot be set for all cores)."""
+    if not hasattr(os, "sched_setaffinity"):  # pragma: no cover
+        return []
+    cpus = sorted(os.sched_getaffinity(0))
+    return cpus[:nprocs] if len(cpus) >= nprocs else []
+
+
+def _physical_memory() -> float:
+    """Physical memory of this node, in GB."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1e9
+    except (AttributeError, ValueError, OSError):  # pragma: no cover
+        return float("inf")
+
+
+def write_report(results: list[Result], filename: Path | str) -> None:
+    """Write the results of a batch as a tab-separated table."""
+    with Path(filename).open("w", newline="") as fobj:
+        writer = csv.writer(fobj, delimiter="\t")
+        writer.writerow(
+            ("subject", "cores", "returncode", "elapsed", "volumes", "volumes_per_min")
+        )
+        for r in results:
+            writer.writerow(
+                (
+                    r.subject,
+                    r.cores,
+                    r.returncode,
+                    f"{r.elapsed:.2f}",
+                    r.volumes,
+                    f"{r.throughput:.2f}",
+                )
+            )
+
+
+def _build_parser() -> ArgumentParser:
+    """
+    Build parser object.
+
+    Returns
+    -------
+    :obj:`~argparse.ArgumentParser`
+        The parser object defining the interface for the command-line.
+    """
+    parser = ArgumentParser(
+        description=(
+            "Run NiFreeze over the subjects of a manifest under a global budget of CPUs "
+            "and memory. Unknown options are passed on to every 'nifreeze' process."
+        ),
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "manifest",
+        action="store",
+        type=Path,
+        help=(
+            "Tab-separated file with a header and one subject per row. Columns: "
+            "input_file (required), brainmask, gradient_file, b0_file, output_dir."
+        ),
+    )
+    parser.add_argument(
+        "--output-dir",
+        action="store",
+        type=Path,
+        default=Path.cwd(),
+        help="Directory of the batch report and of the subjects without 'output_dir'.",
+    )
+    parser.add_argument(
+        "--nprocs",
+        action="store",
+        type=int,
+        default=None,
+        help="Total number of cores used by the batch (defaults to all).",
+    )
+    parser.add_argument(
+        "--mem-gb",
+        action="store",
+        type=float,
+        default=None,
+        help="Total memory (GB) used by the batch (defaults to the physical memory).",
+    )
+    parser.add_argument(
+        "--subject-mem-gb",
+        action="store",
+        type=float,
+        default=DEFAULT_SUBJECT_MEM_GB,
+        help="Memory (GB) reserved for every subject.",
+    )
+    parser.add_argument(
+        "--min-cores",
+        action="store",
+        type=int,
+        default=1,
+        help="Minimum number of cores of every subject.",
+    )
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Entry point.
+
+    Parameters
+    ----------
+    argv : obj:`list`, optional
+        Arguments.
+
+    """
+    args, extra_args = _build_parser().parse_known_args(argv)
+
+    subjects = read_manifest(args.manifest, args.output_dir)
+    results = run_batch(
+        subjects,
+        extra_args=extra_args,
+        nprocs=args.nprocs,
+        mem_gb=args.mem_gb,
+        subject_mem_gb=args.subject_mem_gb,
+        min_cores=args.min_cores,
+    )
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    write_report(results, args.output_dir / "batch_report.tsv")
+
+    failed = [r.subject for r in results if r.returncode]
+    if failed:
+        print(f"Failed subjects: {', '.join(failed)}.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,7 +22,7 @@
 #
 """Parser module."""
 
-from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, Namespace
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, ArgumentTypeError, Namespace
 from pathlib import Path
 
 import yaml
@@ -47,6 +47,35 @@ def _parse_yaml_config(file_path: str) -> dict:
     return config
 
 
+def _parse_shard(value: str) -> tuple[int, int]:
+    """
+    Parse a shard specification.
+
+    Parameters
+    ----------
+    value : :obj:`str`
+        A ``k/N`` string, with ``0 <= k < N``.
+
+    Returns
+    -------
+    :obj:`tuple`
+        The shard index and the number of shards.
+
+    Examples
+    --------
+    >>> _parse_shard("2/8")
+    (2, 8)
+
+    """
+    try:
+        shard, nshards = (int(v) for v in value.split("/"))
+    except ValueError:
+        raise ArgumentTypeError(f"invalid shard <{value}> (expected k/N)") from None
+    if not 0 <= shard < nshards:
+        raise ArgumentTypeError(f"invalid shard <{value}> (expected 0 <= k < N)")
+    return shard, nshards
+
+
 def _build_parser() -> ArgumentParser:
     """
     Build parser object.
@@ -82,6 +111,15 @@ def _build_parser() -> ArgumentParser:
             "to configure the image registration process."
         ),
     )
+    parser.add_argument(
+        "--registration-backend",
+        action="store",
+        default=None,
+        help=(
+            "Registration engine ('ants' or 'native'). Overrides the 'backend' key of the "
+            "alignment configuration file. Defaults to ANTs."
+        ),
+    )
     parser.add_argument(
         "--models",
         action="store",
@@ -116,7 +154,87 @@ def _build_parser() -> ArgumentParser:
         action="store",
         type=int,
         default=None,
-        help="Number of parallel jobs.",
+        help=(
+            "Number of parallel jobs (defaults to a plan derived from the model, the size "
+            "of the dataset, and the CPUs and memory available)."
+        ),
+    )
+    parser.add_argument(
+        "--chunk-size",
+        action="store",
+        type=int,
+        default=None,
+        help="Number of voxels fitted at once by DTI models (defaults to the plan).",
+    )
+    parser.add_argument(
+        "--max-memory",
+        action="store",
+        type=float,
+        default=None,
+        metavar="GB",
+        help=(
+            "Memory budget (GB) of fitting each model: chunking, precision and parallelism "
+            "are planned to stay within it, and the run fails early if that is impossible."
+        ),
+    )
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help=(
+            "Unless --n-jobs is given, time the fit of one volume serially and with the "
+            "planned number of jobs, and keep the fastest."
+        ),
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        action="store",
+        type=int,
+        default=None,
+        help=(
+            "Overlap model fitting with registration: keep fitting upcoming volumes "
+            "while up to this many predicted volumes await registration. "
+            "By default, volumes are processed serially."
+        ),
+    )
+    parser.add_argument(
+        "--reg-jobs",
+        action="store",
+        type=int,
+        default=None,
+        help=(
+            "Number of concurrent registrations in pipelined mode "
+            "(defaults to the pipeline depth)."
+        ),
+    )
+    parser.add_argument(
+        "--volume-jobs",
+        action="store",
+        type=int,
+        default=None,
+        help=(
+            "Process this many held-out volumes concurrently in separate worker "
+            "processes, sharing the dataset through shared memory."
+        ),
+    )
+    parser.add_argument(
+        "--max-passes",
+        action="store",
+        type=int,
+        default=1,
+        help=(
+            "Repeat the estimation of every model up to this many passes, revisiting only "
+            "the volumes whose transform has not converged (see --fd-tolerance)."
+        ),
+    )
+    parser.add_argument(
+        "--fd-tolerance",
+        action="store",
+        type=float,
+        default=None,
+        help=(
+            "Framewise displacement (mm) between the transforms of two consecutive "
+            "passes below which a volume is considered converged (defaults to 0.1 mm)."
+        ),
     )
     parser.add_argument(
         "--seed",
@@ -137,6 +255,61 @@ def _build_parser() -> ArgumentParser:
     )
 
     parser.add_argument("--write-hdf5", action="store_true", help=("Generate an HDF5 file also."))
+    parser.add_argument(
+        "--instrumentation",
+        action="store",
+        type=Path,
+        metavar="FILE",
+        help=(
+            "Record the wall time and peak memory of every step of every volume "
+            "into this JSONL file, and print a summary at the end."
+        ),
+    )
+    parser.add_argument(
+        "--checkpoint",
+        action="store_true",
+        help=(
+            "Journal every estimated transform into a checkpoint kept in the output "
+            "directory (a copy of the data in HDF5), so that an interrupted run can be "
+            "resumed with --resume."
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Resume an interrupted run from the checkpoint kept in the output directory, "
+            "skipping the volumes that were already realigned. Implies --checkpoint."
+        ),
+    )
+
+    g_shard = parser.add_argument_group(
+        "Options for splitting the estimation across jobs"
+    ).add_mutually_exclusive_group()
+    g_shard.add_argument(
+        "--shard",
+        action="store",
+        type=_parse_shard,
+        metavar="k/N",
+        default=None,
+        help=(
+            "Only estimate the k-th (counting from 0) of N disjoint subsets of volumes "
+            "(e.g., one per task of a cluster array job), and write their transforms into "
+            "the output directory instead of the realigned data."
+        ),
+    )
+    g_shard.add_argument(
+        "--merge-shards",
+        action="store",
+        nargs="+",
+        type=Path,
+        metavar="FILE",
+        default=None,
+        help=(
+            "Skip estimation: assemble the transforms written by all the shards of a run "
+            "and write the realigned outputs."
+        ),
+    )
 
     g_dmri = parser.add_argument_group("Options for dMRI inputs")
     g_dmri.add_argument(
@@ -22,11 +22,56 @@
 #
 """NiFreeze runner."""
 
+from argparse import Namespace
 from pathlib import Path
 
 from nifreeze.cli.parser import parse_args
 from nifreeze.data import BaseDataset, load
+from nifreeze.data.shards import merge_shards, write_shard
 from nifreeze.estimator import Estimator
+from nifreeze.utils.instrumentation import Instrumentation
+
+
+def _estimate(
+    args: Namespace,
+    dataset: BaseDataset,
+    estimator_kwargs: dict,
+    model_kwargs: dict,
+) -> Estimator:
+    """Build the cascade of estimators requested on the command line and run it."""
+    prev_model: Estimator | None = None
+    for _model in args.models:
+        single_fit = estimator_kwargs[_model]["single_fit"]
+        estimator: Estimator = Estimator(
+            _model,
+            prev=prev_model,
+            single_fit=single_fit,
+            model_kwargs=model_kwargs,
+            max_passes=args.max_passes,
+            fd_tolerance=args.fd_tolerance,
+            max_memory=args.max_memory,
+        )
+        prev_model = estimator
+
+    return estimator.run(
+        dataset,
+        align_kwargs=args.align_config,
+        backend=args.registration_backend,
+        omp_nthreads=args.nthreads,
+        n_jobs=args.n_jobs,
+        chunk_size=args.chunk_size,
+        calibrate=args.calibrate,
+        pipeline_depth=args.pipeline_depth,
+        reg_jobs=args.reg_jobs,
+        volume_jobs=args.volume_jobs,
+        checkpoint=args.checkpoint,
+        resume=args.resume,
+        instrumentation=(
+            Instrumentation(jsonl=args.instrumentation) if args.instrumentation else None
+        ),
+        shard=args.shard,
+        seed=args.seed,
+    )
 
 
 def main(argv: list[str] | None = None) -> None:
@@ -53,24 +98,35 @@ def main(argv: list[str] | None = None) -> None:
         **extra_kwargs,
     )
 
-    prev_model: Estimator | None = None
-    for _model in args.models:
-        single_fit = estimator_kwargs[_model]["single_fit"]
-        estimator: Estimator = Estimator(
-            _model,
-            prev=prev_model,
-            single_fit=single_fit,
-            model_kwargs=model_kwargs,
+    input_stem = Path(Path(args.input_file).name).stem
+    shard_suffix = f"_shard-{args.shard[0]:03d}of{args.shard[1]:03d}" if args.shard else ""
+
+    checkpoint = args.checkpoint or args.resume
+    if checkpoint:
+        # Keep the checkpoint next to the outputs so that interrupted runs can be resumed
+        checkpoint_path = Path(args.output_dir) / f"{input_stem}{shard_suffix}_checkpoint.h5"
+        dataset.set_filename(checkpoint_path)
+
+    if args.merge_shards:
+        merged = merge_shards(args.merge_shards, size=len(dataset))
+        for index, matrix in sorted(merged.items()):
+            dataset.set_transform(index, matrix)
+    else:
+        estimator = _estimate(args, dataset, estimator_kwargs, model_kwargs)
+
+    if args.shard:
+        # Only the transforms of this shard are written out (see --merge-shards)
+        shard, nshards = args.shard
+        write_shard(
+            Path(args.output_dir) / f"{input_stem}{shard_suffix}.h5",
+            dataset,
+            estimator.indices,
+            shard,
+            nshards,
         )
-        prev_model = estimator
-
-    _ = estimator.run(
-        dataset,
-        align_kwargs=args.align_config,
-        omp_nthreads=args.nthreads,
-        n_jobs=args.n_jobs,
-        seed=args.seed,
-    )
+        if checkpoint:
+            checkpoint_path.unlink(missing_ok=True)
+        return
 
     # Set the output filename to be the same as the input filename
     output_filename = Path(Path(args.input_file).name).stem + ".nii.gz"
@@ -84,6 +140,10 @@ def main(argv: list[str] | None = None) -> None:
 
     dataset.to_nifti(output_path, write_hmxfms=True)
 
+    if checkpoint:
+        # The run is complete: the checkpoint is no longer needed
+        checkpoint_path.unlink(missing_ok=True)
+
 
 if __name__ == "__main__":
     main()
@@ -27,7 +27,7 @@ from __future__ import annotations
 from collections import namedtuple
 from pathlib import Path
 from tempfile import mkdtemp
-from typing import Any, Generic
+from typing import Any, ClassVar, Generic
 from warnings import warn
 
 import attrs
@@ -288,6 +288,10 @@ class BaseDataset(Generic[Unpack[Ts]]):
     )
     """A path to an HDF5 file to store the whole dataset."""
 
+    resamples_on_transform: ClassVar[bool] = False
+    """Whether :meth:`set_transform` resamples the data array in place, rather than
+    only recording the transform (models must then not cache statistics of the data)."""
+
     def __attrs_post_init__(self) -> None:
         """Enforce basic consistency of base dataset fields at instantiation
         time.
@@ -396,6 +400,21 @@ class BaseDataset(Generic[Unpack[Ts]]):
         """Get the filepath of the HDF5 file."""
         return self._filepath
 
+    def set_filename(self, filename: Path | str) -> None:
+        """
+        Set the filepath of the HDF5 file (e.g., to keep it across runs).
+
+        Parameters
+        ----------
+        filename : :obj:`os.pathlike`
+            The HDF5 file path (the ``.h5`` extension is appended if missing).
+
+        """
+        filename = Path(filename)
+        if not filename.name.endswith(NFDH5_EXT):
+            filename = filename.parent / f"{filename.name}{NFDH5_EXT}"
+        self._filepath = filename
+
     def set_transform(self, index: int, affine: np.ndarray) -> None:
         """
         Set an affine transform for a particular index and update the data object.
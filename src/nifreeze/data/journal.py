@@ -0,0 +1,183 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Journaling of estimated transforms into the HDF5 cache of a dataset."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from nifreeze.data.base import BaseDataset
+
+JOURNAL_GROUP = "/0/_journal"
+"""HDF5 group (ignored when reading the dataset back) holding one journal per stage."""
+
+JOURNAL_LABEL_MISMATCH_ERROR_MSG = (
+    "Cannot resume stage {stage}: its journal was written by <{journal}>, not <{current}>."
+)
+"""Journal resume with a different estimator error message."""
+
+JOURNAL_SHAPE_MISMATCH_ERROR_MSG = (
+    "Cannot resume from <{filename}>: cached data shape {cached} differs from {current}."
+)
+"""Journal resume with a different dataset error message."""
+
+
+class TransformJournal:
+    """
+    Record the transforms of a LOVO stage as soon as they are estimated.
+
+    Each stage of an estimation cascade keeps a group under
+    :data:`JOURNAL_GROUP` in the HDF5 cache of the dataset
+    (:meth:`~nifreeze.data.base.BaseDataset.get_filename`), holding one
+    4x4 matrix and a *done* flag per volume.
+    Because the flags are written (and the file closed) after every volume,
+    a run interrupted at any point can be resumed, skipping the volumes
+    that were already realigned.
+
+    Examples
+    --------
+    >>> from tempfile import mkdtemp
+    >>> journal = TransformJournal(Path(mkdtemp()) / "cache.h5", stage=0)
+    >>> journal.reset(size=3, label="dti")
+    >>> journal.record(2, np.diag([2.0, 2.0, 2.0, 1.0]))
+    >>> {k: v[0, 0] for k, v in journal.load(label="dti").items()}
+    {2: np.float64(2.0)}
+
+    """
+
+    __slots__ = ("_filename", "_stage")
+
+    def __init__(self, filename: Path | str, stage: int = 0):
+        self._filename = Path(filename)
+        self._stage = stage
+
+    @property
+    def filename(self) -> Path:
+        """Path of the HDF5 file holding the journal."""
+        return self._filename
+
+    @property
+    def group(self) -> str:
+        """Name of the HDF5 group of this stage."""
+        return f"{JOURNAL_GROUP}/stage-{self._stage:02d}"
+
+    @classmethod
+    def from_dataset(
+        cls,
+        dataset: BaseDataset,
+        stage: int = 0,
+        overwrite: bool = False,
+    ) -> TransformJournal | None:
+        """
+        Open the journal of a stage in the HDF5 cache of a dataset.
+
+        The dataset is written to its cache first if the file does not exist
+        yet (or ``overwrite`` is set), so that the cache always holds the data
+        the journaled transforms refer to.
+
+        Parameters
+        ----------
+        dataset : :obj:`~nifreeze.data.base.BaseDataset`
+            The dataset being realigned.
+        stage : :obj:`int`, optional
+            Position of the estimator in the cascade.
+        overwrite : :obj:`bool`, optional
+            Rewrite the cache (discarding all journals) even if it exists.
+
+        Returns
+        -------
+        :obj:`~nifreeze.data.journal.TransformJournal` or :obj:`None`
+            The journal, or :obj:`None` if the dataset has no cache file.
+
+        """
+        filename = getattr(dataset, "_filepath", None)
+        if filename is None:
+            return None
+
+        filename = Path(filename)
+        if overwrite or not filename.exists():
+            dataset.to_filename(filename)
+        else:
+            with h5py.File(filename, "r") as in_file:
+                cached = tuple(in_file["/0/dataobj"].shape)
+            if cached != tuple(dataset.dataobj.shape):
+                raise ValueError(
+                    JOURNAL_SHAPE_MISMATCH_ERROR_MSG.format(
+                        filename=filename, cached=cached, current=dataset.dataobj.shape
+                    )
+                )
+
+        return cls(filename, stage=stage)
+
+    def reset(self, size: int, label: str = "") -> None:
+        """Start an empty journal for ``size`` volumes, discarding any previous one."""
+        with h5py.File(self._filename, "a") as out_file:
+            if self.group in out_file:
+                del out_file[self.group]
+            group = out_file.create_group(self.group)
+            group.attrs["Label"] = label
+            group.create_dataset("done", data=np.zeros(size, dtype=bool))
+            group.create_dataset("matrices", data=np.repeat(np.eye(4)[None, ...], size, axis=0))
+
+    def load(self, label: str | None = None) -> dict[int, np.ndarray]:
+        """
+        Read the transforms recorded so far.
+
+        Parameters
+        ----------
+        label : :obj:`str`, optional
+            If given, check that the journal was written by the same estimator.
+
+        Returns
+        -------
+        :obj:`dict`
+            A mapping of volume index to 4x4 matrix (empty if there is no journal).
+
+        """
+        with h5py.File(self._filename, "r") as in_file:
+            if self.group not in in_file:
+                return {}
+
+            group = in_file[self.group]
+            journal_label = group.attrs.get("Label", "")
+            if label is not None and journal_label != label:
+                raise ValueError(
+                    JOURNAL_LABEL_MISMATCH_ERROR_MSG.format(
+                        stage=self._stage, journal=journal_label, current=label
+                    )
+                )
+
+            done = np.flatnonzero(np.asanyarray(group["done"]))
+            matrices = np.asanyarray(group["matrices"])
+
+        return {int(index): matrices[index] for index in done}
+
+    def record(self, index: int, matrix: np.ndarray) -> None:
+        """Persist the transform of volume ``index``."""
+        with h5py.File(self._filename, "a") as out_file:
+            group = out_file[self.group]
+            group["matrices"][index] = matrix
+            group["done"][index] = True
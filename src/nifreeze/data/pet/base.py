@@ -26,7 +26,7 @@ from __future__ import annotations
 
 from collections import namedtuple
 from pathlib import Path
-from typing import Any
+from typing import Any, ClassVar
 
 import attrs
 import h5py
@@ -201,6 +201,9 @@ def validate_1d_array(inst: PET, attr: attrs.Attribute, value: Any) -> None:
 class PET(BaseDataset[np.ndarray]):
     """Data representation structure for PET data."""
 
+    resamples_on_transform: ClassVar[bool] = True
+    """Realigned frames are resampled into the data array (see :meth:`set_transform`)."""
+
     midframe: np.ndarray = attrs.field(
         default=None,
         repr=_data_repr,
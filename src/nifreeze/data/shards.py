@@ -0,0 +1,217 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Split the estimation of a dataset across independent jobs, and merge their transforms."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from nifreeze.data.base import BaseDataset
+
+SHARD_FORMAT = "NFSH5"
+"""Value of the ``Format`` attribute of shard files."""
+
+SHARD_SPEC_ERROR_MSG = "Invalid shard <{shard}> (expected 0 <= k < N)."
+"""Invalid shard specification error message."""
+
+SHARD_INCONSISTENT_ERROR_MSG = (
+    "Shard file <{filename}> ({nshards} shards of {size} volumes) does not belong to "
+    "the same run as the others ({expected_nshards} shards of {expected_size} volumes)."
+)
+"""Shards of different runs error message."""
+
+SHARD_MISSING_ERROR_MSG = "Cannot merge: missing shard(s) {missing} of {nshards}."
+"""Incomplete set of shards error message."""
+
+SHARD_DUPLICATE_ERROR_MSG = "Cannot merge: shard {shard} is given more than once (<{filename}>)."
+"""Repeated shard error message."""
+
+SHARD_SIZE_ERROR_MSG = "Cannot merge: shards of {size} volumes into a dataset of {expected}."
+"""Shards of a different dataset error message."""
+
+
+def shard_indices(indices: Iterable[int], shard: int, nshards: int) -> list[int]:
+    """
+    Select the indices processed by one shard.
+
+    The index set is sorted and dealt round-robin, so that the partition
+    does not depend on the order of traversal (e.g., an unseeded random
+    iterator), and every shard gets volumes spread along the sequence.
+
+    Parameters
+    ----------
+    indices : :obj:`~collections.abc.Iterable` of :obj:`int`
+        The indices of the whole run.
+    shard : :obj:`int`
+        Index of the shard (``0 <= shard < nshards``).
+    nshards : :obj:`int`
+        Total number of shards.
+
+    Returns
+    -------
+    :obj:`list` of :obj:`int`
+        The indices of this shard, in the original order.
+
+    Examples
+    --------
+    >>> shard_indices([5, 0, 3, 1, 4, 2, 6], 1, 3)
+    [1, 4]
+    >>> shard_indices([5, 0, 3, 1, 4, 2, 6], 2, 3)
+    [5, 2]
+
+    """
+    if not 0 <= shard < nshards:
+        raise ValueError(SHARD_SPEC_ERROR_MSG.format(shard=f"{shard}/{nshards}"))
+
+    indices = list(indices)
+    selected = set(sorted(indices)[shard::nshards])
+    return [index for index in indices if index in selected]
+
+
+def write_shard(
+    filename: Path | str,
+    dataset: BaseDataset,
+    indices: Sequence[int],
+    shard: int,
+    nshards: int,
+) -> Path:
+    """
+    Write the transforms estimated by one shard.
+
+    Parameters
+    ----------
+    filename : :obj:`os.pathlike`
+        The HDF5 file to write.
+    dataset : :obj:`~nifreeze.data.base.BaseDataset`
+        The dataset, after estimation.
+    indices : :obj:`~collections.abc.Sequence` of :obj:`int`
+        The volumes processed by this shard.
+    shard : :obj:`int`
+        Index of the shard.
+    nshards : :obj:`int`
+        Total number of shards.
+
+    Returns
+    -------
+    :obj:`~pathlib.Path`
+        The written file.
+
+    """
+    affines = dataset.motion_affines
+    matrices = [
+        np.eye(4)
+        if affines is None or affines[i] is None
+        else np.asanyarray(getattr(affines[i], "matrix", affines[i]), dtype=float)
+        for i in indices
+    ]
+
+    filename = Path(filename)
+    with h5py.File(filename, "w") as out_file:
+        out_file.attrs["Format"] = SHARD_FORMAT
+        out_file.attrs["Version"] = np.uint16(1)
+        root = out_file.create_group("/0")
+        root.attrs["Shard"] = shard
+        root.attrs["NShards"] = nshards
+        root.attrs["Size"] = len(dataset)
+        root.create_dataset("indices", data=np.asarray(indices, dtype=int))
+        root.create_dataset("matrices", data=np.asarray(matrices).reshape(-1, 4, 4))
+    return filename
+
+
+def merge_shards(
+    filenames: Iterable[Path | str], size: int | None = None
+) -> dict[int, np.ndarray]:
+    """
+    Assemble the transforms written by all the shards of a run.
+
+    Parameters
+    ----------
+    filenames : :obj:`~collections.abc.Iterable` of :obj:`os.pathlike`
+        The shard files (one per shard, in any order).
+    size : :obj:`int`, optional
+        Number of volumes of the dataset the transforms are merged into,
+        which must match the one the shards were estimated on.
+
+    Returns
+    -------
+    :obj:`dict`
+        A mapping of volume index to 4x4 matrix.
+
+    Raises
+    ------
+    :obj:`ValueError`
+        If the shards belong to different runs, a shard is repeated or missing,
+        or they were estimated on a dataset of other than ``size`` volumes.
+
+    Examples
+    --------
+    >>> from tempfile import mkdtemp
+    >>> dataset = BaseDataset(dataobj=np.zeros((2, 2, 2, 5)), affine=np.eye(4))
+    >>> dataset.motion_affines = np.repeat(np.eye(4)[None], 5, axis=0)
+    >>> dataset.motion_affines[:, 0, 3] = np.arange(5)
+    >>> files = [
+    ...     write_shard(Path(mkdtemp()) / "shard.h5", dataset, shard_indices(range(5), k, 2), k, 2)
+    ...     for k in range(2)
+    ... ]
+    >>> {i: float(m[0, 3]) for i, m in sorted(merge_shards(files).items())}
+    {0: 0.0, 1: 1.0, 2: 2.0, 3: 3.0, 4: 4.0}
+
+    """
+    matrices: dict[int, np.ndarray] = {}
+    seen: set[int] = set()
+    expected: tuple[int, int] | None = None
+    for filename in filenames:
+        with h5py.File(filename, "r") as in_file:
+            root = in_file["/0"]
+            shard, nshards, nvolumes = (int(root.attrs[k]) for k in ("Shard", "NShards", "Size"))
+            indices = np.asanyarray(root["indices"])
+            shard_matrices = np.asanyarray(root["matrices"])
+
+        expected = expected or (nshards, nvolumes)
+        if expected != (nshards, nvolumes):
+            raise ValueError(
+                SHARD_INCONSISTENT_ERROR_MSG.format(
+                    filename=filename,
+                    nshards=nshards,
+                    size=nvolumes,
+                    expected_nshards=expected[0],
+                    expected_size=expected[1],
+                )
+            )
+
+        if shard in seen:
+            raise ValueError(SHARD_DUPLICATE_ERROR_MSG.format(shard=shard, filename=filename))
+        seen.add(shard)
+        matrices.update(zip((int(i) for i in indices), shard_matrices, strict=True))
+
+    nshards = 1 if expected is None else expected[0]
+    if expected is not None and size is not None and expected[1] != size:
+        raise ValueError(SHARD_SIZE_ERROR_MSG.format(size=expected[1], expected=size))
+    if missing := sorted(set(range(nshards)) - seen):
+        raise ValueError(SHARD_MISSING_ERROR_MSG.format(missing=missing, nshards=nshards))
+
+    return matrices
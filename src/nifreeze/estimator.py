@@ -24,28 +24,63 @@
 
 from __future__ import annotations
 
-from os import cpu_count
+import asyncio
+from collections import deque, namedtuple
+from collections.abc import Callable, Iterator
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from contextlib import nullcontext
+from contextvars import copy_context
+from copy import deepcopy
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from timeit import default_timer as timer
-from typing import TypeVar
+from typing import Any, TypeVar
+from warnings import warn
 
-import nibabel as nb
 import numpy as np
+from nitransforms.linear import Affine
 from tqdm import tqdm
 from typing_extensions import Self
 
 from nifreeze.data.base import BaseDataset
+from nifreeze.data.journal import TransformJournal
+from nifreeze.data.shards import shard_indices
 from nifreeze.model.base import BaseModel, ModelFactory
-from nifreeze.registration.ants import (
-    _prepare_registration_data,
-    _run_registration,
-)
+from nifreeze.registration.base import RegistrationBackend, RegistrationFactory
+from nifreeze.registration.utils import compute_fd_from_transform
 from nifreeze.utils import iterators
+from nifreeze.utils.instrumentation import (
+    STEP_MODEL,
+    Event,
+    Instrumentation,
+    current_instrumentation,
+    measure,
+)
+from nifreeze.utils.sharedmem import share_dataset
+from nifreeze.utils.tuning import ExecutionPlan, plan_execution
+from nifreeze.utils.tuning import calibrate as calibrate_plan
 
 DatasetT = TypeVar("DatasetT", bound=BaseDataset)
 
-DEFAULT_CHUNK_SIZE: int = int(1e6)
+DEFAULT_PIPELINE_DEPTH: int = 0
+"""Number of predicted volumes that may await registration (``0`` runs serially)."""
+DEFAULT_WARM_KWARGS: dict[str, Any] = {"ants_config": "b0-to-b0_level1"}
+"""Registration settings of warm-started stages (finest level of the default settings only)."""
+DEFAULT_FD_TOLERANCE: float = 0.1
+"""Change of transform (framewise displacement, in mm) below which a volume has converged."""
+ASYNC_VOLUME_JOBS_WARN_MSG = "volume_jobs is not supported by Estimator.arun and is ignored."
+"""Asynchronous runs with multiple volume workers warning message."""
+PIPELINE_RESAMPLING_WARN_MSG = (
+    "pipeline_depth is ignored: the data are resampled when a transform is set (e.g., PET), "
+    "so every fit must wait for the transforms of the volumes processed before it."
+)
+"""Pipelined runs of datasets resampled upon setting a transform warning message."""
 FIT_MSG = "Fit&predict"
 REG_MSG = "Realign"
 
@@ -99,6 +134,34 @@ class Estimator:
         First volume index to process.
     stop_index : :obj:`int`, optional
         One-past-last volume index to process (``None`` = to the end).
+    warm_start : :obj:`bool`, optional
+        Initialize the registration of every volume with the transform left in
+        :attr:`~nifreeze.data.base.BaseDataset.motion_affines` (e.g., by the
+        previous estimator of the cascade). Defaults to :obj:`True` if ``prev``
+        is an :obj:`Estimator`.
+        Datasets without transforms, and datasets that resample their data when
+        a transform is set (e.g., PET), are never warm-started.
+    warm_kwargs : :obj:`dict`, optional
+        Registration settings overriding the others when warm-started, which
+        allow cheaper registrations (defaults to :data:`DEFAULT_WARM_KWARGS`,
+        unless the registration settings are given, e.g., with ``ants_config``).
+        Not applied to backends given as instances.
+    max_passes : :obj:`int`, optional
+        Repeat the LOVO estimation up to this many times. Every pass after the
+        first is warm-started, and only revisits the volumes whose transform
+        changed by more than ``fd_tolerance`` in the previous pass.
+    fd_tolerance : :obj:`float`, optional
+        Framewise displacement (in mm, see
+        :func:`~nifreeze.registration.utils.compute_fd_from_transform`) between
+        the transforms of two consecutive passes below which a volume is
+        considered converged (defaults to :data:`DEFAULT_FD_TOLERANCE`).
+    max_memory : :obj:`float`, optional
+        Memory budget (in GB) of fitting the model. Voxel chunking, precision
+        and parallelism are then planned to stay within the budget (see
+        :func:`~nifreeze.utils.tuning.plan_execution`), and the run fails
+        before any estimation starts if the budget cannot be met.
+    **kwargs : :obj:`dict`
+        Settings of the registration backend.
 
     """
 
@@ -111,6 +174,12 @@ class Estimator:
         "_align_kwargs",
         "_start_index",
         "_stop_index",
+        "_warm_start",
+        "_warm_kwargs",
+        "_max_passes",
+        "_fd_tol",
+        "_max_memory",
+        "_indices",
     )
 
     def __init__(
@@ -122,6 +191,11 @@ class Estimator:
         single_fit: bool = False,
         start_index: int = 0,
         stop_index: int | None = None,
+        warm_start: bool | None = None,
+        warm_kwargs: dict | None = None,
+        max_passes: int = 1,
+        fd_tolerance: float | None = None,
+        max_memory: float | None = None,
         **kwargs,
     ):
         self._model = model
@@ -134,6 +208,26 @@ class Estimator:
         self._start_index = start_index
         self._stop_index = stop_index
 
+        self._warm_start = isinstance(prev, Estimator) if warm_start is None else warm_start
+        self._warm_kwargs = warm_kwargs
+        self._max_passes = max(max_passes, 1)
+        self._fd_tol = DEFAULT_FD_TOLERANCE if fd_tolerance is None else fd_tolerance
+        self._max_memory = max_memory
+        self._indices: list[int] = []
+
+    @property
+    def indices(self) -> list[int]:
+        """
+        Held-out indices of the last run of the cascade ending with this estimator.
+
+        Includes the indices of every preceding estimator (in the order they were
+        first processed), and those restored from a checkpoint, and is restricted
+        to the requested ``shard`` (see :meth:`run`).
+
+        """
+        prev = self._prev.indices if isinstance(self._prev, Estimator) else []
+        return prev + [i for i in self._indices if i not in prev]
+
     def run(self, dataset: DatasetT, **kwargs) -> Self:
         """
         Trigger execution of the workflow this estimator belongs.
@@ -143,34 +237,393 @@ class Estimator:
         dataset : :obj:`~nifreeze.data.base.BaseDataset`
             The input dataset this estimator operates on.
 
+        Other Parameters
+        ----------------
+        n_jobs : :obj:`int`, optional
+            Number of parallel jobs used in fitting the model. Defaults to the
+            plan of :func:`~nifreeze.utils.tuning.plan_execution`, derived from
+            the model, the size of the dataset, and the CPUs and memory available.
+        omp_nthreads : :obj:`int`, optional
+            Maximum number of threads an individual process (e.g., ANTs) may use
+            (defaults to the plan, see ``n_jobs``).
+        chunk_size : :obj:`int`, optional
+            Number of voxels fitted at once by DTI models (defaults to the plan,
+            see ``n_jobs``).
+        calibrate : :obj:`bool`, optional
+            Unless ``n_jobs`` is given, fit and predict the first held-out volume
+            serially and with the planned ``n_jobs``, and keep the fastest
+            (see :func:`~nifreeze.utils.tuning.calibrate`).
+        align_kwargs : :obj:`dict`, optional
+            Settings of the registration backend (e.g., read from a YAML file),
+            overridden by any other keyword argument.
+        backend : :obj:`str` or :obj:`~nifreeze.registration.base.RegistrationBackend`, optional
+            The registration engine, or its name (see
+            :obj:`~nifreeze.registration.base.RegistrationFactory`).
+            Can also be set with the ``backend`` key of ``align_kwargs``.
+            Defaults to ANTs.
+        pipeline_depth : :obj:`int`, optional
+            Run in *pipelined mode* when positive: the model keeps fitting and
+            predicting upcoming volumes (in the order given by the iterator)
+            while up to ``pipeline_depth`` predicted volumes are registered in
+            the background. The producer blocks when the queue is full, which
+            bounds the number of predicted volumes held in memory.
+            Defaults to :data:`DEFAULT_PIPELINE_DEPTH` (serial execution).
+            Ignored for datasets resampled when a transform is set (e.g., PET),
+            whose fits depend on the transforms of the volumes before them.
+        reg_jobs : :obj:`int`, optional
+            Number of concurrent registration workers in pipelined mode
+            (defaults to ``pipeline_depth``). Each worker runs ANTs with
+            ``omp_nthreads`` threads.
+        volume_jobs : :obj:`int`, optional
+            Spread held-out volumes across this many worker processes when larger
+            than one. Each worker fits, predicts and registers whole volumes, with
+            the dataset arrays placed in shared memory once (instead of pickled
+            to every worker). Transforms are merged back in the order given by
+            the iterator once all volumes are done, so they are never fed back
+            into later fits. Takes precedence over ``pipeline_depth``.
+        checkpoint : :obj:`bool`, optional
+            Journal every estimated transform to the HDF5 cache of the dataset
+            (:meth:`~nifreeze.data.base.BaseDataset.get_filename`) as soon as
+            it is available (see :obj:`~nifreeze.data.journal.TransformJournal`).
+        resume : :obj:`bool`, optional
+            Resume an interrupted (checkpointed) run: volumes already journaled
+            by each stage of the cascade get their transforms restored and are
+            skipped. Implies ``checkpoint``.
+        instrumentation : :obj:`~nifreeze.utils.instrumentation.Instrumentation`, optional
+            Record the wall time and peak RSS delta of every step (fit, predict,
+            NIfTI write, registration, transform readback) of every volume,
+            across all the estimators of the cascade. A summary table is
+            printed at the end of the run.
+        shard : :obj:`tuple` of :obj:`int`, optional
+            A ``(k, N)`` pair: only process the ``k``-th (``0 <= k < N``) of ``N``
+            disjoint subsets of the held-out volumes (see
+            :func:`~nifreeze.data.shards.shard_indices`), so that one dataset can be
+            split across independent jobs. Transforms of each shard are written
+            with :func:`~nifreeze.data.shards.write_shard` and assembled with
+            :func:`~nifreeze.data.shards.merge_shards`.
+
         Returns
         -------
         :obj:`~nifreeze.estimator.Estimator`
             The estimator, after fitting.
 
         """
+        self._check_memory(dataset, kwargs)
+
+        instrumentation = kwargs.pop("instrumentation", None)
+        if instrumentation is None:
+            return self._run(dataset, **kwargs)
+
+        with instrumentation:
+            self._run(dataset, **kwargs)
+        print(instrumentation.summary())
+        return self
+
+    def _run(self, dataset: DatasetT, **kwargs) -> Self:
+        """Run the cascade of estimators ending with this one (see :meth:`run`)."""
         if self._prev is not None:
             result = self._prev.run(dataset, **kwargs)
             if isinstance(self._prev, Filter):
                 dataset = result  # type: ignore[assignment]
 
-        n_jobs = kwargs.pop("n_jobs", None) or min(cpu_count() or 1, 8)
-        n_threads = kwargs.pop("omp_nthreads", None) or ((cpu_count() or 2) - 1)
+        model, indices, skipped, fit_pred_kwargs, journal, loop_kwargs = self._prepare(
+            dataset, kwargs
+        )
+        if self._single_fit and indices:
+            _fit_single(model, fit_pred_kwargs)
+
+        with TemporaryDirectory() as tmp_dir:
+            print(f"Processing in <{tmp_dir}>")
+            cold_backend, warm_backend = self._init_backends(Path(tmp_dir), kwargs)
+
+            for pass_indices, warm_start, done in self._passes(dataset, indices, skipped):
+                self._run_pass(
+                    model,
+                    dataset,
+                    pass_indices,
+                    fit_pred_kwargs,
+                    warm_backend if warm_start else cold_backend,
+                    journal,
+                    warm_start=warm_start,
+                    done=done,
+                    **loop_kwargs,
+                )
+
+        return self
+
+    async def arun(self, dataset: DatasetT, **kwargs) -> Self:
+        """
+        Trigger execution of the workflow this estimator belongs, as a coroutine.
+
+        Equivalent to :meth:`run`, but the event loop is never blocked: model
+        fitting and prediction run in an executor, and registrations are
+        awaited (see :meth:`~nifreeze.registration.base.RegistrationBackend.aregister`),
+        so that many datasets can be processed concurrently by one event loop.
+        Cancelling the coroutine cancels the pending registrations (killing
+        ANTs processes); a fit already running in the executor completes first.
+
+        Parameters
+        ----------
+        dataset : :obj:`~nifreeze.data.base.BaseDataset`
+            The input dataset this estimator operates on.
+
+        Other Parameters
+        ----------------
+        semaphore : :obj:`asyncio.Semaphore`, optional
+            Bounds the number of concurrent registrations. Share one semaphore
+            across the estimators of several datasets to bound the concurrency
+            of all of them (defaults to a semaphore of ``reg_jobs`` slots).
+        executor : :obj:`concurrent.futures.Executor`, optional
+            A thread-based executor where models are fitted (defaults to the
+            default executor of the event loop).
+        **kwargs : :obj:`dict`
+            Same as :meth:`run`. Volumes are fitted one at a time, while up to
+            ``pipeline_depth`` of them await registration (``volume_jobs`` is
+            not supported).
+
+        Returns
+        -------
+        :obj:`~nifreeze.estimator.Estimator`
+            The estimator, after fitting.
+
+        """
+        self._check_memory(dataset, kwargs)
+
+        instrumentation = kwargs.pop("instrumentation", None)
+        if instrumentation is None:
+            return await self._arun(dataset, **kwargs)
+
+        with instrumentation:
+            await self._arun(dataset, **kwargs)
+        print(instrumentation.summary())
+        return self
+
+    async def _arun(self, dataset: DatasetT, **kwargs) -> Self:
+        """Run the cascade of estimators ending with this one (see :meth:`arun`)."""
+        if isinstance(self._prev, Estimator):
+            await self._prev.arun(dataset, **kwargs)
+        elif self._prev is not None:
+            dataset = await asyncio.to_thread(self._prev.run, dataset, **kwargs)  # type: ignore[arg-type]
+
+        semaphore = kwargs.pop("semaphore", None)
+        executor = kwargs.pop("executor", None)
+        model, indices, skipped, fit_pred_kwargs, journal, loop_kwargs = self._prepare(
+            dataset, kwargs
+        )
+        if loop_kwargs["volume_jobs"] > 1:
+            warn(ASYNC_VOLUME_JOBS_WARN_MSG, stacklevel=2)
+        semaphore = semaphore or asyncio.Semaphore(loop_kwargs["reg_jobs"])
+
+        if self._single_fit and indices:
+            await asyncio.get_running_loop().run_in_executor(
+                executor, copy_context().run, _fit_single, model, fit_pred_kwargs
+            )
+
+        with TemporaryDirectory() as tmp_dir:
+            print(f"Processing in <{tmp_dir}>")
+            cold_backend, warm_backend = self._init_backends(Path(tmp_dir), kwargs)
+
+            for pass_indices, warm_start, done in self._passes(dataset, indices, skipped):
+                with tqdm(total=len(pass_indices) + done, initial=done, unit="vols.") as pbar:
+                    pbar.set_description_str(f"{FIT_MSG} & {REG_MSG} (async)")
+
+                    def _apply(index: int, matrix: np.ndarray) -> None:
+                        matrix = _compose(dataset, index, matrix)
+                        dataset.set_transform(index, matrix)
+                        if journal is not None:
+                            journal.record(index, matrix)
+                        pbar.update()
+
+                    await _arun_lovo_pipeline(
+                        model,
+                        dataset,
+                        pass_indices,
+                        fit_pred_kwargs,
+                        warm_backend if warm_start else cold_backend,
+                        pipeline_depth=loop_kwargs["pipeline_depth"],
+                        semaphore=semaphore,
+                        executor=executor,
+                        warm_start=warm_start,
+                        callback=_apply,
+                    )
+
+        return self
+
+    def _prepare(
+        self, dataset: BaseDataset, kwargs: dict
+    ) -> tuple[BaseModel, list[int], int, dict, TransformJournal | None, dict]:
+        """
+        Set up a run (consuming its options from ``kwargs``).
+
+        Returns the model, the held-out indices still to be processed, the number
+        of indices restored from the journal, the keyword arguments of
+        :meth:`~nifreeze.model.base.BaseModel.fit_predict`, the journal, and the
+        options of the LOVO loop.
+
+        """
+        n_jobs = kwargs.pop("n_jobs", None)
+        n_threads = kwargs.pop("omp_nthreads", None)
+        chunk_size = kwargs.pop("chunk_size", None)
+        calibrate = kwargs.pop("calibrate", False)
+        pipeline_depth = kwargs.pop("pipeline_depth", None) or DEFAULT_PIPELINE_DEPTH
+        if pipeline_depth and getattr(dataset, "resamples_on_transform", False):
+            warn(PIPELINE_RESAMPLING_WARN_MSG, stacklevel=2)
+            pipeline_depth = 0
+        reg_jobs = kwargs.pop("reg_jobs", None) or max(pipeline_depth, 1)
+        volume_jobs = kwargs.pop("volume_jobs", None) or 1
+        resume = kwargs.pop("resume", False)
+        checkpoint = kwargs.pop("checkpoint", False) or resume
+
+        index_iter = self._index_iterator(len(dataset), kwargs)
+
+        # Restore the transforms of a previous (interrupted) run
+        journal, done = self._open_journal(dataset, checkpoint=checkpoint, resume=resume)
+        all_indices = list(index_iter)
+        self._indices = all_indices
+        indices = [i for i in all_indices if i not in done]
+
+        model = self._init_model(dataset)
+
+        # Prepare fit/predict keyword arguments
+        plan = self._plan(
+            model,
+            dataset,
+            n_jobs=n_jobs,
+            omp_nthreads=n_threads,
+            chunk_size=chunk_size,
+            volume_jobs=volume_jobs,
+            reg_workers=reg_jobs if pipeline_depth else 1,
+        )
+        if calibrate and not self._single_fit and indices and not n_jobs:
+            plan = calibrate_plan(
+                plan,
+                lambda jobs: _model_copy(model).fit_predict(
+                    indices[0], **(plan.as_kwargs() | {"n_jobs": jobs})
+                ),
+            )
+
+        fit_pred_kwargs = plan.as_kwargs()
+        if model.__class__.__name__ == "DTIModel":
+            fit_pred_kwargs["step"] = plan.chunk_size
 
         num_voxels = dataset.brainmask.sum() if dataset.brainmask is not None else dataset.size3d
-        chunk_size = DEFAULT_CHUNK_SIZE * (n_threads or 1)
+        print(f"Dataset size: {num_voxels}x{len(dataset)}.")
+        print(
+            f"Parallel execution: {fit_pred_kwargs}, estimated peak memory "
+            f"{plan.memory / 2**30:.2f} GiB ({plan.reason})."
+        )
+        print(f"Model: {model}.")
+
+        kwargs["num_threads"] = plan.omp_nthreads
+        loop_kwargs = {
+            "pipeline_depth": pipeline_depth,
+            "reg_jobs": reg_jobs,
+            "volume_jobs": volume_jobs,
+        }
+        return (
+            model,
+            indices,
+            len(all_indices) - len(indices),
+            fit_pred_kwargs,
+            journal,
+            loop_kwargs,
+        )
+
+    def _passes(
+        self, dataset: BaseDataset, indices: list[int], skipped: int
+    ) -> Iterator[tuple[list[int], bool, int]]:
+        """
+        Iterate over the LOVO passes of a run.
 
-        # Calculate the size parameter for the iterator (exclusive upper bound)
-        n = len(dataset)
-        size = n
+        Yields the held-out indices of each pass, whether registrations are
+        warm-started, and the number of volumes skipped. Passes after the first
+        only revisit volumes whose transform is still changing.
+        Registrations are only warm-started if there are transforms to start from
+        (see :func:`_init_affine`).
+
+        """
+        warm_start = self._warm_start
+        previous: dict[int, np.ndarray] = {}
+        for n_pass in range(self._max_passes):
+            if n_pass:
+                indices = _unconverged(dataset, indices, previous, self._fd_tol)
+                if not indices:
+                    return
+                print(f"Pass {n_pass + 1}: {len(indices)} volumes not converged.")
+                warm_start, skipped = True, 0
+
+            warm_start = warm_start and _has_init_affines(dataset)
+
+            previous = {i: _current_transform(dataset, i) for i in indices}
+            yield indices, warm_start, skipped
+
+    def _run_pass(
+        self,
+        model: BaseModel,
+        dataset: BaseDataset,
+        indices: list[int],
+        fit_pred_kwargs: dict,
+        backend: RegistrationBackend,
+        journal: TransformJournal | None,
+        warm_start: bool = False,
+        done: int = 0,
+        pipeline_depth: int = DEFAULT_PIPELINE_DEPTH,
+        reg_jobs: int = 1,
+        volume_jobs: int = 1,
+    ) -> None:
+        """Estimate the transforms of the given held-out volumes (one LOVO pass)."""
+        with tqdm(total=len(indices) + done, initial=done, unit="vols.") as pbar:
+
+            def _record(index: int, matrix: np.ndarray) -> None:
+                if journal is not None:
+                    journal.record(index, matrix)
+                pbar.update()
+
+            if volume_jobs > 1:
+                pbar.set_description_str(f"{FIT_MSG} & {REG_MSG} ({volume_jobs} proc.)")
+                results = _run_lovo_processes(
+                    model,
+                    dataset,
+                    indices,
+                    fit_pred_kwargs,
+                    backend,
+                    volume_jobs,
+                    warm_start=warm_start,
+                    callback=lambda index, matrix: _record(
+                        index, _compose(dataset, index, matrix)
+                    ),
+                )
+                for index, matrix in results:
+                    dataset.set_transform(index, _compose(dataset, index, matrix))
+                return
+
+            def _apply(index: int, matrix: np.ndarray) -> None:
+                matrix = _compose(dataset, index, matrix)
+                dataset.set_transform(index, matrix)
+                _record(index, matrix)
+
+            _run_lovo_pipeline(
+                model,
+                dataset,
+                indices,
+                fit_pred_kwargs,
+                backend,
+                pipeline_depth,
+                reg_jobs,
+                warm_start=warm_start,
+                callback=_apply,
+                status=pbar.set_description_str,
+            )
+
+    def _index_iterator(self, size: int, kwargs: dict) -> Iterator[int]:
+        """Prepare the iterator over held-out indices (consuming its options from ``kwargs``)."""
         start_index = self._start_index or 0
         stop_index = (
             None
             if self._stop_index is None
-            else (n + self._stop_index if self._stop_index < 0 else self._stop_index)
+            else (size + self._stop_index if self._stop_index < 0 else self._stop_index)
         )
 
-        # Prepare iterator
         iterfunc = getattr(iterators, f"{self._strategy}_iterator")
         index_iter = iterfunc(
             size=size,
@@ -182,94 +635,476 @@ class Estimator:
             stop_index=stop_index,
         )
 
-        # Initialize model
-        if isinstance(self._model, str):
-            if self._model.endswith("dti"):
-                self._model_kwargs["step"] = chunk_size
+        if (shard := kwargs.pop("shard", None)) is None:
+            return index_iter
+        return iter(shard_indices(index_iter, *shard))
+
+    def _plan(
+        self,
+        model: BaseModel | str,
+        dataset: BaseDataset,
+        volume_jobs: int = 1,
+        **kwargs,
+    ) -> ExecutionPlan:
+        """Plan the parallel execution of the model (see :func:`~.utils.tuning.plan_execution`)."""
+        brainmask = dataset.brainmask
+        return plan_execution(
+            ModelFactory.get_class(model) if isinstance(model, str) else model,
+            int(brainmask.sum()) if brainmask is not None else dataset.size3d,
+            len(dataset),
+            concurrency=volume_jobs,
+            max_memory=int(self._max_memory * 2**30) if self._max_memory else None,
+            dtype=dataset.dataobj.dtype,
+            base=dataset.dataobj.nbytes,
+            **kwargs,
+        )
+
+    def _check_memory(self, dataset: BaseDataset, kwargs: dict) -> None:
+        """Fail before running the cascade if any of its models exceeds its memory budget."""
+        stage: Estimator | Filter | None = self
+        while isinstance(stage, Estimator):
+            if stage._max_memory:
+                stage._plan(
+                    stage._model,
+                    dataset,
+                    n_jobs=kwargs.get("n_jobs"),
+                    chunk_size=kwargs.get("chunk_size"),
+                    volume_jobs=kwargs.get("volume_jobs") or 1,
+                )
+            stage = stage._prev
+
+    def _init_model(self, dataset: BaseDataset) -> BaseModel:
+        """Instantiate the model (if given by name)."""
+        if not isinstance(self._model, str):
+            return self._model
+
+        # Factory creates the appropriate model and pipes arguments
+        return ModelFactory.init(
+            model=self._model,
+            dataset=dataset,
+            **self._model_kwargs,
+        )
+
+    def _init_backends(
+        self, workdir: Path, kwargs: dict
+    ) -> tuple[RegistrationBackend, RegistrationBackend]:
+        """
+        Instantiate the registration backends (consuming their options from ``kwargs``).
+
+        Returns the backend of registrations initialized with the identity, and
+        the backend of warm-started registrations (with :attr:`_warm_kwargs`).
+        The default warm settings (:data:`DEFAULT_WARM_KWARGS`) only replace the
+        default registration settings, never those given by the user.
+
+        """
+        align_kwargs = self._align_kwargs | (kwargs.pop("align_kwargs", None) or {})
+        backend = kwargs.pop("backend", None) or align_kwargs.pop("backend", None)
+        if isinstance(backend, RegistrationBackend):
+            return backend, backend
 
-            # Factory creates the appropriate model and pipes arguments
-            model = ModelFactory.init(
-                model=self._model,
-                dataset=dataset,
-                **self._model_kwargs,
+        settings = align_kwargs | kwargs
+        warm_kwargs = self._warm_kwargs
+        if warm_kwargs is None:
+            warm_kwargs = (
+                {} if settings.keys() & {"ants_config", "settings"} else DEFAULT_WARM_KWARGS
             )
-        else:
-            model = self._model
+        return (
+            RegistrationFactory.init(backend, workdir=workdir, **settings),
+            RegistrationFactory.init(backend, workdir=workdir, **(settings | warm_kwargs)),
+        )
 
-        # Prepare fit/predict keyword arguments
-        fit_pred_kwargs = {
-            "n_jobs": n_jobs,
-            "omp_nthreads": n_threads,
-        }
-        if model.__class__.__name__ == "DTIModel":
-            fit_pred_kwargs["step"] = chunk_size
+    def _open_journal(
+        self, dataset: BaseDataset, checkpoint: bool, resume: bool
+    ) -> tuple[TransformJournal | None, dict[int, np.ndarray]]:
+        """Open the journal of this stage and restore the transforms already recorded."""
+        if not checkpoint:
+            return None, {}
 
-        print(f"Dataset size: {num_voxels}x{len(dataset)}.")
-        print(f"Parallel execution: {fit_pred_kwargs}.")
-        print(f"Model: {model}.")
+        stage = self._stage()
+        journal = TransformJournal.from_dataset(
+            dataset, stage=stage, overwrite=stage == 0 and not resume
+        )
+        if journal is None:
+            return None, {}
 
-        if self._single_fit:
-            print("Fitting 'single' model started ...")
-            start = timer()
-            model.fit_predict(None, **fit_pred_kwargs)
-            print(f"Fitting 'single' model finished, elapsed {timer() - start}s.")
+        label = self._model if isinstance(self._model, str) else type(self._model).__name__
+        done = journal.load(label=label) if resume else {}
+        if not done:
+            journal.reset(len(dataset), label=label)
+        for index, matrix in done.items():
+            dataset.set_transform(index, matrix)
+        return journal, done
 
-        kwargs["num_threads"] = n_threads
-        kwargs = self._align_kwargs | kwargs
+    def _stage(self) -> int:
+        """Position of this estimator in the cascade (``0`` for the first one to run)."""
+        stage = 0
+        prev = self._prev
+        while isinstance(prev, Estimator):
+            stage += 1
+            prev = prev._prev
+        return stage
 
-        # Calculate effective dataset length for progress bar
-        if self._stop_index is not None:
-            dataset_length = self._stop_index - self._start_index
-        else:
-            dataset_length = len(dataset) - self._start_index
 
-        with TemporaryDirectory() as tmp_dir:
-            print(f"Processing in <{tmp_dir}>")
-            ptmp_dir = Path(tmp_dir)
-
-            bmask_path = None
-            if dataset.brainmask is not None:
-                bmask_path = ptmp_dir / "brainmask.nii.gz"
-                nb.Nifti1Image(
-                    dataset.brainmask.astype(np.uint8), dataset.affine, None
-                ).to_filename(bmask_path)
-
-            with tqdm(total=dataset_length, unit="vols.") as pbar:
-                # run an original-to-synthetic affine registration
-                for i in index_iter:
-                    pbar.set_description_str(f"{FIT_MSG: <16} vol. <{i}>")
-
-                    # fit the model
-                    predicted = model.fit_predict(  # type: ignore[union-attr]
-                        i,
-                        **fit_pred_kwargs,
-                    )
+def _init_affine(dataset: BaseDataset, index: int) -> np.ndarray | None:
+    """Transform of volume ``index`` left by a previous estimation (if any)."""
+    affines = dataset.motion_affines
+    if affines is None or affines.dtype == object:
+        # Data resampled upon setting the transform (e.g., PET): estimate the residual
+        return None
+    return np.array(affines[index])
 
-                    # prepare data for running ANTs
-                    predicted_path, volume_path, init_path = _prepare_registration_data(
-                        dataset[i][0],  # Access the target volume
-                        predicted,
-                        dataset.affine,
-                        i,
-                        ptmp_dir,
-                        kwargs.pop("clip", "both"),
-                    )
 
-                    pbar.set_description_str(f"{REG_MSG: <16} vol. <{i}>")
-
-                    xform = _run_registration(
-                        predicted_path,
-                        volume_path,
-                        i,
-                        ptmp_dir,
-                        init_affine=init_path,
-                        fixedmask_path=bmask_path,
-                        output_transform_prefix=f"ants-{i:05d}",
-                        **kwargs,
-                    )
+def _has_init_affines(dataset: BaseDataset) -> bool:
+    """Whether registrations of ``dataset`` can be initialized with previous transforms."""
+    return getattr(dataset, "motion_affines", None) is not None and not getattr(
+        dataset, "resamples_on_transform", False
+    )
 
-                    # update
-                    dataset.set_transform(i, xform.matrix)
-                    pbar.update()
 
-        return self
+def _current_transform(dataset: BaseDataset, index: int) -> np.ndarray:
+    """Matrix of the transform currently set for volume ``index`` (identity if unset)."""
+    affines = getattr(dataset, "motion_affines", None)
+    if affines is None or affines[index] is None:
+        return np.eye(4)
+    return np.array(getattr(affines[index], "matrix", affines[index]), dtype=float)
+
+
+def _compose(dataset: BaseDataset, index: int, matrix: np.ndarray) -> np.ndarray:
+    """
+    Transform of volume ``index`` once its data are registered with ``matrix``.
+
+    Datasets resampled when a transform is set (e.g., PET) are registered after
+    resampling, so ``matrix`` is the residual of the transform already set.
+
+    """
+    if not getattr(dataset, "resamples_on_transform", False):
+        return matrix
+    return _current_transform(dataset, index) @ matrix
+
+
+def _unconverged(
+    dataset: BaseDataset,
+    indices: list[int],
+    previous: dict[int, np.ndarray],
+    fd_tolerance: float,
+) -> list[int]:
+    """Select the volumes whose transform changed by more than ``fd_tolerance`` (FD, mm)."""
+    ImageGrid = namedtuple("ImageGrid", ("shape", "affine"))
+    reference = ImageGrid(shape=dataset.dataobj.shape[:3], affine=dataset.affine)
+    return [
+        index
+        for index in indices
+        if compute_fd_from_transform(
+            reference,  # type: ignore[arg-type]
+            Affine(np.linalg.inv(previous[index]) @ _current_transform(dataset, index)),
+        )
+        > fd_tolerance
+    ]
+
+
+def _register_volume(
+    dataset: BaseDataset,
+    index: int,
+    predicted: np.ndarray,
+    backend: RegistrationBackend,
+    warm_start: bool = False,
+) -> np.ndarray:
+    """Register the observed volume ``index`` to its prediction and return the affine."""
+    return backend.register(
+        predicted,
+        dataset[index][0],  # Access the target volume
+        dataset.affine,
+        index=index,
+        fixedmask=dataset.brainmask,
+        init_affine=_init_affine(dataset, index) if warm_start else None,
+    )
+
+
+async def _aregister_volume(
+    dataset: BaseDataset,
+    index: int,
+    predicted: np.ndarray,
+    backend: RegistrationBackend,
+    warm_start: bool = False,
+) -> np.ndarray:
+    """Await the registration of volume ``index`` (see :func:`_register_volume`)."""
+    return await backend.aregister(
+        predicted,
+        dataset[index][0],  # Access the target volume
+        dataset.affine,
+        index=index,
+        fixedmask=dataset.brainmask,
+        init_affine=_init_affine(dataset, index) if warm_start else None,
+    )
+
+
+def _model_copy(model: BaseModel) -> BaseModel:
+    """Copy ``model`` (e.g., its caches of previous fits), sharing its dataset."""
+    dataset = model._dataset
+    return deepcopy(model, {id(dataset): dataset})
+
+
+def _fit_single(model: BaseModel, fit_pred_kwargs: dict) -> None:
+    """Fit the model once on all volumes (single-fit mode)."""
+    print("Fitting 'single' model started ...")
+    start = timer()
+    model.fit_predict(None, **fit_pred_kwargs)
+    print(f"Fitting 'single' model finished, elapsed {timer() - start}s.")
+
+
+def _fit_predict(model: BaseModel, index: int, fit_pred_kwargs: dict) -> np.ndarray:
+    """Fit the model leaving out volume ``index``, and predict it."""
+    with measure(STEP_MODEL, index):
+        return model.fit_predict(index, **fit_pred_kwargs)  # type: ignore[return-value]
+
+
+def _run_lovo_pipeline(
+    model: BaseModel,
+    dataset: BaseDataset,
+    indices: list[int],
+    fit_pred_kwargs: dict,
+    backend: RegistrationBackend,
+    pipeline_depth: int = DEFAULT_PIPELINE_DEPTH,
+    reg_jobs: int = 1,
+    warm_start: bool = False,
+    callback: Callable[[int, np.ndarray], Any] | None = None,
+    status: Callable[[str], Any] | None = None,
+) -> None:
+    """
+    Process held-out volumes in this process, optionally pipelining registrations.
+
+    Parameters
+    ----------
+    model : :obj:`~nifreeze.model.base.BaseModel`
+        The model generating the registration targets.
+    dataset : :obj:`~nifreeze.data.base.BaseDataset`
+        The dataset being realigned.
+    indices : :obj:`list` of :obj:`int`
+        Held-out indices, in the order given by the iterator.
+    fit_pred_kwargs : :obj:`dict`
+        Keyword arguments to :meth:`~nifreeze.model.base.BaseModel.fit_predict`.
+    backend : :obj:`~nifreeze.registration.base.RegistrationBackend`
+        The registration engine.
+    pipeline_depth : :obj:`int`, optional
+        Maximum number of predicted volumes awaiting registration
+        (``0`` registers every volume right after its prediction).
+    reg_jobs : :obj:`int`, optional
+        Number of concurrent registration threads in pipelined mode. Each thread
+        awaits :meth:`~nifreeze.registration.base.RegistrationBackend.aregister`,
+        so that ANTs runs as a subprocess in its own working directory (rather
+        than Nipype switching the working directory of the whole process).
+    warm_start : :obj:`bool`, optional
+        Initialize registrations with the current transforms of the dataset.
+    callback : :obj:`callable`, optional
+        Called with the index and the matrix of every volume, in the order of ``indices``.
+    status : :obj:`callable`, optional
+        Called with a short description of the current step.
+
+    """
+    callback = callback or (lambda *_: None)
+    status = status or (lambda *_: None)
+
+    def _register(index: int, predicted: np.ndarray) -> np.ndarray:
+        return _register_volume(dataset, index, predicted, backend, warm_start)
+
+    def _aregister(index: int, predicted: np.ndarray) -> np.ndarray:
+        return asyncio.run(_aregister_volume(dataset, index, predicted, backend, warm_start))
+
+    pending: deque[tuple[int, Future]] = deque()
+    executor = ThreadPoolExecutor(max_workers=reg_jobs) if pipeline_depth else None
+
+    def _collect(depth: int) -> None:
+        # Consume finished registrations in submission order
+        while len(pending) > depth:
+            index, future = pending.popleft()
+            callback(index, future.result())
+
+    try:
+        # run an original-to-synthetic affine registration
+        for i in indices:
+            status(f"{FIT_MSG: <16} vol. <{i}>")
+
+            # fit the model
+            with measure(STEP_MODEL, i):
+                predicted: np.ndarray = model.fit_predict(i, **fit_pred_kwargs)  # type: ignore[assignment]
+
+            if executor is None:
+                status(f"{REG_MSG: <16} vol. <{i}>")
+                callback(i, _register(i, predicted))
+                continue
+
+            # the producer blocks here while the queue is full
+            # (registration threads report to the instrumentation of this context)
+            pending.append((i, executor.submit(copy_context().run, _aregister, i, predicted)))
+            _collect(pipeline_depth)
+
+        _collect(0)
+    finally:
+        if executor is not None:
+            # Do not start queued registrations if the loop was interrupted
+            executor.shutdown(cancel_futures=True)
+
+
+async def _arun_lovo_pipeline(
+    model: BaseModel,
+    dataset: BaseDataset,
+    indices: list[int],
+    fit_pred_kwargs: dict,
+    backend: RegistrationBackend,
+    pipeline_depth: int = DEFAULT_PIPELINE_DEPTH,
+    semaphore: asyncio.Semaphore | None = None,
+    executor: Executor | None = None,
+    warm_start: bool = False,
+    callback: Callable[[int, np.ndarray], Any] | None = None,
+) -> None:
+    """
+    Process held-out volumes without blocking the event loop.
+
+    Models are fitted in ``executor``, one volume at a time, while up to
+    ``pipeline_depth`` predicted volumes await registration (whose concurrency
+    is bounded by ``semaphore``).
+    Parameters are otherwise those of :func:`_run_lovo_pipeline`.
+
+    """
+    callback = callback or (lambda *_: None)
+    loop = asyncio.get_running_loop()
+    pending: deque[tuple[int, asyncio.Task]] = deque()
+
+    async def _register(index: int, predicted: np.ndarray) -> np.ndarray:
+        async with semaphore or nullcontext():
+            return await _aregister_volume(dataset, index, predicted, backend, warm_start)
+
+    async def _collect(depth: int) -> None:
+        # Consume finished registrations in submission order
+        while len(pending) > depth:
+            index, task = pending[0]
+            matrix = await task
+            pending.popleft()
+            callback(index, matrix)
+
+    try:
+        for i in indices:
+            # (the fit reports to the instrumentation of this context)
+            predicted = await loop.run_in_executor(
+                executor, copy_context().run, _fit_predict, model, i, fit_pred_kwargs
+            )
+            pending.append((i, asyncio.create_task(_register(i, predicted))))
+            await _collect(pipeline_depth)
+
+        await _collect(0)
+    finally:
+        # Do not leave registrations behind if the loop was interrupted (or cancelled)
+        for _, task in pending:
+            task.cancel()
+        await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+
+_WORKER_STATE: dict = {}
+"""Per-process state of the LOVO workers (set by :func:`_init_lovo_worker`)."""
+
+
+def _init_lovo_worker(
+    model: BaseModel,
+    dataset: BaseDataset,
+    fit_pred_kwargs: dict,
+    backend: RegistrationBackend,
+    warm_start: bool = False,
+    instrumented: bool = False,
+) -> None:
+    """Keep the (shared-memory backed) model and dataset of a worker process."""
+    _WORKER_STATE.update(
+        model=model,
+        dataset=dataset,
+        fit_pred_kwargs=fit_pred_kwargs,
+        backend=backend,
+        warm_start=warm_start,
+        instrumented=instrumented,
+    )
+
+
+def _lovo_worker(index: int) -> tuple[np.ndarray, list[Event]]:
+    """Fit, predict and register one held-out volume in a worker process."""
+    dataset = _WORKER_STATE["dataset"]
+    instrumentation = Instrumentation()
+    with instrumentation if _WORKER_STATE["instrumented"] else nullcontext():
+        with measure(STEP_MODEL, index):
+            predicted = _WORKER_STATE["model"].fit_predict(
+                index, **_WORKER_STATE["fit_pred_kwargs"]
+            )
+        matrix = _register_volume(
+            dataset, index, predicted, _WORKER_STATE["backend"], _WORKER_STATE["warm_start"]
+        )
+
+    # Events are handed over to the instrumentation of the parent process
+    return matrix, instrumentation.events
+
+
+def _run_lovo_processes(
+    model: BaseModel,
+    dataset: BaseDataset,
+    indices: list[int],
+    fit_pred_kwargs: dict,
+    backend: RegistrationBackend,
+    max_workers: int,
+    warm_start: bool = False,
+    callback: Callable[[int, np.ndarray], Any] | None = None,
+) -> list[tuple[int, np.ndarray]]:
+    """
+    Process held-out volumes concurrently in a pool of worker processes.
+
+    The arrays of the dataset are placed in shared memory for the lifetime of
+    the pool, so workers attach to them instead of receiving a copy.
+    Transforms are not fed back into the dataset while the pool runs.
+    Events measured by the workers are forwarded to the active instrumentation.
+
+    Parameters
+    ----------
+    model : :obj:`~nifreeze.model.base.BaseModel`
+        The model generating the registration targets.
+    dataset : :obj:`~nifreeze.data.base.BaseDataset`
+        The dataset being realigned.
+    indices : :obj:`list` of :obj:`int`
+        Held-out indices, in the order given by the iterator.
+    fit_pred_kwargs : :obj:`dict`
+        Keyword arguments to :meth:`~nifreeze.model.base.BaseModel.fit_predict`.
+    backend : :obj:`~nifreeze.registration.base.RegistrationBackend`
+        The registration engine.
+    max_workers : :obj:`int`
+        Number of worker processes.
+    warm_start : :obj:`bool`, optional
+        Initialize registrations with the current transforms of the dataset.
+    callback : :obj:`callable`, optional
+        Called with the index and the matrix every time a volume is finished.
+
+    Returns
+    -------
+    :obj:`list` of :obj:`tuple`
+        The ``(index, matrix)`` pairs, in the order of ``indices``.
+
+    """
+    instrumentation = current_instrumentation()
+    with share_dataset(dataset):
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_lovo_worker,
+            initargs=(
+                model,
+                dataset,
+                fit_pred_kwargs,
+                backend,
+                warm_start,
+                instrumentation is not None,
+            ),
+        )
+        try:
+            futures = {executor.submit(_lovo_worker, index): index for index in indices}
+            for future in as_completed(futures):
+                matrix, events = future.result()
+                for event in events:
+                    instrumentation.emit(event)  # type: ignore[union-attr]
+                if callback is not None:
+                    callback(futures[future], matrix)
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    return [(index, future.result()[0]) for future, index in futures.items()]
@@ -27,20 +27,72 @@ from __future__ import annotations
 from typing import cast
 
 import numpy as np
+import numpy.typing as npt
 from dipy.core.gradients import GradientTable
 from dipy.reconst.base import ReconstModel
 from sklearn.gaussian_process import GaussianProcessRegressor
-from sklearn.gaussian_process.kernels import RBF, Kernel, WhiteKernel
+from sklearn.gaussian_process.kernels import RBF, Kernel, Sum, WhiteKernel
 
+from nifreeze.data.filtering import BVAL_ATOL
 from nifreeze.model.gpr import (
+    BlockedGPR,
     DiffusionGPR,
     ExponentialKriging,
     MultiShellKernel,
+    SparseGPR,
     SphericalKriging,
+    inducing_directions,
 )
+from nifreeze.model.loo import gp_loo
 
 GP_JITTER = 1e-10
 """Small nugget kept on ``alpha`` for numerical stability."""
+GP_APPROXIMATIONS = ("sor",)
+"""Supported low-rank approximations of the GP (subset of regressors)."""
+DEFAULT_INDUCING = 100
+"""Default number of inducing inputs of the sparse GP."""
+UNKNOWN_APPROXIMATION_ERROR_MSG = (
+    "Unknown GP approximation {approximation!r} (supported: {supported})."
+)
+"""Unknown GP approximation error message."""
+
+
+def stratified_subsample(
+    values: np.ndarray,
+    size: int,
+    seed: int | np.random.Generator | None = None,
+) -> np.ndarray:
+    """
+    Draw one element at random from each of ``size`` equally-populated strata.
+
+    The strata are consecutive ranges of ``values`` (e.g., the mean signal of
+    each voxel), so that the sample spans the whole distribution of values.
+
+    Parameters
+    ----------
+    values : :obj:`~numpy.ndarray`
+        The stratification variable of each element, shape (n,).
+    size : :obj:`int`
+        Number of elements to draw (at most ``n``).
+    seed : :obj:`int` or :obj:`~numpy.random.Generator`, optional
+        Seed of the random draws.
+
+    Returns
+    -------
+    :obj:`~numpy.ndarray`
+        Sorted indices of the drawn elements.
+
+    Examples
+    --------
+    >>> sample = stratified_subsample(np.arange(100.0), 10, seed=0)
+    >>> sample.size, np.all(sample // 10 == np.arange(10))
+    (10, np.True_)
+
+    """
+    values = np.ravel(values)
+    edges = np.linspace(0, values.size, min(size, values.size) + 1).astype(int)
+    picks = edges[:-1] + (np.random.default_rng(seed).random(edges.size - 1) * np.diff(edges))
+    return np.sort(np.argsort(values, kind="stable")[picks.astype(int)])
 
 
 def _btable_asarray(gtab: GradientTable | np.ndarray) -> np.ndarray:
@@ -55,8 +107,15 @@ def _btable_asarray(gtab: GradientTable | np.ndarray) -> np.ndarray:
     return components
 
 
+def _is_multishell(kernel: Kernel | None) -> bool:
+    """Whether the kernel consumes b-values (i.e., it is multi-shell)."""
+    if isinstance(kernel, Sum):
+        kernel = kernel.k1
+    return isinstance(kernel, MultiShellKernel)
+
+
 def gp_prediction(
-    model: GaussianProcessRegressor,
+    model: GaussianProcessRegressor | BlockedGPR | SparseGPR,
     gtab: GradientTable | np.ndarray,
     mask: np.ndarray | None = None,
     return_std: bool = False,
@@ -70,7 +129,8 @@ def gp_prediction(
 
     Parameters
     ----------
-    model : :obj:`~sklearn.gaussian_process.GaussianProcessRegressor`
+    model : :obj:`~sklearn.gaussian_process.GaussianProcessRegressor`, \
+            :obj:`~nifreeze.model.gpr.BlockedGPR` or :obj:`~nifreeze.model.gpr.SparseGPR`
         A fitted GaussianProcessRegressor model.
     gtab : :obj:`~dipy.core.gradients.GradientTable` or :obj:`~np.ndarray`
         Gradient table with one or more orientations at which the GP will be evaluated.
@@ -88,7 +148,7 @@ def gp_prediction(
 
     X = _btable_asarray(gtab)
     # Single-shell kernels consume orientations only; drop the b-value column.
-    if not isinstance(getattr(model, "kernel", None), MultiShellKernel):
+    if not _is_multishell(getattr(model, "kernel", None)):
         X = X[:, :3]
 
     # Check it's fitted as they do in sklearn internally
@@ -110,6 +170,12 @@ class GaussianProcessModel(ReconstModel):
         "kernel",
         "_modelfit",
         "sigma_sq",
+        "block_size",
+        "dtype",
+        "hyper_voxels",
+        "hyper_seed",
+        "approximation",
+        "n_inducing",
     )
 
     def __init__(
@@ -119,6 +185,12 @@ class GaussianProcessModel(ReconstModel):
         beta_a: float = 0.1,
         sigma_sq: float = 1.0,
         ell: float = 1.0,
+        block_size: int | None = None,
+        dtype: npt.DTypeLike | None = None,
+        hyper_voxels: int | None = None,
+        hyper_seed: int | None = 0,
+        approximation: str | None = None,
+        n_inducing: int = DEFAULT_INDUCING,
         *args,
         **kwargs,
     ) -> None:
@@ -154,6 +226,35 @@ class GaussianProcessModel(ReconstModel):
         ell : :obj:`float`, optional
             Radial (log-b) length scale for the multi-shell kernel (:math:`\\ell`
             in Eq. 15). Only used when ``kernel_model == "multishell"``.
+        block_size : :obj:`int`, optional
+            Fit with :obj:`~nifreeze.model.gpr.BlockedGPR`, which shares one
+            factorization of the covariance across voxels and processes this many
+            voxels at a time, bounding the working memory on large masks.
+            By default, all voxels are regressed at once by
+            :obj:`~nifreeze.model.gpr.DiffusionGPR`.
+        dtype : :obj:`~numpy.dtype`, optional
+            Floating-point type of the voxel blocks (e.g., ``"float32"``) and of
+            the predictions. Only used when ``block_size`` is set.
+        hyper_voxels : :obj:`int`, optional
+            Optimize the hyperparameters, which all voxels share, on this many
+            voxels, drawn from strata of their mean signal (see
+            :func:`stratified_subsample`); only the posterior of all voxels is then
+            computed with those hyperparameters.
+            By default, the hyperparameters are optimized on all voxels.
+        hyper_seed : :obj:`int`, optional
+            Seed of the draw of ``hyper_voxels``.
+        approximation : :obj:`str`, optional
+            Low-rank approximation of the GP for very dense q-space schemes (e.g.,
+            DSI): ``"sor"`` fits a subset-of-regressors
+            :obj:`~nifreeze.model.gpr.SparseGPR`, whose cost is linear (rather than
+            cubic) in the number of orientations.
+            By default, the GP is exact.
+        n_inducing : :obj:`int`, optional
+            Number of inducing inputs of the approximation: directions spread on a
+            hemisphere (see :func:`~nifreeze.model.gpr.inducing_directions`),
+            shared out across shells for the multi-shell kernel.
+            The exact GP is fitted when there are not more orientations than
+            inducing inputs.
 
         References
         ----------
@@ -164,6 +265,18 @@ class GaussianProcessModel(ReconstModel):
         ReconstModel.__init__(self, None)
 
         self.sigma_sq = sigma_sq
+        self.block_size = block_size
+        self.dtype = dtype
+        self.hyper_voxels = hyper_voxels
+        self.hyper_seed = hyper_seed
+        if approximation is not None and approximation not in GP_APPROXIMATIONS:
+            raise ValueError(
+                UNKNOWN_APPROXIMATION_ERROR_MSG.format(
+                    approximation=approximation, supported=", ".join(GP_APPROXIMATIONS)
+                )
+            )
+        self.approximation = approximation
+        self.n_inducing = n_inducing
 
         self.kernel: Kernel
         if kernel_model == "multishell":
@@ -171,6 +284,9 @@ class GaussianProcessModel(ReconstModel):
                 orientation_kernel=SphericalKriging(beta_a=beta_a, beta_l=beta_l),
                 radial_kernel=RBF(length_scale=ell),
             )
+            if approximation is not None:
+                # The approximation takes the noise from a WhiteKernel summand
+                self.kernel = self.kernel + WhiteKernel(noise_level=sigma_sq)
         else:
             KernelType = SphericalKriging if kernel_model == "spherical" else ExponentialKriging
             # Add the :math:`\sigma^2` term of Andersson et al. (2015) as a WhiteKernel
@@ -185,6 +301,8 @@ class GaussianProcessModel(ReconstModel):
         gtab: GradientTable | np.ndarray,
         mask: np.ndarray | None = None,
         random_state: int = 0,
+        theta: np.ndarray | None = None,
+        **kwargs,
     ) -> GPFit:
         """Fit method of the DTI model class
 
@@ -200,6 +318,12 @@ class GaussianProcessModel(ReconstModel):
         random_state: :obj:`int`, optional
             Determines random number generation used to initialize the centers
             of the kernel bounds.
+        theta : :obj:`~numpy.ndarray`, optional
+            Initial (log-transformed) hyperparameters of the optimization, e.g.,
+            the ``kernel_.theta`` of a previous fit, instead of those of the kernel.
+        **kwargs
+            Optimizer settings (e.g., ``tol`` or ``maxiter``) forwarded to
+            :obj:`~nifreeze.model.gpr.DiffusionGPR`.
 
         Returns
         -------
@@ -213,7 +337,7 @@ class GaussianProcessModel(ReconstModel):
         # ([gx, gy, gz, bval]) for the multi-shell kernel; single-shell kernels
         # consume orientations only, so the b-value column is dropped.
         X = _btable_asarray(gtab)
-        if not isinstance(self.kernel, MultiShellKernel):
+        if not _is_multishell(self.kernel):
             X = X[:, :3]
 
         # Data must have shape (n_samples, n_targets) where n_samples is
@@ -229,18 +353,57 @@ class GaussianProcessModel(ReconstModel):
                 f"and gradient table ({grad_dirs})."
             )
 
-        gpr = DiffusionGPR(
-            kernel=self.kernel,
-            random_state=random_state,
-            n_targets=y.shape[1],
-            alpha=GP_JITTER,
-        )
+        kernel = self.kernel if theta is None else self.kernel.clone_with_theta(theta)
+        subset = None
+        if self.hyper_voxels and self.hyper_voxels < y.shape[1]:
+            # Optimize the (shared) hyperparameters on a stratified subset of
+            # voxels, then keep them fixed in the posterior of all voxels.
+            subset = stratified_subsample(y.mean(axis=0), self.hyper_voxels, self.hyper_seed)
+            hyper = self._regressor(kernel, X, subset.size, random_state=random_state, **kwargs)
+            hyper.fit(X, y[:, subset])
+            kernel, kwargs = hyper.kernel_, {**kwargs, "optimizer": None}
+
+        gpr = self._regressor(kernel, X, y.shape[1], random_state=random_state, **kwargs)
+        gpr.fit(X, y)
         self._modelfit = GPFit(
-            model=gpr.fit(X, y),
+            model=gpr,
             mask=mask,
+            subset=subset,
+            n_iter=getattr(gpr if subset is None else hyper, "n_iter_", None),
         )
         return self._modelfit
 
+    def _regressor(
+        self, kernel: Kernel, X: np.ndarray, n_targets: int, **kwargs
+    ) -> DiffusionGPR | BlockedGPR | SparseGPR:
+        """Create the GP regressor of ``n_targets`` voxels at the inputs ``X``."""
+        if self.approximation == "sor" and self.n_inducing < X.shape[0]:
+            return SparseGPR(kernel=kernel, inducing=self._inducing(X), alpha=GP_JITTER, **kwargs)
+        if self.block_size:
+            return BlockedGPR(
+                kernel=kernel,
+                block_size=self.block_size,
+                dtype=self.dtype,
+                alpha=GP_JITTER,
+                **kwargs,
+            )
+        return DiffusionGPR(kernel=kernel, n_targets=n_targets, alpha=GP_JITTER, **kwargs)
+
+    def _inducing(self, X: np.ndarray) -> np.ndarray:
+        """Spread the inducing inputs over the hemisphere (and across shells)."""
+        if X.shape[1] == 3:
+            return inducing_directions(self.n_inducing)
+
+        shells = np.unique(np.round(X[:, 3] / BVAL_ATOL) * BVAL_ATOL)
+        if (n_shells := max(1, min(shells.size, int(np.sqrt(self.n_inducing))))) < shells.size:
+            # Too many b-values (e.g., DSI): take quantiles of the log-b distribution.
+            shells = np.exp(np.quantile(np.log(X[:, 3]), (np.arange(n_shells) + 0.5) / n_shells))
+
+        directions = inducing_directions(-(-self.n_inducing // shells.size))
+        return np.column_stack(
+            (np.tile(directions, (shells.size, 1)), np.repeat(shells, len(directions)))
+        )
+
     def predict(
         self,
         gtab: GradientTable | np.ndarray,
@@ -272,31 +435,46 @@ class GPFit:
 
     Attributes
     ----------
-    model : :obj:`~sklearn.gaussian_process.GaussianProcessRegressor`
+    model : :obj:`~sklearn.gaussian_process.GaussianProcessRegressor`, \
+            :obj:`~nifreeze.model.gpr.BlockedGPR` or :obj:`~nifreeze.model.gpr.SparseGPR`
         The fitted Gaussian process regressor object.
     mask : :obj:`~numpy.ndarray`
         The boolean mask used during fitting (can be :obj:`None`).
+    subset : :obj:`~numpy.ndarray`
+        Indices of the voxels the hyperparameters were optimized on
+        (:obj:`None` if all of them).
+    n_iter : :obj:`int`
+        Iterations of the hyperparameter optimization (:obj:`None` if unknown).
 
     """
 
     def __init__(
         self,
-        model: GaussianProcessRegressor,
+        model: GaussianProcessRegressor | BlockedGPR | SparseGPR,
         mask: np.ndarray | None = None,
+        subset: np.ndarray | None = None,
+        n_iter: int | None = None,
     ) -> None:
         """
         Initialize a Gaussian Process fit container.
 
         Parameters
         ----------
-        model : :obj:`~sklearn.gaussian_process.GaussianProcessRegressor`
+        model : :obj:`~sklearn.gaussian_process.GaussianProcessRegressor`, \
+                :obj:`~nifreeze.model.gpr.BlockedGPR` or :obj:`~nifreeze.model.gpr.SparseGPR`
             The fitted Gaussian process regressor object.
         mask : :obj:`~numpy.ndarray`, optional
             The boolean mask used during fitting.
+        subset : :obj:`~numpy.ndarray`, optional
+            Indices of the voxels the hyperparameters were optimized on.
+        n_iter : :obj:`int`, optional
+            Iterations of the hyperparameter optimization.
 
         """
         self.model = model
         self.mask = mask
+        self.subset = subset
+        self.n_iter = n_iter
 
     def predict(
         self,
@@ -317,3 +495,24 @@ class GPFit:
 
         """
         return gp_prediction(self.model, gtab, mask=self.mask)
+
+    def loo_predict(self) -> np.ndarray:
+        """
+        Predict every training orientation from the fit of all others.
+
+        The hyperparameters are not re-optimized for each left-out orientation,
+        so that all predictions follow in closed form from the covariance
+        factorized by the fit (see :func:`~nifreeze.model.loo.gp_loo`).
+
+        Returns
+        -------
+        :obj:`~numpy.ndarray`
+            Predictions, shape (n_orientations, n_voxels).
+
+        """
+        model = self.model
+        if isinstance(model, (BlockedGPR, SparseGPR)):
+            return model.loo_predict()
+
+        data = model.y_train_ * model._y_train_std + model._y_train_mean
+        return gp_loo(model.L_, data, center=model.normalize_y)
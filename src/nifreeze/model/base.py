@@ -23,6 +23,8 @@
 """Base infrastructure for nifreeze's models."""
 
 from abc import ABC, ABCMeta, abstractmethod
+from inspect import getattr_static
+from types import MemberDescriptorType
 from warnings import warn
 
 import numpy as np
@@ -47,6 +49,64 @@ class SingleFitCanaryWarning(UserWarning):
     """Single-fit for this model only makes sense as a self-consistency canary."""
 
 
+def _loo_statistics(data: np.ndarray, stat: str) -> tuple[int, np.ndarray]:
+    """Compute the statistics of N volumes sufficient to summarize any N - 1 of them.
+
+    Parameters
+    ----------
+    data : :obj:`~numpy.ndarray`
+        Volumes, stacked along the last axis.
+    stat : :obj:`str`
+        Either ``"mean"`` (the sum is kept) or ``"median"`` (the two or three middle
+        order statistics, found by partial sorting, are kept along the last axis).
+
+    Returns
+    -------
+    :obj:`tuple`
+        The number N of volumes and their statistics.
+
+    """
+    n = data.shape[-1]
+    if stat == "mean":
+        return n, data.sum(axis=-1, dtype=np.float64)
+
+    kth = [n // 2 - 1, n // 2] if n % 2 == 0 else [n // 2 - 1, n // 2, n // 2 + 1]
+    return n, np.partition(data, kth, axis=-1)[..., kth]
+
+
+def _loo_summary(statistics: tuple[int, np.ndarray], heldout: np.ndarray, stat: str) -> np.ndarray:
+    """Summarize N volumes but the held-out one, from their :func:`_loo_statistics`.
+
+    Examples
+    --------
+    >>> data = np.array([[4.0, 1.0, 3.0, 2.0, 5.0], [1.0, 1.0, 2.0, 9.0, 1.0]])
+    >>> for stat in ("mean", "median"):
+    ...     statistics = _loo_statistics(data, stat)
+    ...     summary = [_loo_summary(statistics, data[:, i], stat) for i in range(5)]
+    ...     expected = [getattr(np, stat)(np.delete(data, i, -1), -1) for i in range(5)]
+    ...     print(stat, np.allclose(summary, expected))
+    mean True
+    median True
+
+    """
+    n, values = statistics
+    if stat == "mean":
+        dtype = heldout.dtype if np.issubdtype(heldout.dtype, np.floating) else np.float64
+        return ((values - heldout) / (n - 1)).astype(dtype)
+
+    # The median of N - 1 volumes only depends on how the held-out one ranks
+    # against the middle order statistics of all N
+    if n % 2 == 0:
+        return np.where(heldout <= values[..., 0], values[..., 1], values[..., 0])
+
+    low, middle, high = values[..., 0], values[..., 1], values[..., 2]
+    return np.where(
+        heldout <= low,
+        (middle + high) / 2,
+        np.where(heldout >= high, (low + middle) / 2, (low + high) / 2),
+    )
+
+
 class ModelFactory:
     """A factory for instantiating data models."""
 
@@ -63,7 +123,8 @@ class ModelFactory:
             ``"AverageDWI"``. ``"GP"`` (aliases ``"GPR"``,
             ``"GaussianProcess"``) builds a
             :obj:`~nifreeze.model.dmri.GPModel`; pass ``kernel_model`` through
-            ``kwargs`` to select the covariance.
+            ``kwargs`` to select the covariance, and ``approximation="sor"``
+            for a sparse GP on very dense q-space schemes.
 
         Return
         ------
@@ -74,21 +135,39 @@ class ModelFactory:
         if model is None:
             raise RuntimeError("No model identifier provided.")
 
+        return ModelFactory.get_class(model)(kwargs.pop("dataset"), **kwargs)
+
+    @staticmethod
+    def get_class(model: str) -> "type[BaseModel]":
+        """
+        Look up the class of a model by its name (see :meth:`init`).
+
+        Parameters
+        ----------
+        model : :obj:`str`
+            Model identifier.
+
+        Return
+        ------
+        model_class : :obj:`type`
+            The class of the model.
+
+        """
         if model.lower() == "trivial":
-            return TrivialModel(kwargs.pop("dataset"), **kwargs)
+            return TrivialModel
 
         if model.lower() in ("avg", "average", "mean"):
-            return ExpectationModel(kwargs.pop("dataset"), **kwargs)
+            return ExpectationModel
 
         if model.lower() in ("avgdwi", "averagedwi", "meandwi"):
             from nifreeze.model.dmri import AverageDWIModel
 
-            return AverageDWIModel(kwargs.pop("dataset"), **kwargs)
+            return AverageDWIModel
 
         if model.lower() in ("gp", "gpr", "gaussianprocess"):
             from nifreeze.model.dmri import GPModel
 
-            return GPModel(kwargs.pop("dataset"), **kwargs)
+            return GPModel
 
         if model.lower() in ("gqi", "dti", "dki", "pet"):
             from importlib import import_module
@@ -96,8 +175,7 @@ class ModelFactory:
             thismod = import_module(
                 f"nifreeze.model.{'pet' if model.lower() == 'pet' else 'dmri'}"
             )
-            Model = getattr(thismod, f"{model.upper()}Model")
-            return Model(kwargs.pop("dataset"), **kwargs)
+            return getattr(thismod, f"{model.upper()}Model")
 
         raise NotImplementedError(UNSUPPORTED_MODEL_ERROR_MSG.format(model=model))
 
@@ -138,6 +216,24 @@ class BaseModel(ABC):
         if dataset.brainmask is None:
             warn(MASK_ABSENCE_WARN_MSG, stacklevel=2)
 
+    def __getstate__(self) -> tuple[dict | None, dict]:
+        """
+        State of the model, for copying and pickling.
+
+        Slots that a subclass shadows with a class attribute (e.g., ``_model_class``)
+        are constants that cannot be set on instances, and are left out.
+
+        """
+        cls = type(self)
+        names = {name for klass in cls.__mro__ for name in getattr(klass, "__slots__", ())}
+        slots = {
+            name: getattr(self, name)
+            for name in names
+            if isinstance(getattr_static(cls, name, None), MemberDescriptorType)
+            and hasattr(self, name)
+        }
+        return getattr(self, "__dict__", None), slots
+
     @abstractmethod
     def fit_predict(self, index: int | None = None, **kwargs) -> np.ndarray | None:
         """
@@ -196,12 +292,14 @@ class TrivialModel(BaseModel):
 class ExpectationModel(BaseModel):
     """A trivial model that returns an expectation map (for example, average)."""
 
-    __slots__ = ("_stat",)
+    __slots__ = ("_stat", "_loo")
 
     def __init__(self, dataset, stat="median", **kwargs):
         """Initialize a new model."""
         super().__init__(dataset, **kwargs)
         self._stat = stat
+        # Statistics of the volumes summarized by each LOVO fold, by statistic and volumes
+        self._loo: dict[tuple[str, bytes], tuple[int, np.ndarray]] = {}
 
     def fit_predict(self, index: int | None = None, **kwargs) -> np.ndarray:
         """
@@ -218,15 +316,43 @@ class ExpectationModel(BaseModel):
             return self._locked_fit
 
         # Select the summary statistic
-        avg_func = getattr(np, kwargs.pop("stat", self._stat))
+        stat = kwargs.pop("stat", self._stat)
+        avg_func = getattr(np, stat)
 
         # Create index mask
         index_mask = np.ones(len(self._dataset), dtype=bool)
 
         if index is not None:
+            predicted = self._loo_predict(index, index_mask, stat)
+            if predicted is not None:
+                return predicted
+
             index_mask[index] = False
             # Calculate the average
             return avg_func(self._dataset[index_mask][0], axis=-1)
 
         self._locked_fit = avg_func(self._dataset[index_mask][0], axis=-1)
         return self._locked_fit
+
+    def _loo_predict(self, index: int, volumes: np.ndarray, stat: str) -> np.ndarray | None:
+        """Summarize the ``volumes`` (a mask including ``index``) but the held-out one.
+
+        The statistics of all the volumes are computed on the first call (see
+        :func:`_loo_statistics`), so that each fold only reads its held-out volume.
+        Returns :obj:`None` if the statistic is neither the mean nor the median, if
+        fewer than two volumes are summarized, or if the dataset is resampled in
+        place as it is realigned (the cached statistics would go stale).
+
+        """
+        if (
+            stat not in ("mean", "median")
+            or volumes.sum() < 2
+            or getattr(self._dataset, "resamples_on_transform", False)
+        ):
+            return None
+
+        key = (stat, volumes.tobytes())
+        if key not in self._loo:
+            self._loo[key] = _loo_statistics(self._dataset[volumes][0], stat)
+
+        return _loo_summary(self._loo[key], self._dataset[index][0], stat)
@@ -25,13 +25,16 @@ from importlib import import_module
 from typing import Any, Union
 
 import numpy as np
-from dipy.core.gradients import check_multi_b, gradient_table_from_bvals_bvecs
+from dipy.core.gradients import GradientTable, check_multi_b, gradient_table_from_bvals_bvecs
+from dipy.reconst.dti import MIN_POSITIVE_SIGNAL, from_lower_triangular, lower_triangular
 from joblib import Parallel, delayed
 
 from nifreeze.data.dmri import DWI
 from nifreeze.data.dmri.utils import DEFAULT_LOWB_THRESHOLD, DEFAULT_MIN_S0, DTI_MIN_ORIENTATIONS
 from nifreeze.data.filtering import BVAL_ATOL, dwi_select_shells, grand_mean_normalization
 from nifreeze.model.base import BaseModel, ExpectationModel
+from nifreeze.model.loo import lstsq_loo
+from nifreeze.utils.instrumentation import STEP_FIT, STEP_PREDICT, measure
 
 DEFAULT_S0_CLIP_PERCENTILE = 98
 """Upper percentile threshold for non-diffusion-weighted signal estimation."""
@@ -44,6 +47,19 @@ DWI_SIZE_ERROR_MSG = "DWI dataset is too small ({directions} directions)."
 DWI_DKI_SHELL_ERROR_MSG = """\
 DKI requires at least 3 b-values (which can include b=0)."""
 """dMRI dataset DKI model insufficient shells error message."""
+CLOSED_FORM_FIT_METHODS = {
+    "OLS": False,
+    "OLLS": False,
+    "LS": False,
+    "LLS": False,
+    "ULLS": False,
+    "WLS": True,
+    "WLLS": True,
+    "UWLLS": True,
+}
+"""Log-linear fit methods with a closed-form LOVO solution, and whether they are weighted."""
+DEFAULT_LOVO_STEP = 1000
+"""Voxels solved at once by the closed-form LOVO fit, unless a ``step`` is given."""
 
 
 def _exec_fit(model, data, chunk=None, **kwargs):
@@ -55,6 +71,40 @@ def _exec_predict(model, chunk=None, **kwargs):
     return np.squeeze(model.predict(**kwargs)), chunk
 
 
+def _floor_diffusivities(coef: np.ndarray, min_diffusivity: np.ndarray) -> None:
+    """Floor the eigenvalues of fitted diffusion tensors in place, as DIPY does.
+
+    Parameters
+    ----------
+    coef : :obj:`~numpy.ndarray`
+        Log-linear coefficients, shape (V, N, P), of V voxels fitted N times: the
+        lower-triangular tensor elements first, then (DKI only) the kurtosis
+        elements scaled by the squared mean diffusivity, and last the log-S0 term.
+    min_diffusivity : :obj:`~numpy.ndarray`
+        Eigenvalue floor of each of the N fits.
+
+    """
+    tensors = from_lower_triangular(coef[..., :6])
+    shifted = tensors - min_diffusivity[:, np.newaxis, np.newaxis] * np.eye(3)
+    # Sylvester's criterion singles out the (few) tensors needing an eigendecomposition
+    minor = shifted[..., 0, 0] * shifted[..., 1, 1] - shifted[..., 0, 1] ** 2
+    with np.errstate(invalid="ignore"):  # Volumes that cannot be held out are NaN
+        floored = ~((shifted[..., 0, 0] > 0) & (minor > 0) & (np.linalg.det(shifted) > 0))
+    floored &= np.isfinite(coef).all(axis=-1)
+    if not floored.any():
+        return
+
+    evals, evecs = np.linalg.eigh(tensors[floored])
+    evals = np.maximum(evals, np.broadcast_to(min_diffusivity, floored.shape)[floored, None])
+    coef[floored, :6] = lower_triangular(
+        (evecs * evals[:, np.newaxis, :]) @ evecs.swapaxes(-1, -2)
+    )
+    # The kurtosis of a tensor without mean diffusivity is zeroed
+    isotropic = np.zeros_like(floored)
+    isotropic[floored] = evals.sum(axis=-1) == 0
+    coef[isotropic, 6:-1] = 0.0
+
+
 def _compute_data_mask(
     shape: tuple,
     brainmask: np.ndarray | None = None,
@@ -196,6 +246,11 @@ class BaseDWIModel(BaseModel):
     """Whether the model requires more than one non-zero shell."""
     excludes_b0: bool = False
     """Whether ``b=0`` volumes are excluded from fitting/prediction."""
+    _design_matrix: str | None = None
+    """DIPY design-matrix function of a log-linear model, which enables the closed-form
+    LOVO fit (see :meth:`_lovo_predict`)."""
+    _diffusivity_tol: float = 0.0
+    """Floor of the tensor eigenvalues, relative to the largest b-value of the fit."""
 
     __slots__ = {
         "_max_b": "The maximum b-value supported by the model",
@@ -205,15 +260,28 @@ class BaseDWIModel(BaseModel):
         "_modelargs": "Arguments acceptable by the underlying DIPY-like model",
         "_model_kwargs": "Construction kwargs (filtered by ``_modelargs``) forwarded to the model",
         "_models": "List with one or more (if parallel execution) model instances",
+        "_lovo": "Closed-form LOVO predictions of all volumes, and the settings they came from",
+        "_closed_form_wls": "Whether weighted fits are also predicted in closed form",
     }
 
-    def __init__(self, dataset: DWI, max_b: float | int | None = None, **kwargs):
+    def __init__(
+        self,
+        dataset: DWI,
+        max_b: float | int | None = None,
+        closed_form_wls: bool = False,
+        **kwargs,
+    ):
         """Initialization.
 
         Parameters
         ----------
         dataset : :obj:`~nifreeze.data.dmri.base.DWI`
             Reference to a DWI object.
+        closed_form_wls : :obj:`bool`, optional
+            Also predict weighted least-squares fits (e.g., ``fit_method="WLS"``)
+            in closed form. The weights then come from a fit of all volumes, so the
+            held-out volume leaks into its own prediction; by default, weighted fits
+            are refitted without the held-out volume.
 
         """
 
@@ -260,6 +328,8 @@ class BaseDWIModel(BaseModel):
 
         # Fitted model instance(s); populated in ``_fit``.
         self._models: list[Any] = []
+        self._lovo: tuple[tuple, np.ndarray] | None = None
+        self._closed_form_wls = closed_form_wls
 
         # Persist the model-construction kwargs declared in ``_modelargs`` (e.g.
         # ``method``, ``sampling_length``, ``recursion_level``). ``BaseModel``
@@ -271,35 +341,26 @@ class BaseDWIModel(BaseModel):
 
         super().__init__(dataset, **kwargs)
 
-    def _fit(self, index: int | None = None, n_jobs: int | None = None, **kwargs) -> int:
-        """Fit the model chunk-by-chunk asynchronously"""
-
-        if self._locked_fit is not None:
-            return len(self._models)
-
+    def _training_data(
+        self, idxmask: np.ndarray, dtype: str | None = None
+    ) -> tuple[np.ndarray, GradientTable]:
+        """Gather the masked voxels and the gradient table of the fitted volumes."""
         brainmask = self._dataset.brainmask
-        idxmask = np.ones(len(self._dataset), dtype=bool)
-
-        if index is not None:
-            idxmask[index] = False
-        else:
-            self._locked_fit = True
-            self._warn_single_fit_canary()
 
         data, _, gtab = self._dataset[idxmask]
         # Select voxels within mask or just unravel 3D if no mask
         data = data[brainmask, ...] if brainmask is not None else data.reshape(-1, data.shape[-1])
+        if dtype is not None and data.dtype.itemsize > np.dtype(dtype).itemsize:
+            # Trade precision for memory (see :func:`~nifreeze.utils.tuning.plan_execution`)
+            data = data.astype(dtype)
 
         # Replace the gradient table with a DIPY object
         gtab = gradient_table_from_bvals_bvecs(gtab[:, -1], gtab[:, :-1])
 
-        model_str = getattr(self, "_model_class", "")
-
         # Append the b0 (if existing) to the gradients and the data for the
         # kurtosis model.
         # Appending instead of prepending avoids index manipulation.
-        is_dki = "DiffusionKurtosisModel" in model_str
-        if is_dki:
+        if "DiffusionKurtosisModel" in getattr(self, "_model_class", ""):
             bzero = self._dataset.bzero
             if bzero is not None:
                 bzero = (
@@ -309,6 +370,31 @@ class BaseDWIModel(BaseModel):
                 )
             data, gtab = _append_bzero(data, gtab, bzero=bzero)
 
+        return data, gtab
+
+    def _fit(
+        self,
+        index: int | None = None,
+        n_jobs: int | None = None,
+        dtype: str | None = None,
+        **kwargs,
+    ) -> int:
+        """Fit the model chunk-by-chunk asynchronously"""
+
+        if self._locked_fit is not None:
+            return len(self._models)
+
+        idxmask = np.ones(len(self._dataset), dtype=bool)
+
+        if index is not None:
+            idxmask[index] = False
+        else:
+            self._locked_fit = True
+            self._warn_single_fit_canary()
+
+        data, gtab = self._training_data(idxmask, dtype=dtype)
+        model_str = getattr(self, "_model_class", "")
+
         n_jobs = n_jobs or 1
         if not model_str:
             raise NotImplementedError(f"{model_str} not implemented.")
@@ -346,6 +432,110 @@ class BaseDWIModel(BaseModel):
 
         return n_jobs
 
+    def _lovo_predict(self, index: int, dtype: str | None = None, **kwargs) -> np.ndarray | None:
+        """Predict a held-out volume without refitting, if the fit is log-linear.
+
+        All volumes are predicted at once, on the first call, from the least-squares
+        fit of the log-signal of every volume, downdated by each held-out volume
+        (see :func:`~nifreeze.model.loo.lstsq_loo`).
+        The downdate is exact for ordinary least squares.
+        Weighted least squares are only predicted in closed form if the model was
+        created with ``closed_form_wls=True``: they keep the weights of the fit of
+        all volumes, whereas a refit would re-estimate them without the held-out volume.
+
+        Returns :obj:`None` if the model must be refitted instead (e.g., because
+        of a nonlinear or weighted ``fit_method``).
+
+        """
+        if self._design_matrix is None:
+            return None
+
+        model_kwargs = {
+            **self._model_kwargs,
+            **{key: kwargs[key] for key in getattr(self, "_modelargs", ()) if key in kwargs},
+        }
+        fit_method = model_kwargs.pop("fit_method", "WLS")
+        min_signal = model_kwargs.pop("min_signal", None) or MIN_POSITIVE_SIGNAL
+        # Neither the chunking nor the S0 estimate change the predicted signal
+        model_kwargs.pop("step", None)
+        model_kwargs.pop("return_S0_hat", None)
+        if (
+            model_kwargs
+            or not isinstance(fit_method, str)
+            or fit_method.upper() not in CLOSED_FORM_FIT_METHODS
+            or (CLOSED_FORM_FIT_METHODS[fit_method.upper()] and not self._closed_form_wls)
+        ):
+            return None
+
+        settings = (CLOSED_FORM_FIT_METHODS[fit_method.upper()], min_signal)
+        if self._lovo is None or self._lovo[0] != settings:
+            self._lovo = (
+                settings,
+                self._fit_lovo(
+                    *settings, step=kwargs.get("step") or DEFAULT_LOVO_STEP, dtype=dtype
+                ),
+            )
+
+        attenuation = self._lovo[1][:, index]
+        return self._S0 * attenuation if np.isfinite(attenuation).all() else None
+
+    def _fit_lovo(
+        self, weighted: bool, min_signal: float, step: int, dtype: str | None = None
+    ) -> np.ndarray:
+        """Compute the signal attenuation of every volume held out, shape (voxels, volumes)."""
+        data, gtab = self._training_data(np.ones(len(self._dataset), dtype=bool), dtype=dtype)
+        module_name, func_name = str(self._design_matrix).rsplit(".", 1)
+        design = getattr(import_module(module_name), func_name)(gtab)
+
+        # DKI appends the b=0 reference, which is never held out
+        n_volumes = len(self._dataset)
+        min_diffusivity = self._diffusivity_tol / -np.array(
+            [np.delete(design, index, axis=0).min() for index in range(n_volumes)]
+        )
+
+        attenuation = np.empty(
+            (data.shape[0], n_volumes), dtype=np.result_type(data.dtype, np.float32)
+        )
+        for start in range(0, data.shape[0], step):
+            logdata = np.log(np.maximum(data[start : start + step], min_signal))
+            # Weighted fits are weighted by the squared signal predicted by OLS
+            weights = (
+                np.exp(2.0 * (logdata @ np.linalg.pinv(design).T) @ design.T) if weighted else None
+            )
+            coef = lstsq_loo(design, logdata, weights)[:, :n_volumes]
+            _floor_diffusivities(coef, min_diffusivity)
+            attenuation[start : start + step] = np.exp(
+                np.einsum("vnp,np->vn", coef[..., :-1], design[:n_volumes, :-1])
+            )
+
+        return attenuation
+
+    def _predict(self, gtab: GradientTable, n_models: int, **kwargs) -> np.ndarray:
+        """Predict the signal of the masked voxels, chunk-by-chunk in parallel."""
+        if n_models == 1:
+            predicted, _ = _exec_predict(
+                self._models[0], **(kwargs | {"gtab": gtab, "S0": self._S0})
+            )
+            return predicted
+
+        predicted = [None] * n_models
+        S0 = np.array_split(self._S0, n_models)
+
+        # Parallelize process with joblib
+        with Parallel(n_jobs=n_models) as executor:
+            results = executor(
+                delayed(_exec_predict)(
+                    model,
+                    chunk=i,
+                    **(kwargs | {"gtab": gtab, "S0": S0[i]}),
+                )
+                for i, model in enumerate(self._models)
+            )
+        for subprediction, rindex in results:
+            predicted[rindex] = subprediction
+
+        return np.hstack(predicted)
+
     def fit_predict(self, index: int | None = None, **kwargs) -> Union[np.ndarray, None]:
         """
         Predict asynchronously chunk-by-chunk the diffusion signal.
@@ -358,48 +548,34 @@ class BaseDWIModel(BaseModel):
         """
 
         kwargs.pop("omp_nthreads", None)  # Drop omp_nthreads
-        n_models = self._fit(
-            index,
-            n_jobs=kwargs.pop("n_jobs", None),
-            **kwargs,
-        )
+        n_jobs = kwargs.pop("n_jobs", None)
+        dtype = kwargs.pop("dtype", None)
+        with measure(STEP_FIT, index):
+            predicted = (
+                self._lovo_predict(index, dtype=dtype, **kwargs)
+                if index is not None and self._locked_fit is None
+                else None
+            )
+            if predicted is None:
+                n_models = self._fit(index, n_jobs=n_jobs, dtype=dtype, **kwargs)
 
         if index is None:
             return None
 
-        # Model-construction kwargs (consumed by ``_fit``) must not leak into
-        # ``predict``, which would raise an unexpected-keyword ``TypeError``.
-        _modelargs = getattr(self, "_modelargs", ())
-        kwargs = {key: value for key, value in kwargs.items() if key not in _modelargs}
-
-        gradient = self._dataset.gradients[index, :]
+        if predicted is None:
+            # Model-construction kwargs (consumed by ``_fit``) must not leak into
+            # ``predict``, which would raise an unexpected-keyword ``TypeError``.
+            _modelargs = getattr(self, "_modelargs", ())
+            kwargs = {key: value for key, value in kwargs.items() if key not in _modelargs}
 
-        gradient = gradient_table_from_bvals_bvecs(
-            gradient[np.newaxis, -1], gradient[np.newaxis, :-1]
-        )
+            gradient = self._dataset.gradients[index, :]
 
-        if n_models == 1:
-            predicted, _ = _exec_predict(
-                self._models[0], **(kwargs | {"gtab": gradient, "S0": self._S0})
+            gradient = gradient_table_from_bvals_bvecs(
+                gradient[np.newaxis, -1], gradient[np.newaxis, :-1]
             )
-        else:
-            predicted = [None] * n_models
-            S0 = np.array_split(self._S0, n_models)
-
-            # Parallelize process with joblib
-            with Parallel(n_jobs=n_models) as executor:
-                results = executor(
-                    delayed(_exec_predict)(
-                        model,
-                        chunk=i,
-                        **(kwargs | {"gtab": gradient, "S0": S0[i]}),
-                    )
-                    for i, model in enumerate(self._models)
-                )
-            for subprediction, rindex in results:
-                predicted[rindex] = subprediction
 
-            predicted = np.hstack(predicted)
+            with measure(STEP_PREDICT, index):
+                predicted = self._predict(gradient, n_models, **kwargs)
 
         out_dtype = np.result_type(predicted.dtype, np.float32)
         retval = np.zeros(self._data_mask.shape, dtype=out_dtype)
@@ -461,6 +637,14 @@ class AverageDWIModel(ExpectationModel):
                 atol_low=self._atol_low,
                 atol_high=self._atol_high,
             )
+            if not self._detrend:
+                # The held-out volume falls within its own shell
+                volumes = shellmask.copy()
+                volumes[index] = True
+                predicted = self._loo_predict(index, volumes, self._stat)
+                if predicted is not None:
+                    return predicted
+
             shelldata = self._dataset.dataobj[..., shellmask]
 
         # Regress out global signal differences
@@ -486,8 +670,11 @@ class DTIModel(BaseDWIModel):
         "weighting",
         "sigma",
         "jac",
+        "step",
     )
     _model_class = "dipy.reconst.dti.TensorModel"
+    _design_matrix = "dipy.reconst.dti.design_matrix"
+    _diffusivity_tol = 1e-6
 
 
 class DKIModel(BaseDWIModel):
@@ -496,8 +683,9 @@ class DKIModel(BaseDWIModel):
     requires_multishell = True
     applicable_schemes = frozenset({"multi-shell"})
 
-    _modelargs = DTIModel._modelargs
+    _modelargs = tuple(arg for arg in DTIModel._modelargs if arg != "step")
     _model_class = "nifreeze.model.dki.DiffusionKurtosisModel"
+    _design_matrix = "dipy.reconst.dki.design_matrix"
 
 
 class GQIModel(BaseDWIModel):
@@ -513,9 +701,48 @@ class GQIModel(BaseDWIModel):
         "sampling_length",
         "sphere",
         "recursion_level",
+        "spectral_energy",
     )
     _model_class = "nifreeze.model.gqi.GeneralizedQSamplingModel"
 
+    __slots__ = {
+        "_kernels": "Gram matrix of the GQI kernel of all volumes, and the settings it came from",
+    }
+
+    def __init__(self, dataset: DWI, **kwargs):
+        super().__init__(dataset, **kwargs)
+        self._kernels: tuple[tuple, Any] | None = None
+
+    def _lovo_predict(self, index: int, dtype: str | None = None, **kwargs) -> np.ndarray | None:
+        """Predict a held-out volume without rebuilding the GQI kernels.
+
+        The forward kernel and its Gram matrix are computed for all volumes on the
+        first call, and each held-out volume is predicted by the fused operator
+        sliced from them (see :class:`~nifreeze.model.gqi.LOVOKernel`), which
+        equals the operator of a refit.
+        Since no fold rebuilds the kernels, ``spectral_energy`` (which truncates the
+        kernel of each refit) does not apply here: held-out volumes are predicted
+        exactly.
+
+        """
+        from nifreeze.model.gqi import LOVOKernel
+
+        model_kwargs = {
+            **self._model_kwargs,
+            **{key: kwargs[key] for key in self._modelargs if key in kwargs},
+        }
+        model_kwargs.pop("spectral_energy", None)
+        settings = tuple(sorted(model_kwargs.items()))
+        if self._kernels is None or self._kernels[0] != settings:
+            gradients = self._dataset.gradients
+            gtab = gradient_table_from_bvals_bvecs(gradients[:, -1], gradients[:, :-1])
+            self._kernels = (settings, LOVOKernel(gtab, **model_kwargs))
+
+        idxmask = np.ones(len(self._dataset), dtype=bool)
+        idxmask[index] = False
+        data, _ = self._training_data(idxmask, dtype=dtype)
+        return np.maximum(data @ self._kernels[1].operator(index)[0], 0)
+
 
 class GPModel(BaseDWIModel):
     """A wrapper of :obj:`~nifreeze.model.dipy.GaussianProcessModel`.
@@ -527,51 +754,159 @@ class GPModel(BaseDWIModel):
     therefore overridden here rather than reusing the chunked DIPY path.
     """
 
-    applicable_schemes = frozenset({"single-shell", "multi-shell"})
+    # DSI and very dense schemes call for ``approximation="sor"``
+    applicable_schemes = frozenset({"single-shell", "multi-shell", "DSI"})
     # The GP interpolates the signal, so single-fit reproduces held-in volumes.
     single_fit_is_canary = True
 
-    _modelargs = ("kernel_model", "beta_l", "beta_a", "sigma_sq", "ell")
+    _modelargs = (
+        "kernel_model",
+        "beta_l",
+        "beta_a",
+        "sigma_sq",
+        "ell",
+        "block_size",
+        "dtype",
+        "hyper_voxels",
+        "hyper_seed",
+        "approximation",
+        "n_inducing",
+    )
     _model_class = "nifreeze.model._dipy.GaussianProcessModel"
 
-    def _fit(self, index: int | None = None, n_jobs: int | None = None, **kwargs) -> int:
-        """Fit a single Gaussian process over all masked voxels."""
+    __slots__ = {
+        "_closed_form": "Whether held-out volumes are predicted in closed form from one fit",
+        "_warm_start": "Whether each fold starts optimizing from the previous fold's optimum",
+        "_warm_tol": "Convergence tolerance of the warm-started folds",
+        "_theta": "Optimized (log-transformed) hyperparameters of the last fit",
+        "_n_iter": "Optimizer iterations of each fit, by held-out index (None: all volumes)",
+        "_geometry": "Pairwise geometry of the gradient table, shared by all fits",
+    }
 
-        if self._locked_fit is not None:
-            return len(self._models)
+    def __init__(
+        self,
+        dataset: DWI,
+        closed_form: bool = False,
+        warm_start: bool = False,
+        warm_tol: float | None = None,
+        **kwargs,
+    ):
+        """Initialization.
+
+        Parameters
+        ----------
+        dataset : :obj:`~nifreeze.data.dmri.base.DWI`
+            Reference to a DWI object.
+        closed_form : :obj:`bool`, optional
+            Fit the GP (and optimize its hyperparameters) once, on all volumes,
+            and predict every held-out volume from that fit in closed form
+            (see :meth:`~nifreeze.model._dipy.GPFit.loo_predict`), instead of
+            refitting the GP for each held-out volume.
+        warm_start : :obj:`bool`, optional
+            Start the hyperparameter optimization of each held-out volume from
+            the optimum found for the previously fitted one.
+        warm_tol : :obj:`float`, optional
+            Convergence tolerance (``tol`` of :obj:`~scipy.optimize.minimize`)
+            of the warm-started optimizations, which may be relaxed because they
+            start close to their optimum.
 
+        """
+        super().__init__(dataset, **kwargs)
+        self._closed_form = closed_form
+        self._warm_start = warm_start
+        self._warm_tol = warm_tol
+        self._theta: np.ndarray | None = None
+        self._n_iter: dict[int | None, int | None] = {}
+        self._geometry: Any = None
+
+    def _kernel_geometry(self) -> Any:
+        """Get the :obj:`~nifreeze.model.gpr.KernelGeometry` of the full gradient table."""
+        if self._geometry is None:
+            from nifreeze.model.gpr import KernelGeometry
+
+            gradients = self._dataset.gradients
+            gtab = gradient_table_from_bvals_bvecs(gradients[:, -1], gradients[:, :-1])
+            self._geometry = KernelGeometry(np.column_stack((gtab.bvecs, gtab.bvals)))
+        return self._geometry
+
+    def _gp_fit(self, index: int | None = None, dtype: str | None = None) -> Any:
+        """Fit a single Gaussian process over all masked voxels, holding out ``index``."""
         idxmask = np.ones(len(self._dataset), dtype=bool)
         if index is not None:
             idxmask[index] = False
-        else:
-            self._locked_fit = True
-            self._warn_single_fit_canary()
 
         data, _, gtab = self._dataset[idxmask]
         # Restrict to the fitted voxels so predictions align with the scatter
         # mask used in ``fit_predict``.
         train = data[self._data_mask, ...]
+        if dtype is not None and train.dtype.itemsize > np.dtype(dtype).itemsize:
+            # Trade precision for memory (see :func:`~nifreeze.utils.tuning.plan_execution`)
+            train = train.astype(dtype)
         gtab = gradient_table_from_bvals_bvecs(gtab[:, -1], gtab[:, :-1])
 
+        fit_kwargs: dict[str, Any] = {}
+        if self._warm_start and self._theta is not None:
+            fit_kwargs["theta"] = self._theta
+            if self._warm_tol is not None:
+                fit_kwargs["tol"] = self._warm_tol
+
         module_name, class_name = self._model_class.rsplit(".", 1)
         gp = getattr(import_module(module_name), class_name)(**self._model_kwargs)
         # ``GaussianProcessModel.fit`` takes ``(data, gtab)`` and returns a fit
         # container whose ``predict(gtab)`` yields the signal at new orientations.
-        self._models = [gp.fit(train, gtab)]
+        # Every fit is trained on rows of the same gradient table, so the kernels
+        # slice a geometry computed once instead of recomputing pairwise angles.
+        with self._kernel_geometry():
+            fit = gp.fit(train, gtab, **fit_kwargs)
+
+        self._theta = fit.model.kernel_.theta
+        self._n_iter[index] = fit.n_iter
+        return fit
+
+    def _fit(
+        self,
+        index: int | None = None,
+        n_jobs: int | None = None,
+        dtype: str | None = None,
+        **kwargs,
+    ) -> int:
+        """Fit a single Gaussian process over all masked voxels."""
+
+        if self._locked_fit is not None:
+            return len(self._models)
+
+        if index is None:
+            self._locked_fit = True
+            self._warn_single_fit_canary()
+
+        self._models = [self._gp_fit(index, dtype=dtype)]
         return 1
 
     def fit_predict(self, index: int | None = None, **kwargs) -> Union[np.ndarray, None]:
         """Fit the GP (LOVO or single-fit) and predict the held-out orientation."""
 
         kwargs.pop("omp_nthreads", None)
-        self._fit(index, n_jobs=kwargs.pop("n_jobs", None))
+        if index is not None and self._closed_form and self._locked_fit is None:
+            with measure(STEP_FIT, index):
+                if self._lovo is None:
+                    fit = self._gp_fit()
+                    self._lovo = (), fit.loo_predict().T
+            predicted = self._lovo[1][:, index]
+        else:
+            with measure(STEP_FIT, index):
+                self._fit(
+                    index, n_jobs=kwargs.pop("n_jobs", None), dtype=kwargs.pop("dtype", None)
+                )
 
-        if index is None:
-            return None
+            if index is None:
+                return None
 
-        gradient = self._dataset.gradients[index, :]
-        gtab = gradient_table_from_bvals_bvecs(gradient[np.newaxis, -1], gradient[np.newaxis, :-1])
-        predicted = np.squeeze(self._models[0].predict(gtab))
+            gradient = self._dataset.gradients[index, :]
+            gtab = gradient_table_from_bvals_bvecs(
+                gradient[np.newaxis, -1], gradient[np.newaxis, :-1]
+            )
+            with measure(STEP_PREDICT, index), self._kernel_geometry():
+                predicted = np.squeeze(self._models[0].predict(gtab))
 
         out_dtype = np.result_type(predicted.dtype, np.float32)
         retval = np.zeros(self._data_mask.shape, dtype=out_dtype)
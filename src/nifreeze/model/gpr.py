@@ -24,12 +24,16 @@
 
 from __future__ import annotations
 
+from contextvars import ContextVar, Token
+from functools import lru_cache
 from numbers import Integral, Real
-from typing import Callable, Literal, Mapping, Optional, Sequence, Union
+from typing import Callable, Literal, Mapping, Optional, Sequence, Union, overload
 
 import numpy as np
 import numpy.typing as npt
+from dipy.core.sphere import HemiSphere, disperse_charges
 from scipy import optimize
+from scipy.linalg import cho_solve, cholesky, solve_triangular
 from scipy.optimize import Bounds
 from sklearn.gaussian_process import GaussianProcessRegressor
 from sklearn.gaussian_process.kernels import (
@@ -37,18 +41,27 @@ from sklearn.gaussian_process.kernels import (
     Hyperparameter,
     Kernel,
     KernelOperator,
+    Sum,
+    WhiteKernel,
 )
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.utils import check_random_state
 from sklearn.utils._param_validation import Interval, StrOptions
 
+from nifreeze.model.loo import gp_loo
+
 __all__ = [
     "DiffusionGPR",
+    "BlockedGPR",
+    "SparseGPR",
+    "KernelGeometry",
     "ExponentialKriging",
     "SphericalKriging",
     "MultiShellKernel",
     "exponential_covariance",
     "spherical_covariance",
     "compute_pairwise_angles",
+    "inducing_directions",
 ]
 
 BOUNDS_A: tuple[float, float] = (0.1, 2.35)
@@ -73,6 +86,12 @@ NONGRADIENT_METHODS = {"Nelder-Mead"}
 """A set of gradients that do not allow analytical gradients."""
 SUPPORTED_OPTIMIZERS = set(CONFIGURABLE_OPTIONS.keys()) | {"fmin_l_bfgs_b"}
 """A set of supported optimizers (automatically created)."""
+DEFAULT_BLOCK_SIZE = 10000
+"""Number of targets (voxels) that :obj:`BlockedGPR` holds in memory at a time."""
+INDUCING_JITTER = 1e-8
+"""Relative nugget on the covariance of the inducing inputs of :obj:`SparseGPR`."""
+DISPERSE_CHARGES_ITERS = 200
+"""Electrostatic-repulsion iterations to spread inducing directions on the sphere."""
 
 UNKNOWN_OPTIMIZER_ERROR_MSG = "Unknown optimizer {optimizer}."
 """Unknown optimizer error message."""
@@ -84,6 +103,8 @@ NONPOSITIVE_BVAL_ERROR_MSG = (
 )
 """Error raised when a non-positive b-value reaches the multi-shell kernel."""
 
+_geometry: ContextVar[KernelGeometry | None] = ContextVar("kernel_geometry", default=None)
+
 
 class DiffusionGPR(GaussianProcessRegressor):
     r"""
@@ -166,6 +187,10 @@ class DiffusionGPR(GaussianProcessRegressor):
         \right]
         \end{equation}
 
+    **Optimizer diagnostics.**
+    After fitting, ``n_iter_`` holds the number of iterations of the (last)
+    hyperparameter optimization run through :obj:`~scipy.optimize.minimize`.
+
     References
     ----------
     .. footbibliography::
@@ -250,6 +275,7 @@ class DiffusionGPR(GaussianProcessRegressor):
                 tol=self.tol,
             )  # type: ignore[call-overload]
             _check_optimize_result("lbfgs", opt_res)
+            self.n_iter_ = opt_res.nit
             return opt_res.x, opt_res.fun
 
         if isinstance(self.optimizer, str) and self.optimizer in CONFIGURABLE_OPTIONS:
@@ -267,6 +293,7 @@ class DiffusionGPR(GaussianProcessRegressor):
                 args=(self.eval_gradient,),
                 tol=self.tol,
             )  # type: ignore[call-overload]
+            self.n_iter_ = opt_res.nit
             return opt_res.x, opt_res.fun
 
         if callable(self.optimizer):
@@ -275,6 +302,506 @@ class DiffusionGPR(GaussianProcessRegressor):
         raise ValueError(UNKNOWN_OPTIMIZER_ERROR_MSG.format(optimizer=self.optimizer))
 
 
+class BlockedGPR:
+    r"""
+    A GP regressor for many targets sharing their inputs, with bounded working memory.
+
+    :obj:`~sklearn.gaussian_process.GaussianProcessRegressor` copies and normalizes
+    the whole target matrix in double precision, evaluates the log-marginal
+    likelihood through the dual coefficients of every target at each optimizer
+    step, and keeps those coefficients (``alpha_``) for prediction.
+    Because all targets share one covariance :math:`\mathbf{K}` (N × N), their
+    summed log-marginal likelihood only depends on the (normalized) targets
+    :math:`\mathbf{Y}` (N × V) through the scatter matrix
+    :math:`\mathbf{S} = \mathbf{Y}\mathbf{Y}^\top`:
+
+    .. math::
+
+        \log p(\mathbf{Y}) = -\frac{1}{2} \operatorname{tr}(\mathbf{K}^{-1} \mathbf{S})
+        - V \sum_i \log L_{ii} - \frac{NV}{2} \log 2\pi,
+
+    with :math:`\mathbf{L}` the Cholesky factor of :math:`\mathbf{K}`, and its gradient
+    with respect to the hyperparameters :math:`\theta_k` is
+    :math:`\frac{1}{2} \operatorname{tr}[(\mathbf{K}^{-1} \mathbf{S} \mathbf{K}^{-1}
+    - V \mathbf{K}^{-1}) \partial \mathbf{K} / \partial \theta_k]`.
+    This regressor therefore accumulates :math:`\mathbf{S}` over blocks of targets,
+    optimizes the hyperparameters on it (with the optimizer settings of
+    :obj:`DiffusionGPR`, yielding the same optimum), factorizes the covariance
+    once, and streams predictions through the same blocks of targets as
+    :math:`(\mathbf{K}^{-1} \mathbf{k}_*)^\top \mathbf{Y}_b`.
+    Blocks may be processed in single precision (``dtype``), whereas the scatter
+    matrix and the factorization are kept in double precision.
+
+    The training targets are referenced rather than copied, so they must not be
+    modified while the regressor is in use.
+
+    """
+
+    def __init__(
+        self,
+        kernel: Kernel,
+        *,
+        alpha: float = 1e-10,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        dtype: npt.DTypeLike | None = None,
+        normalize_y: bool = True,
+        **kwargs,
+    ):
+        """
+        Initialize the regressor.
+
+        Parameters
+        ----------
+        kernel : :obj:`~sklearn.gaussian_process.kernels.Kernel`
+            The covariance kernel, whose hyperparameters are optimized by ``fit``.
+        alpha : :obj:`float`, optional
+            Value added to the diagonal of the covariance of the training inputs.
+        block_size : :obj:`int`, optional
+            Number of targets processed at a time.
+        dtype : :obj:`~numpy.dtype`, optional
+            Floating-point type of the blocks and of the predictions
+            (double precision by default).
+        normalize_y : :obj:`bool`, optional
+            Whether each target is standardized before regression.
+        **kwargs
+            Optimizer settings (e.g., ``optimizer``, ``tol``, ``maxiter`` or
+            ``random_state``) of :obj:`DiffusionGPR`.
+
+        """
+        self.kernel = kernel
+        self.alpha = alpha
+        self.block_size = block_size
+        self.dtype = np.dtype(dtype or np.float64)
+        self.normalize_y = normalize_y
+        self._optimizer = DiffusionGPR(kernel=kernel, alpha=alpha, **kwargs)
+
+    @property
+    def n_iter_(self) -> int | None:
+        """Iterations of the (last) hyperparameter optimization."""
+        return getattr(self._optimizer, "n_iter_", None)
+
+    def _blocks(self) -> list[slice]:
+        n_targets = self.y_train_.shape[1]
+        return [
+            slice(start, min(start + self.block_size, n_targets))
+            for start in range(0, n_targets, self.block_size)
+        ]
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> BlockedGPR:
+        """
+        Optimize the hyperparameters and factorize the covariance.
+
+        Parameters
+        ----------
+        X : :obj:`~numpy.ndarray`
+            Training inputs, shape (N, n_features).
+        y : :obj:`~numpy.ndarray`
+            Training targets, shape (N,) or (N, V).
+
+        Returns
+        -------
+        :obj:`BlockedGPR`
+            The fitted regressor.
+
+        """
+        self.X_train_ = np.asarray(X)
+        self._squeeze = np.ndim(y) == 1 or np.shape(y)[1] == 1
+        self.y_train_ = np.reshape(y, (np.shape(y)[0], -1))
+
+        n_samples, n_targets = self.y_train_.shape
+        self._y_train_mean = np.zeros(n_targets)
+        self._y_train_std = np.ones(n_targets)
+        self._scatter = np.zeros((n_samples, n_samples))
+        for block in self._blocks():
+            values = self.y_train_[:, block].astype(np.float64)
+            if self.normalize_y:
+                mean, std = values.mean(axis=0), values.std(axis=0)
+                std[std < 10 * np.finfo(std.dtype).eps] = 1.0
+                self._y_train_mean[block], self._y_train_std[block] = mean, std
+                values = ((values - mean) / std).astype(self.dtype, copy=False)
+            self._scatter += values @ values.T
+
+        self.kernel_ = self.kernel.clone_with_theta(self.kernel.theta)
+        if self._optimizer.optimizer is not None and self.kernel_.n_dims > 0:
+            self.kernel_.theta, self.log_marginal_likelihood_value_ = self._optimize()
+        else:
+            self.log_marginal_likelihood_value_ = self.log_marginal_likelihood(self.kernel_.theta)
+
+        K = self.kernel_(self.X_train_)
+        K[np.diag_indices_from(K)] += self.alpha
+        self.L_ = cholesky(K, lower=True, check_finite=False)
+        return self
+
+    def _optimize(self) -> tuple[np.ndarray, float]:
+        """Maximize the log-marginal likelihood as :obj:`DiffusionGPR` would."""
+
+        def obj_func(theta, eval_gradient=True):
+            if eval_gradient:
+                lml, grad = self.log_marginal_likelihood(theta, eval_gradient=True)
+                return -lml, -grad
+            return -self.log_marginal_likelihood(theta)
+
+        bounds = self.kernel_.bounds
+        initial = [self.kernel_.theta]
+        if (restarts := self._optimizer.n_restarts_optimizer) > 0:
+            rng = check_random_state(self._optimizer.random_state)
+            initial += [rng.uniform(bounds[:, 0], bounds[:, 1]) for _ in range(restarts)]
+
+        optima = [
+            self._optimizer._constrained_optimization(obj_func, theta, bounds) for theta in initial
+        ]
+        theta, neg_lml = min(optima, key=lambda optimum: optimum[1])
+        return np.asarray(theta), -float(neg_lml)
+
+    @overload
+    def log_marginal_likelihood(
+        self, theta: np.ndarray, eval_gradient: Literal[False] = False
+    ) -> float: ...
+
+    @overload
+    def log_marginal_likelihood(
+        self, theta: np.ndarray, eval_gradient: Literal[True]
+    ) -> tuple[float, np.ndarray]: ...
+
+    def log_marginal_likelihood(
+        self,
+        theta: np.ndarray,
+        eval_gradient: bool = False,
+    ) -> float | tuple[float, np.ndarray]:
+        """
+        Log-marginal likelihood, summed over targets, of the given hyperparameters.
+
+        Parameters
+        ----------
+        theta : :obj:`~numpy.ndarray`
+            Log-transformed hyperparameters of the kernel.
+        eval_gradient : :obj:`bool`, optional
+            Whether the gradient with respect to ``theta`` is also returned.
+
+        Returns
+        -------
+        :obj:`float` or :obj:`tuple`
+            The log-marginal likelihood (and its gradient).
+
+        """
+        kernel = self.kernel_.clone_with_theta(theta)
+        if eval_gradient:
+            K, K_gradient = kernel(self.X_train_, eval_gradient=True)
+        else:
+            K = kernel(self.X_train_)
+        K[np.diag_indices_from(K)] += self.alpha
+
+        try:
+            L = cholesky(K, lower=True, check_finite=False)
+        except np.linalg.LinAlgError:
+            return (-np.inf, np.zeros_like(theta)) if eval_gradient else -np.inf
+
+        n_samples, n_targets = self.y_train_.shape
+        K_inv = cho_solve((L, True), np.eye(n_samples), check_finite=False)
+        lml = -0.5 * np.sum(K_inv * self._scatter) - n_targets * (
+            np.log(np.diag(L)).sum() + 0.5 * n_samples * np.log(2 * np.pi)
+        )
+        if not eval_gradient:
+            return lml
+
+        inner = K_inv @ self._scatter @ K_inv - n_targets * K_inv
+        return lml, 0.5 * np.einsum("ij,jik->k", inner, K_gradient)
+
+    def predict(
+        self,
+        X: np.ndarray,
+        return_std: bool = False,
+    ) -> np.ndarray | tuple[np.ndarray, np.ndarray]:
+        """
+        Predict the targets at new inputs, one block of targets at a time.
+
+        Parameters
+        ----------
+        X : :obj:`~numpy.ndarray`
+            Query inputs, shape (M, n_features).
+        return_std : :obj:`bool`, optional
+            Whether the standard deviation of the predictive distribution is
+            also returned.
+
+        Returns
+        -------
+        :obj:`~numpy.ndarray` or :obj:`tuple`
+            Predictive means, shape (M, V) (and standard deviations).
+
+        """
+        K_trans = self.kernel_(X, self.X_train_)
+        weights = cho_solve((self.L_, True), K_trans.T, check_finite=False)
+        # Un-normalizing the prediction from standardized targets leaves
+        # w'y + (1 - w'1) mean, so the targets need not be standardized here.
+        offsets = 1.0 - weights.sum(axis=0)
+        y_var = self.kernel_.diag(X) - np.einsum("ij,ji->i", K_trans, weights)
+        weights = weights.T.astype(self.dtype)
+
+        y_mean = np.empty((K_trans.shape[0], self.y_train_.shape[1]), dtype=self.dtype)
+        for block in self._blocks():
+            y_mean[:, block] = weights @ self.y_train_[:, block].astype(self.dtype, copy=False)
+            y_mean[:, block] += np.outer(offsets, self._y_train_mean[block])
+
+        if self._squeeze:
+            y_mean = y_mean[:, 0]
+        if not return_std:
+            return y_mean
+
+        y_std = np.outer(np.sqrt(np.clip(y_var, 0.0, None)), self._y_train_std).astype(self.dtype)
+        return y_mean, y_std[:, 0] if self._squeeze else y_std
+
+    def loo_predict(self) -> np.ndarray:
+        """
+        Predict every training input from all others, one block of targets at a time.
+
+        See :func:`~nifreeze.model.loo.gp_loo`.
+
+        Returns
+        -------
+        :obj:`~numpy.ndarray`
+            Predictions, shape (N, V).
+
+        """
+        predicted = np.empty(self.y_train_.shape, dtype=self.dtype)
+        for block in self._blocks():
+            predicted[:, block] = gp_loo(self.L_, self.y_train_[:, block], center=self.normalize_y)
+        return predicted
+
+
+class SparseGPR:
+    r"""
+    A subset-of-regressors (SoR) GP regressor with inducing inputs.
+
+    The dense GP factorizes the covariance of the N training inputs, at
+    :math:`O(N^3)` cost, which rules it out for very dense q-space schemes (e.g.,
+    DSI).
+    This regressor replaces that covariance by its Nyström approximation on
+    M < N inducing inputs :math:`\mathbf{Z}` (e.g., directions spread on a
+    hemisphere, see :func:`inducing_directions`),
+
+    .. math::
+
+        \mathbf{K} \approx \mathbf{Q} = \mathbf{K}_{nm} \mathbf{K}_{mm}^{-1}
+        \mathbf{K}_{mn},
+
+    and regresses with :math:`\mathbf{Q} + \sigma^2 \mathbf{I}`, whose inverse and
+    determinant follow from the Woodbury identity at :math:`O(N M^2)` cost.
+    The noise :math:`\sigma^2` is that of a
+    :obj:`~sklearn.gaussian_process.kernels.WhiteKernel` summand of the kernel
+    (plus ``alpha``), and the hyperparameters are those maximizing the
+    log-marginal likelihood of the approximate model, optimized with the settings
+    of :obj:`DiffusionGPR` and finite-difference gradients.
+    The predictive mean is that of SoR, and the predictive variance that of the
+    deterministic training conditional (DTC), which does not collapse away from
+    the inducing inputs (:footcite:t:`quinonero-candela_unifying_2005`).
+
+    **Accuracy trade-off.**
+    The approximation discards the signal variance not captured by the rank-M
+    Nyström approximation, which smooths the predictions.
+    It is accurate when the inducing inputs are dense compared to the correlation
+    length of the kernel (the angular range ``a`` of the kriging covariances),
+    and degrades as the spacing of the inducing directions approaches ``a``.
+
+    References
+    ----------
+    .. footbibliography::
+
+    """
+
+    def __init__(
+        self,
+        kernel: Kernel,
+        inducing: np.ndarray,
+        *,
+        alpha: float = 1e-10,
+        normalize_y: bool = True,
+        **kwargs,
+    ):
+        """
+        Initialize the regressor.
+
+        Parameters
+        ----------
+        kernel : :obj:`~sklearn.gaussian_process.kernels.Kernel`
+            The covariance kernel, whose hyperparameters are optimized by ``fit``.
+        inducing : :obj:`~numpy.ndarray`
+            Inducing inputs, shape (M, n_features).
+        alpha : :obj:`float`, optional
+            Value added to the noise variance.
+        normalize_y : :obj:`bool`, optional
+            Whether each target is standardized before regression.
+        **kwargs
+            Optimizer settings (e.g., ``optimizer``, ``tol``, ``maxiter`` or
+            ``random_state``) of :obj:`DiffusionGPR`.
+
+        """
+        self.kernel = kernel
+        self.inducing = np.asarray(inducing)
+        self.alpha = alpha
+        self.normalize_y = normalize_y
+        self._optimizer = DiffusionGPR(kernel=kernel, alpha=alpha, eval_gradient=False, **kwargs)
+
+    @property
+    def n_iter_(self) -> int | None:
+        """Iterations of the hyperparameter optimization."""
+        return getattr(self._optimizer, "n_iter_", None)
+
+    def _factorize(self, kernel: Kernel) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+        """Factorize the inducing covariance and the (M × M) Woodbury core."""
+        signal, noise = kernel, self.alpha
+        if isinstance(kernel, Sum) and isinstance(kernel.k2, WhiteKernel):
+            signal, noise = kernel.k1, noise + kernel.k2.noise_level
+
+        K_mm = signal(self.inducing)
+        K_mm[np.diag_indices_from(K_mm)] += INDUCING_JITTER * np.mean(np.diag(K_mm))
+        L_m = cholesky(K_mm, lower=True, check_finite=False)
+        V = solve_triangular(L_m, signal(self.inducing, self.X_train_), lower=True)
+        B = V @ V.T
+        B[np.diag_indices_from(B)] += noise
+        return L_m, cholesky(B, lower=True, check_finite=False), V, noise
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> SparseGPR:
+        """
+        Optimize the hyperparameters and factorize the approximate covariance.
+
+        Parameters
+        ----------
+        X : :obj:`~numpy.ndarray`
+            Training inputs, shape (N, n_features).
+        y : :obj:`~numpy.ndarray`
+            Training targets, shape (N,) or (N, V).
+
+        Returns
+        -------
+        :obj:`SparseGPR`
+            The fitted regressor.
+
+        """
+        self.X_train_ = np.asarray(X)
+        self._squeeze = np.ndim(y) == 1
+        y = np.reshape(y, (np.shape(y)[0], -1)).astype(float)
+        self._y_train_mean = np.zeros(y.shape[1])
+        self._y_train_std = np.ones(y.shape[1])
+        if self.normalize_y:
+            self._y_train_mean, self._y_train_std = y.mean(axis=0), y.std(axis=0)
+            self._y_train_std[self._y_train_std < 10 * np.finfo(float).eps] = 1.0
+            y = (y - self._y_train_mean) / self._y_train_std
+        self.y_train_ = y
+
+        self.kernel_ = self.kernel.clone_with_theta(self.kernel.theta)
+        if self._optimizer.optimizer is not None and self.kernel_.n_dims > 0:
+            theta, neg_lml = self._optimizer._constrained_optimization(
+                lambda theta, eval_gradient=False: -self.log_marginal_likelihood(theta),
+                self.kernel_.theta,
+                self.kernel_.bounds,
+            )
+            self.kernel_.theta = np.asarray(theta)
+            self.log_marginal_likelihood_value_ = -float(neg_lml)
+        else:
+            self.log_marginal_likelihood_value_ = self.log_marginal_likelihood(self.kernel_.theta)
+
+        L_m, L_B, V, self._noise = self._factorize(self.kernel_)
+        self._L_m, self._L_B, self._V = L_m, L_B, V
+        self.alpha_ = solve_triangular(L_m, cho_solve((L_B, True), V @ y), lower=True, trans="T")
+        return self
+
+    def log_marginal_likelihood(self, theta: np.ndarray) -> float:
+        """
+        Log-marginal likelihood of the approximate model, summed over targets.
+
+        Parameters
+        ----------
+        theta : :obj:`~numpy.ndarray`
+            Log-transformed hyperparameters of the kernel.
+
+        Returns
+        -------
+        :obj:`float`
+            The log-marginal likelihood.
+
+        """
+        try:
+            _, L_B, V, noise = self._factorize(self.kernel_.clone_with_theta(theta))
+        except np.linalg.LinAlgError:
+            return -np.inf
+
+        (n_samples, n_targets), n_inducing = self.y_train_.shape, V.shape[0]
+        projected = solve_triangular(L_B, V @ self.y_train_, lower=True)
+        quadratic = (np.sum(self.y_train_**2) - np.sum(projected**2)) / noise
+        logdet = (n_samples - n_inducing) * np.log(noise) + 2 * np.log(np.diag(L_B)).sum()
+        return -0.5 * (quadratic + n_targets * (logdet + n_samples * np.log(2 * np.pi)))
+
+    def predict(
+        self,
+        X: np.ndarray,
+        return_std: bool = False,
+    ) -> np.ndarray | tuple[np.ndarray, np.ndarray]:
+        """
+        Predict the targets at new inputs.
+
+        Parameters
+        ----------
+        X : :obj:`~numpy.ndarray`
+            Query inputs, shape (M, n_features).
+        return_std : :obj:`bool`, optional
+            Whether the (DTC) standard deviation of the predictive distribution
+            is also returned.
+
+        Returns
+        -------
+        :obj:`~numpy.ndarray` or :obj:`tuple`
+            Predictive means, shape (M, V) (and standard deviations).
+
+        """
+        signal = self.kernel_
+        if isinstance(signal, Sum) and isinstance(signal.k2, WhiteKernel):
+            signal = signal.k1
+        K_trans = signal(X, self.inducing)
+        y_mean = K_trans @ self.alpha_ * self._y_train_std + self._y_train_mean
+        if self._squeeze:
+            y_mean = y_mean[:, 0]
+        if not return_std:
+            return y_mean
+
+        projected = solve_triangular(self._L_m, K_trans.T, lower=True)
+        conditional = solve_triangular(self._L_B, projected, lower=True)
+        y_var = (
+            self.kernel_.diag(X)
+            - np.sum(projected**2, axis=0)
+            + self._noise * np.sum(conditional**2, axis=0)
+        )
+        y_std = np.outer(np.sqrt(np.clip(y_var, 0.0, None)), self._y_train_std)
+        return y_mean, y_std[:, 0] if self._squeeze else y_std
+
+    def loo_predict(self) -> np.ndarray:
+        """
+        Predict every training input from all others, under the approximate model.
+
+        The closed form of :func:`~nifreeze.model.loo.gp_loo` is evaluated with
+        the inverse of the approximate covariance, applied through the Woodbury
+        identity.
+
+        Returns
+        -------
+        :obj:`~numpy.ndarray`
+            Predictions, shape (N, V).
+
+        """
+        data = self.y_train_ * self._y_train_std + self._y_train_mean
+        projected = cho_solve((self._L_B, True), self._V)
+
+        def _apply_inverse(values: np.ndarray) -> np.ndarray:
+            return (values - self._V.T @ (projected @ values)) / self._noise
+
+        diag = (1.0 - np.sum(self._V * projected, axis=0)) / self._noise
+        weights = _apply_inverse(data)
+        if self.normalize_y:
+            # Mean of the observations each fold is trained on
+            fold_means = (data.sum(axis=0) - data) / (data.shape[0] - 1)
+            weights -= _apply_inverse(np.ones((data.shape[0], 1))) * fold_means
+        return data - weights / diag[:, np.newaxis]
+
+
 class ExponentialKriging(Kernel):
     """A scikit-learn's kernel for DWI signals."""
 
@@ -341,7 +868,7 @@ class ExponentialKriging(Kernel):
             is :obj:`True`.
 
         """
-        thetas = compute_pairwise_angles(X, Y)
+        thetas = _pairwise_angles(X, Y)
         C_theta = exponential_covariance(thetas, self.beta_a)
 
         if not eval_gradient:
@@ -447,23 +974,20 @@ class SphericalKriging(Kernel):
             is :obj:`True`.
 
         """
-        thetas = compute_pairwise_angles(X, Y)
+        thetas = _pairwise_angles(X, Y)
         C_theta = spherical_covariance(thetas, self.beta_a)
 
         if not eval_gradient:
             return self.beta_l * C_theta
 
         # scikit-learn expects gradients w.r.t. the *log* of each hyperparameter.
-        deriv_a = np.zeros_like(thetas)
+        K_gradient = np.zeros((*thetas.shape, 2))
         nonzero = thetas <= self.beta_a
-        deriv_a[nonzero] = (
-            1.5
-            * self.beta_l
-            * (thetas[nonzero] / self.beta_a - thetas[nonzero] ** 3 / self.beta_a**3)
-        )
-        K_gradient = np.dstack((deriv_a, self.beta_l * C_theta))
+        ratio = thetas[nonzero] / self.beta_a
+        K_gradient[nonzero, 0] = 1.5 * self.beta_l * (ratio - ratio**3)  # d/d(log a)
+        K_gradient[..., 1] = self.beta_l * C_theta  # d/d(log lambda)
 
-        return self.beta_l * C_theta, K_gradient
+        return K_gradient[..., 1].copy(), K_gradient
 
     def diag(self, X: npt.ArrayLike) -> np.ndarray:
         """Returns the diagonal of the kernel k(X, X).
@@ -603,10 +1127,41 @@ class MultiShellKernel(KernelOperator):
 
         if eval_gradient:
             K1, g1 = self.k1(X_o, Y_o, eval_gradient=True)
-            K2, g2 = self.k2(X_b, Y_b, eval_gradient=True)
-            return K1 * K2, np.dstack((g1 * K2[:, :, np.newaxis], g2 * K1[:, :, np.newaxis]))
+            K2, g2 = self._radial(X_o, X_b, Y_o, Y_b, eval_gradient=True)
+            K_gradient = np.empty((*K1.shape, g1.shape[-1] + g2.shape[-1]))
+            np.multiply(g1, K2[..., np.newaxis], out=K_gradient[..., : g1.shape[-1]])
+            np.multiply(g2, K1[..., np.newaxis], out=K_gradient[..., g1.shape[-1] :])
+            return K1 * K2, K_gradient
 
-        return self.k1(X_o, Y_o) * self.k2(X_b, Y_b)
+        return self.k1(X_o, Y_o) * self._radial(X_o, X_b, Y_o, Y_b)
+
+    def _radial(
+        self,
+        X_o: np.ndarray,
+        X_b: np.ndarray,
+        Y_o: np.ndarray | None = None,
+        Y_b: np.ndarray | None = None,
+        eval_gradient: bool = False,
+    ) -> np.ndarray | tuple[np.ndarray, np.ndarray]:
+        """Evaluate the radial kernel, from cached log-b distances where available."""
+        geometry = _geometry.get()
+        sq_dists = None
+        if geometry is not None and type(self.k2) is RBF and not self.k2.anisotropic:
+            sq_dists = geometry.log_bval_distances(
+                np.hstack((X_o, X_b)),
+                None if Y_o is None or Y_b is None else np.hstack((Y_o, Y_b)),
+            )
+
+        if sq_dists is None:
+            return self.k2(X_b, Y_b, eval_gradient=eval_gradient)
+
+        scaled = sq_dists / self.k2.length_scale**2
+        K = np.exp(-0.5 * scaled)
+        if not eval_gradient:
+            return K
+        if self.k2.hyperparameter_length_scale.fixed:
+            return K, np.empty((*K.shape, 0))
+        return K, (K * scaled)[..., np.newaxis]
 
     def diag(self, X: npt.ArrayLike) -> np.ndarray:
         X_o, X_b = self._split(np.asarray(X))
@@ -616,6 +1171,159 @@ class MultiShellKernel(KernelOperator):
         return f"MultiShellKernel({self.k1} * {self.k2})"
 
 
+class KernelGeometry:
+    """
+    Pairwise geometry of a gradient table, shared by the kernels of all its subsets.
+
+    The kernels of this module depend on the gradients only through their
+    pairwise angles and, for :obj:`MultiShellKernel` with an isotropic
+    :obj:`~sklearn.gaussian_process.kernels.RBF` radial kernel, through the
+    squared differences of their log b-values.
+    When every fit (e.g., every leave-one-volume-out fold) is trained on rows of one
+    table, this object computes those matrices once.
+    Kernels evaluated within its context then look up the rows of their inputs
+    and slice the matrices, rather than recomputing them at every step of every
+    hyperparameter optimization.
+    Inputs that are not rows of the table are computed as usual.
+
+    Examples
+    --------
+    >>> X = np.eye(3)[[0, 1, 2, 0]] * np.array([[1], [1], [1], [-1]])
+    >>> kernel = SphericalKriging(beta_a=1.0, beta_l=1.0)
+    >>> expected = kernel(X[1:])
+    >>> with KernelGeometry(X):
+    ...     np.allclose(kernel(X[1:]), expected)
+    True
+
+    """
+
+    __slots__ = ("_angles", "_log_bval_dists", "_rows", "_bval_rows", "_memo", "_tokens")
+
+    MEMO_SIZE = 16
+    """Number of recent inputs whose row indices are remembered."""
+
+    def __init__(
+        self,
+        X: np.ndarray,
+        orientation_dims: Sequence[int] = (0, 1, 2),
+        bval_index: int = 3,
+    ) -> None:
+        """
+        Compute the pairwise geometry of a gradient table.
+
+        Parameters
+        ----------
+        X : :obj:`~numpy.ndarray`
+            Gradient table, shape (N, n_features), with the gradient components in
+            ``orientation_dims`` and, optionally, the b-value in ``bval_index``.
+        orientation_dims : :obj:`~typing.Sequence`, optional
+            Columns of the gradient components.
+        bval_index : :obj:`int`, optional
+            Column of the b-values (log-b distances are only cached if it exists
+            and all b-values are positive).
+
+        """
+        X = np.asarray(X, dtype=float)
+        orient = np.ascontiguousarray(X[:, tuple(orientation_dims)])
+        self._angles = compute_pairwise_angles(orient)
+        self._rows = _row_index(orient)
+        self._log_bval_dists: np.ndarray | None = None
+        self._bval_rows: dict[bytes, int] = {}
+        if X.shape[1] > bval_index and np.all(X[:, bval_index] > 0):
+            log_bvals = np.log(X[:, bval_index]).reshape(-1, 1)
+            self._log_bval_dists = (log_bvals - log_bvals.T) ** 2
+            self._bval_rows = _row_index(np.hstack((orient, log_bvals)))
+        self._memo: dict[bytes, np.ndarray | None] = {}
+        self._tokens: list[Token] = []
+
+    def __enter__(self) -> KernelGeometry:
+        self._tokens.append(_geometry.set(self))
+        return self
+
+    def __exit__(self, *_) -> None:
+        _geometry.reset(self._tokens.pop())
+
+    def _indices(self, rows: dict[bytes, int], X: np.ndarray) -> np.ndarray | None:
+        X = np.ascontiguousarray(X, dtype=float)
+        key = X.tobytes() + bytes(str(X.shape[1]), "ascii")
+        if key not in self._memo:
+            if len(self._memo) >= self.MEMO_SIZE:
+                self._memo.clear()
+            try:
+                self._memo[key] = np.array([rows[row.tobytes()] for row in X], dtype=int)
+            except KeyError:
+                self._memo[key] = None
+        return self._memo[key]
+
+    def _slice(
+        self,
+        matrix: np.ndarray | None,
+        rows: dict[bytes, int],
+        X: np.ndarray,
+        Y: np.ndarray | None,
+    ) -> np.ndarray | None:
+        if matrix is None or (index_x := self._indices(rows, X)) is None:
+            return None
+        index_y = index_x if Y is None else self._indices(rows, Y)
+        if index_y is None:
+            return None
+        return matrix[np.ix_(index_x, index_y)]
+
+    def angles(self, X: np.ndarray, Y: np.ndarray | None = None) -> np.ndarray | None:
+        """
+        Pairwise angles between gradient orientations, if all are rows of the table.
+
+        Parameters
+        ----------
+        X : :obj:`~numpy.ndarray`
+            Gradient orientations, shape (n_samples_X, 3).
+        Y : :obj:`~numpy.ndarray`, optional
+            Gradient orientations, shape (n_samples_Y, 3) (``X`` if :obj:`None`).
+
+        Returns
+        -------
+        :obj:`~numpy.ndarray` or :obj:`None`
+            The angles (as :func:`compute_pairwise_angles` would compute them),
+            or :obj:`None` if any orientation is not in the table.
+
+        """
+        return self._slice(self._angles, self._rows, X, Y)
+
+    def log_bval_distances(self, X: np.ndarray, Y: np.ndarray | None = None) -> np.ndarray | None:
+        """
+        Squared differences of log b-values, if all gradients are rows of the table.
+
+        Parameters
+        ----------
+        X : :obj:`~numpy.ndarray`
+            Gradient orientations and log b-values, shape (n_samples_X, 4).
+        Y : :obj:`~numpy.ndarray`, optional
+            Gradient orientations and log b-values, shape (n_samples_Y, 4)
+            (``X`` if :obj:`None`).
+
+        Returns
+        -------
+        :obj:`~numpy.ndarray` or :obj:`None`
+            The squared distances, or :obj:`None` if any gradient is not in the
+            table.
+
+        """
+        return self._slice(self._log_bval_dists, self._bval_rows, X, Y)
+
+
+def _row_index(X: np.ndarray) -> dict[bytes, int]:
+    """Map the bytes of each row of a (C-contiguous, float) array to its index."""
+    return {row.tobytes(): index for index, row in enumerate(np.ascontiguousarray(X, float))}
+
+
+def _pairwise_angles(X: np.ndarray, Y: np.ndarray | None = None) -> np.ndarray:
+    """Compute pairwise angles, slicing those of the active :obj:`KernelGeometry`."""
+    geometry = _geometry.get()
+    if geometry is not None and (angles := geometry.angles(X, Y)) is not None:
+        return angles
+    return compute_pairwise_angles(X, Y)
+
+
 def exponential_covariance(theta: np.ndarray, a: float) -> np.ndarray:
     r"""
     Compute the exponential covariance for given distances and scale parameter.
@@ -758,3 +1466,44 @@ def compute_pairwise_angles(
     thetas = np.arccos(np.abs(cosines)) if closest_polarity else np.arccos(cosines)
     thetas[np.abs(thetas) < THETA_EPSILON] = 0.0
     return thetas
+
+
+def inducing_directions(n: int, seed: int = 0) -> np.ndarray:
+    """
+    Spread directions evenly on a hemisphere, as inducing inputs of a sparse GP.
+
+    Random directions are dispersed by electrostatic repulsion with
+    :func:`~dipy.core.sphere.disperse_charges` on a
+    :obj:`~dipy.core.sphere.HemiSphere` (antipodal directions are equivalent for the
+    kernels of this module, so only one of each pair is kept).
+
+    Parameters
+    ----------
+    n : :obj:`int`
+        Number of directions.
+    seed : :obj:`int`, optional
+        Seed of the initial random directions.
+
+    Returns
+    -------
+    :obj:`~numpy.ndarray`
+        Unit vectors, shape (n, 3).
+
+    Examples
+    --------
+    >>> directions = inducing_directions(20)
+    >>> directions.shape, np.allclose(np.linalg.norm(directions, axis=1), 1.0)
+    ((20, 3), True)
+
+    """
+    return _dispersed_hemisphere(n, seed).copy()
+
+
+@lru_cache(maxsize=8)
+def _dispersed_hemisphere(n: int, seed: int) -> np.ndarray:
+    xyz = np.random.default_rng(seed).normal(size=(n, 3))
+    hemisphere, _ = disperse_charges(
+        HemiSphere(xyz=xyz / np.linalg.norm(xyz, axis=1, keepdims=True)),
+        DISPERSE_CHARGES_ITERS,
+    )
+    return hemisphere.vertices
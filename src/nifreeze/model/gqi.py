@@ -70,6 +70,7 @@ import numpy as np
 from dipy.core.subdivide_octahedron import create_unit_sphere
 from dipy.reconst.gqi import squared_radial_component
 from dipy.reconst.odf import OdfFit, OdfModel
+from scipy.linalg import cho_factor, cho_solve
 
 INVERSE_LAMBDA = 1e-6
 r"""
@@ -90,6 +91,9 @@ r"""
 scaling factor :math:`\sqrt{6 D \tau}` with :math:`\tau` folded into the b-value.
 """
 
+SPECTRAL_ENERGY_ERROR_MSG = "The spectral energy must be in (0, 1] (got {energy})."
+"""Error message raised when the retained spectral energy of the kernel is invalid."""
+
 
 class GeneralizedQSamplingModel(OdfModel):
     def __init__(
@@ -100,6 +104,7 @@ class GeneralizedQSamplingModel(OdfModel):
         sampling_length=1.2,
         sphere=None,
         recursion_level=DEFAULT_SPHERE_RECURSION_LEVEL,
+        spectral_energy=None,
     ):
         r"""Generalized Q-Sampling Imaging.
 
@@ -131,6 +136,13 @@ class GeneralizedQSamplingModel(OdfModel):
             :ref:`gqi-sphere-density` for the experiment justifying the default
             (past the fidelity knee for both single-shell and grid acquisitions,
             while denser spheres only keep paying off for grid/multi-shell data).
+        spectral_energy : float, optional
+            When given, :meth:`GeneralizedQSamplingFit.predict` runs through the
+            leading eigenvectors of :math:`\mathbf{K}\mathbf{K}^{\mathsf T}` that
+            retain this fraction of its spectral energy (e.g., ``0.9999``), instead
+            of the explicit vertex-space round trip (see :func:`truncated_kernel`).
+            The retained rank and the relative reconstruction error of the kernel
+            are reported as ``rank`` and ``reconstruction_error``.
         """
         OdfModel.__init__(self, gtab)
         self.method = method
@@ -150,6 +162,17 @@ class GeneralizedQSamplingModel(OdfModel):
             method=self.method,
         )
 
+        # Orthonormal loadings (n_gradients, rank) and compressed kernel (rank,
+        # n_vertices), with K ~ loadings @ basis; None predicts from the full kernel.
+        self.loadings = self.basis = None
+        self.rank = self.kernel.shape[0]
+        self.reconstruction_error = 0.0
+        if spectral_energy is not None:
+            self.loadings, self.basis, self.reconstruction_error = truncated_kernel(
+                self.kernel, spectral_energy
+            )
+            self.rank = self.loadings.shape[1]
+
     def fit(self, data, *, mask=None):
         return GeneralizedQSamplingFit(self, data)
 
@@ -168,6 +191,8 @@ class GeneralizedQSamplingFit(OdfFit):
 
         """
         OdfFit.__init__(self, model, data)
+        # Signal in the truncated eigenbasis of the kernel, shape (..., rank)
+        self.coefficients = None if model.loadings is None else data @ model.loadings
 
     def odf(self, sphere=None):
         r"""Compute the discrete orientation distribution function (ODF/SDF).
@@ -225,19 +250,24 @@ class GeneralizedQSamplingFit(OdfFit):
         ``"standard"`` (sinc) kernel, but not for ``"gqi2"``; prefer
         ``"standard"`` when the predicted amplitude matters. See
         :ref:`gqi-reconstruction-fidelity`.
+
+        With a ``spectral_energy`` set on the model, the fused operator is built
+        from the truncated kernel and applied to the fitted signal in its
+        eigenbasis, so the cost scales with the retained rank.
         """
+        K_plus = prediction_kernel(
+            gtab,
+            self.model.Lambda,
+            self.model.sphere,
+            method=self.model.method,
+        )
+        if self.coefficients is not None:
+            return np.maximum(self.coefficients @ (K_plus @ self.model.basis.T).T, 0)
+
         # ``model.kernel`` is (n_gradients_in, n_vertices); transpose it to
         # contract the shared vertex axis against the reconstruction kernel,
         # yielding the fused (n_gradients_out, n_gradients_in) operator.
-        K = (
-            prediction_kernel(
-                gtab,
-                self.model.Lambda,
-                self.model.sphere,
-                method=self.model.method,
-            )
-            @ self.model.kernel.T
-        )
+        K = K_plus @ self.model.kernel.T
 
         return np.maximum((K @ self.data.T).T, 0)
 
@@ -283,6 +313,59 @@ def gqi_kernel(gtab, param_lambda, sphere, method="standard"):
     return np.real(np.sinc(np.dot(b_vector, sphere.vertices.T) * param_lambda / np.pi))
 
 
+def truncated_kernel(kernel, spectral_energy):
+    r"""
+    Truncate the forward GQI kernel to the leading eigenvectors of its Gram matrix.
+
+    With the eigendecomposition
+    :math:`\mathbf{K}\mathbf{K}^{\mathsf T} = \mathbf{U}\mathbf{\Lambda}\mathbf{U}^{\mathsf T}`
+    (eigenvalues in decreasing order), the kernel is approximated by
+    :math:`\mathbf{K} \approx \mathbf{U}_r (\mathbf{U}_r^{\mathsf T}\mathbf{K})`, with the
+    smallest rank :math:`r` retaining the fraction ``spectral_energy`` of
+    :math:`\operatorname{tr}\mathbf{\Lambda}` (the squared Frobenius norm of
+    :math:`\mathbf{K}`). Since the spectrum decays quickly, :math:`r` is well below
+    the number of gradients, and does not grow with the sphere density.
+
+    Parameters
+    ----------
+    kernel : :obj:`~numpy.ndarray`
+        The forward GQI kernel, shape ``(n_gradients, n_vertices)``.
+    spectral_energy : float
+        Fraction of the spectral energy to retain, in :math:`(0, 1]`.
+
+    Returns
+    -------
+    loadings : :obj:`~numpy.ndarray`
+        Orthonormal eigenvectors :math:`\mathbf{U}_r`, shape ``(n_gradients, rank)``.
+    basis : :obj:`~numpy.ndarray`
+        The compressed kernel :math:`\mathbf{U}_r^{\mathsf T}\mathbf{K}`, shape
+        ``(rank, n_vertices)``.
+    reconstruction_error : float
+        Relative Frobenius error of the truncated kernel, i.e., the square root of
+        the discarded fraction of the spectral energy.
+
+    Examples
+    --------
+    >>> rng = np.random.default_rng(1234)
+    >>> kernel = rng.standard_normal((4, 2)) @ rng.standard_normal((2, 10))
+    >>> loadings, basis, error = truncated_kernel(kernel, 0.999999)
+    >>> loadings.shape, basis.shape, bool(error < 1e-6)
+    ((4, 2), (2, 10), True)
+    >>> bool(np.allclose(loadings @ basis, kernel))
+    True
+
+    """
+    if not 0.0 < spectral_energy <= 1.0:
+        raise ValueError(SPECTRAL_ENERGY_ERROR_MSG.format(energy=spectral_energy))
+
+    eigvals, eigvecs = np.linalg.eigh(kernel @ kernel.T)
+    eigvals, eigvecs = np.clip(eigvals[::-1], 0, None), eigvecs[:, ::-1]
+    energy = np.cumsum(eigvals) / eigvals.sum()
+    rank = min(int(np.searchsorted(energy, spectral_energy)) + 1, len(energy))
+    loadings = eigvecs[:, :rank]
+    return loadings, loadings.T @ kernel, float(np.sqrt(max(1.0 - energy[rank - 1], 0.0)))
+
+
 def prediction_kernel(gtab, param_lambda, sphere, method="standard"):
     r"""
     Compute the Tikhonov-regularized reconstruction kernel for GQI.
@@ -321,3 +404,85 @@ def prediction_kernel(gtab, param_lambda, sphere, method="standard"):
     GtG = K @ K.T
     identity = np.eye(GtG.shape[0])
     return np.linalg.inv(GtG + INVERSE_LAMBDA * identity) @ K
+
+
+class LOVOKernel:
+    r"""Leave-one-volume-out prediction operators of GQI, sharing one Gram matrix.
+
+    The fused prediction operator of :meth:`GeneralizedQSamplingFit.predict`,
+    fitted on the gradients :math:`\mathcal{I}` and predicting the held-out
+    gradients :math:`\mathcal{O}`, only involves blocks of the Gram matrix
+    :math:`\mathbf{G} = \mathbf{K}\mathbf{K}^{\mathsf T}` of the full gradient table:
+
+    .. math::
+
+        (\mathbf{K}_\mathcal{O}\mathbf{K}_\mathcal{O}^{\mathsf T} + \lambda_0\mathbf{I})^{-1}
+        \mathbf{K}_\mathcal{O}\mathbf{K}_\mathcal{I}^{\mathsf T} =
+        (\mathbf{G}_{\mathcal{O}\mathcal{O}} + \lambda_0\mathbf{I})^{-1}
+        \mathbf{G}_{\mathcal{O}\mathcal{I}}.
+
+    The forward kernel and :math:`\mathbf{G}` are therefore computed once, and each
+    fold only solves the (Cholesky-factorized) held-out block, which is a scalar when
+    a single volume is left out.
+
+    Parameters
+    ----------
+    gtab : :obj:`~dipy.core.gradients.GradientTable`
+        Gradient table of all volumes.
+    method : {"standard", "gqi2"}, optional
+        GQI reconstruction variant (see :class:`GeneralizedQSamplingModel`).
+    sampling_length : float, optional
+        Diffusion sampling length :math:`\sigma`.
+    sphere : :obj:`~dipy.core.sphere.Sphere`, optional
+        ODF sampling sphere. When given, ``recursion_level`` is ignored.
+    recursion_level : int, optional
+        Subdivision level of the icosahedral ODF sampling sphere.
+
+    Examples
+    --------
+    >>> from dipy.core.gradients import gradient_table
+    >>> bvecs = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1], [0.6, 0.8, 0]])
+    >>> lovo = LOVOKernel(gradient_table(np.full(4, 1000.0), bvecs=bvecs), recursion_level=3)
+    >>> lovo.operator(2).shape
+    (1, 3)
+
+    """
+
+    __slots__ = ("gram",)
+
+    def __init__(
+        self,
+        gtab,
+        *,
+        method="standard",
+        sampling_length=1.2,
+        sphere=None,
+        recursion_level=DEFAULT_SPHERE_RECURSION_LEVEL,
+    ):
+        sphere = create_unit_sphere(recursion_level=recursion_level) if sphere is None else sphere
+        K = gqi_kernel(gtab, sampling_length, sphere, method=method)
+        # Gram matrix of the forward kernel, shape (n_gradients, n_gradients)
+        self.gram = K @ K.T
+
+    def operator(self, index):
+        """Return the fused prediction operator of the held-out gradients ``index``.
+
+        Parameters
+        ----------
+        index : :obj:`int` or array-like
+            Index (or indices, or boolean mask) of the held-out gradients.
+
+        Returns
+        -------
+        :obj:`~numpy.ndarray`
+            The operator mapping the signal of the remaining gradients (in order)
+            onto the held-out ones, shape ``(n_gradients_out, n_gradients_in)``;
+            equal to :func:`prediction_kernel` of the held-out gradients times the
+            transposed forward kernel of the remaining ones.
+
+        """
+        held_out = np.zeros(len(self.gram), dtype=bool)
+        held_out[index] = True
+        block = self.gram[np.ix_(held_out, held_out)]
+        factor = cho_factor(block + INVERSE_LAMBDA * np.eye(len(block)))
+        return cho_solve(factor, self.gram[np.ix_(held_out, ~held_out)])
@@ -0,0 +1,201 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+#
+r"""
+Closed-form leave-one-out solutions of linear least-squares problems.
+
+A model that is linear in its parameters, :math:`\mathbf{y} = \mathbf{A}\beta`,
+does not need to be refitted to leave an observation out.
+With :math:`\mathbf{G} = (\mathbf{A}^{\mathsf T}\mathbf{W}\mathbf{A})^{-1}
+\mathbf{A}^{\mathsf T}\mathbf{W}` (the weighted pseudoinverse of the design), the
+fit of all observations :math:`\hat\beta = \mathbf{G}\mathbf{y}`, its residuals
+:math:`r_i` and the leverages :math:`h_i = \mathbf{a}_i^{\mathsf T}\mathbf{g}_i`,
+the Sherman-Morrison formula downdates the normal equations by the held-out
+row :math:`i`:
+
+.. math::
+
+   \hat\beta_{-i} = \hat\beta - \mathbf{g}_i \frac{r_i}{1 - h_i}.
+
+Likewise, the predictive mean of a Gaussian process at a left-out training input
+follows from the inverse of the training covariance :math:`\mathbf{K}`
+(with fixed hyperparameters; Rasmussen and Williams, 2006, Eq. 5.12):
+
+.. math::
+
+   \mu_{-i} = y_i - \frac{[\mathbf{K}^{-1}\mathbf{y}]_i}{[\mathbf{K}^{-1}]_{ii}}.
+
+"""
+
+import numpy as np
+from scipy.linalg import cho_solve
+
+
+def lstsq_loo(
+    design: np.ndarray,
+    data: np.ndarray,
+    weights: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Fit the least-squares coefficients of every observation left out, for many targets.
+
+    Parameters
+    ----------
+    design : :obj:`~numpy.ndarray`
+        Design matrix, shape (N, P), of the N observations.
+    data : :obj:`~numpy.ndarray`
+        Observations of each target (e.g., voxel), shape (V, N).
+    weights : :obj:`~numpy.ndarray`, optional
+        Weights of the observations of each target, shape (V, N).
+        Ordinary least squares are solved if :obj:`None`.
+
+    Returns
+    -------
+    :obj:`~numpy.ndarray`
+        Coefficients, shape (V, N, P), where ``[v, i]`` are the coefficients of
+        target ``v`` fitted on all observations but ``i``.
+        Observations that cannot be left out without making the problem
+        rank-deficient (unit leverage) have non-finite coefficients.
+
+    Examples
+    --------
+    >>> rng = np.random.default_rng(1234)
+    >>> design = np.column_stack((np.ones(6), np.arange(6.0)))
+    >>> data = rng.normal(size=(3, 6))
+    >>> coef = lstsq_loo(design, data)
+    >>> refit = np.linalg.lstsq(np.delete(design, 2, 0), np.delete(data[1], 2), rcond=None)
+    >>> np.allclose(coef[1, 2], refit[0])
+    True
+
+    """
+    if weights is None:
+        pinv = np.linalg.pinv(design)[np.newaxis]
+    else:
+        sqrt_w = np.sqrt(weights)
+        pinv = np.linalg.pinv(sqrt_w[..., np.newaxis] * design) * sqrt_w[:, np.newaxis, :]
+
+    coef = (pinv @ data[..., np.newaxis])[..., 0]
+    residuals = data - coef @ design.T
+    leverages = np.sum(pinv * design.T, axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.where(np.isclose(leverages, 1.0), np.nan, residuals / (1.0 - leverages))
+
+    return coef[:, np.newaxis, :] - scale[..., np.newaxis] * np.swapaxes(pinv, 1, 2)
+
+
+def lstsq_loo_operator(design: np.ndarray) -> np.ndarray:
+    r"""
+    Compute the operator predicting every observation from the least-squares fit of the others.
+
+    With the hat matrix :math:`\mathbf{H} = \mathbf{A}\mathbf{A}^{+}` and the
+    leverages :math:`h_i = H_{ii}`, the prediction of observation :math:`i` by the
+    ordinary least-squares fit of all other observations is
+    :math:`\hat y_{-i} = (\sum_j H_{ij} y_j - h_i y_i) / (1 - h_i)`.
+    Observations with unit leverage (e.g., when the design has no more
+    observations than parameters) are refitted explicitly, with the
+    minimum-norm solution of the rank-deficient problem.
+
+    Parameters
+    ----------
+    design : :obj:`~numpy.ndarray`
+        Design matrix, shape (N, P), of the N observations.
+
+    Returns
+    -------
+    :obj:`~numpy.ndarray`
+        Operator, shape (N, N), with a null diagonal, such that ``operator @ y``
+        predicts each observation of ``y`` (shape (N,) or (N, V)) by the fit of all
+        the other observations.
+
+    Examples
+    --------
+    >>> design = np.column_stack((np.ones(6), np.arange(6.0)))
+    >>> y = np.random.default_rng(1234).normal(size=6)
+    >>> refit = np.linalg.lstsq(np.delete(design, 2, 0), np.delete(y, 2), rcond=None)
+    >>> np.allclose((lstsq_loo_operator(design) @ y)[2], design[2] @ refit[0])
+    True
+
+    """
+    hat = design @ np.linalg.pinv(design)
+    leverages = np.diag(hat).copy()
+    refit = np.isclose(leverages, 1.0)
+    leverages[refit] = 0.0
+
+    operator = (hat - np.diag(leverages)) / (1.0 - leverages)[:, np.newaxis]
+    for index in np.flatnonzero(refit):
+        keep = np.arange(design.shape[0]) != index
+        operator[index, index] = 0.0
+        operator[index, keep] = design[index] @ np.linalg.pinv(design[keep])
+
+    return operator
+
+
+def gp_loo(cholesky: np.ndarray, data: np.ndarray, center: bool = False) -> np.ndarray:
+    """
+    Compute the leave-one-out predictive means of a Gaussian process, for many targets.
+
+    The hyperparameters (hence, the covariance) are those of the fit of all
+    observations, which is factorized only once.
+
+    Parameters
+    ----------
+    cholesky : :obj:`~numpy.ndarray`
+        Lower Cholesky factor, shape (N, N), of the covariance of the N training
+        inputs (noise and jitter included).
+    data : :obj:`~numpy.ndarray`
+        Training observations of each target, shape (N, V).
+    center : :obj:`bool`, optional
+        Whether the observations are centered by their mean before regression
+        (e.g., ``normalize_y`` of :obj:`~sklearn.gaussian_process.GaussianProcessRegressor`),
+        in which case each left-out fit is centered by the mean of its own N - 1
+        observations.
+
+    Returns
+    -------
+    :obj:`~numpy.ndarray`
+        Predictive means, shape (N, V), where ``[i, v]`` is the prediction of
+        observation ``i`` of target ``v`` by the fit of all other observations.
+
+    Examples
+    --------
+    >>> rng = np.random.default_rng(1234)
+    >>> x = np.linspace(0, 1, 8)
+    >>> cov = np.exp(-((x[:, None] - x[None]) ** 2) / 0.1) + 0.01 * np.eye(8)
+    >>> data = rng.normal(size=(8, 2))
+    >>> loo = gp_loo(np.linalg.cholesky(cov), data)
+    >>> keep = np.arange(8) != 3
+    >>> refit = cov[3, keep] @ np.linalg.solve(cov[np.ix_(keep, keep)], data[keep])
+    >>> np.allclose(loo[3], refit)
+    True
+
+    """
+    data = np.reshape(data, (cholesky.shape[0], -1))
+    cov_inv = cho_solve((cholesky, True), np.eye(cholesky.shape[0]))
+    weights = cov_inv @ data
+    if center:
+        # Mean of the observations each fold is trained on
+        fold_means = (data.sum(axis=0) - data) / (data.shape[0] - 1)
+        weights -= cov_inv.sum(axis=1)[:, np.newaxis] * fold_means
+
+    return data - weights / np.diag(cov_inv)[:, np.newaxis]
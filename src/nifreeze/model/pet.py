@@ -25,15 +25,15 @@
 from abc import ABC, ABCMeta, abstractmethod
 from os import cpu_count
 from typing import Union
+from warnings import warn
 
 import numpy as np
-
-# from scipy.sparse import linalg as la
-from scipy import linalg as la
 from scipy.interpolate import BSpline
 
 from nifreeze.data.pet import PET
-from nifreeze.model.base import BaseModel
+from nifreeze.model.base import SINGLE_FIT_CANARY_MSG, BaseModel, SingleFitCanaryWarning
+from nifreeze.model.loo import lstsq_loo_operator
+from nifreeze.utils.instrumentation import STEP_FIT, STEP_PREDICT, measure
 
 PET_OBJECT_ERROR_MSG = "Dataset MUST be a PET object."
 """PET object error message."""
@@ -181,6 +181,8 @@ class BSplinePETModel(BasePETModel):
         "_t": "B-Spline knot time-coordinates",
         "_order": "B-Spline order",
         "_n_ctrl": "Number of B-Spline control points",
+        "_design": "B-Spline basis evaluated at the midframe of every frame",
+        "_lovo": "Operator predicting each frame from the B-Spline fit of all other frames",
     }
 
     def __init__(
@@ -225,64 +227,71 @@ class BSplinePETModel(BasePETModel):
         # Time-coordinates of the B-Spline knots
         self._t = _build_bspline_knots(self._dataset.midframe, self._n_ctrl, self._order)
 
+        # A.shape = (T, K - 4); t= n. timepoints, K= n. knots (with padding)
+        self._design = (
+            BSpline.design_matrix(
+                self._dataset.midframe, t=self._t, k=self._order, extrapolate=False
+            )
+            .toarray()
+            .astype("float64")
+        )
+        self._lovo: np.ndarray | None = None
+
     def fit_predict(self, index: int | None = None, **kwargs) -> Union[np.ndarray, None]:
         """Return the corrected volume using B-spline interpolation.
 
         Predictions for times earlier than the configured start time will return
         the prediction for the start time.
-        """
 
-        if index is None:
-            raise NotImplementedError(
-                "Fitting all frames at once (index=None) is not yet implemented. "
-                "Use LOVO mode by passing an integer index."
-            )
+        If ``index`` is :obj:`None` (single-fit mode), the B-spline coefficients of
+        every voxel are fitted once on all frames, and later calls evaluate that
+        locked fit at the midframe of the requested frame.
+        """
 
         n_jobs = kwargs.pop("n_jobs", min(cpu_count() or 1, 8))
 
-        # Generate a time mask for the frames to fit
-        x_mask = np.ones(len(self._dataset), dtype=bool)
-
-        x_mask[index] = False if index is not None else x_mask[index]
-        x = self._dataset.midframe[x_mask].tolist()
-
-        # A.shape = (T, K - 4); t= n. timepoints, K= n. knots (with padding)
-        A = BSpline.design_matrix(x, t=self._t, k=self._order, extrapolate=False)
-
-        # Get data as 2D array (voxels x timepoints)
-        data = (
-            self._dataset.dataobj.reshape((-1, len(self._dataset)))
-            if self._dataset.brainmask is None
-            else self._dataset.dataobj[self._dataset.brainmask, :]
-        )
-
-        X = la.lstsq(
-            A.toarray().astype("float64"),
-            data[:, x_mask].T.astype("float64"),
-            cond=None,
-            lapack_driver="gelsd",
-        )
-        coefficients = X[0].T.astype("float32")
-
-        # Generate an interpolation time mask
-        interp_mask = np.zeros(len(self._dataset), dtype=bool)
-        interp_index = index if index is not None else slice(0, len(interp_mask))
-        interp_mask[interp_index] = True
-
-        A = BSpline.design_matrix(
-            self._dataset.midframe[interp_mask], self._t, k=self._order, extrapolate=False
-        )
-
-        # A is T (num. timepoints) x C (num. coeff)
-        # coefficients is V (num. voxels) x C (num. coeff)
-        predicted = np.squeeze(A @ coefficients.T).T
-
         brainmask = self._dataset.brainmask
-        datashape = self._dataset.dataobj.shape[:3]
-
-        if brainmask is None:
-            return predicted.reshape(datashape)
-
-        retval = np.squeeze(np.zeros_like(self._dataset.dataobj[..., interp_mask]))
+        if index is None:
+            if self._locked_fit is None:
+                with measure(STEP_FIT, index):
+                    # Coefficients of the masked voxels, shape (V, C), or of
+                    # every voxel, shape (X, Y, Z, C), if there is no mask
+                    pinv = np.linalg.pinv(self._design).T.astype("float32")
+                    data = self._dataset.dataobj
+                    self._locked_fit = (data if brainmask is None else data[brainmask]) @ pinv
+                self._warn_single_fit_canary()
+            return None
+
+        if self._locked_fit is not None:
+            with measure(STEP_PREDICT, index):
+                predicted = self._locked_fit @ self._design[index].astype("float32")
+            if brainmask is None:
+                return predicted
+        else:
+            with measure(STEP_FIT, index):
+                if self._lovo is None:
+                    # All held-out fits share one (small) design matrix, so the operators
+                    # predicting every frame from the others are computed only once
+                    self._lovo = lstsq_loo_operator(self._design).astype("float32")
+
+            with measure(STEP_PREDICT, index):
+                # Frames are resampled in place as they are realigned, so the masked
+                # voxels are read from the current data (voxels x timepoints @ timepoints)
+                data = self._dataset.dataobj
+                if brainmask is None:
+                    return data @ self._lovo[index]
+                predicted = data[brainmask] @ self._lovo[index]
+
+        retval = np.zeros_like(self._dataset.dataobj[..., index])
         retval[brainmask] = predicted
         return retval
+
+    def _warn_single_fit_canary(self) -> None:
+        """Warn if the B-spline basis interpolates, rather than smooths, all frames.
+
+        With no more frames than basis functions, the single fit reproduces every
+        frame exactly, as the self-reconstructing models flagged with
+        :attr:`~nifreeze.model.base.BaseModel.single_fit_is_canary` do.
+        """
+        if self.single_fit_is_canary or len(self._design) <= self._design.shape[1]:
+            warn(SINGLE_FIT_CANARY_MSG, SingleFitCanaryWarning, stacklevel=3)
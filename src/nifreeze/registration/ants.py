@@ -24,10 +24,17 @@
 
 from __future__ import annotations
 
+import asyncio
+import os
+import shlex
 from collections import namedtuple
+from hashlib import sha1
 from importlib.resources import files
 from json import loads
+from os import getpid, replace
 from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import get_ident
 from warnings import warn
 
 import nibabel as nb
@@ -37,6 +44,14 @@ from nipype.interfaces.ants.registration import Registration
 from nitransforms.linear import Affine
 from nitransforms.resampling import apply
 
+from nifreeze.registration.base import RegistrationBackend
+from nifreeze.utils.instrumentation import (
+    STEP_READBACK,
+    STEP_REGISTRATION,
+    STEP_WRITE,
+    measure,
+)
+
 PARAMETERS_SINGLE_VALUE = {
     "collapse_output_transforms",
     "dimension",
@@ -61,6 +76,11 @@ PARAMETERS_DOUBLE_LIST = {"shrink_factors", "smoothing_sigmas", "transform_param
 REGISTRATION_MALFORMED_SETTINGS_ERROR_MSG = "Malformed settings file (levels: {levels})"
 """Registration malformed settings error message."""
 
+REGISTRATION_FAILED_ERROR_MSG = (
+    "antsRegistration failed on volume {index} (exit code {returncode}), see <{log}>."
+)
+"""Registration subprocess failure error message."""
+
 
 def _to_nifti(
     data: np.ndarray, affine: np.ndarray, filename: str | Path, clip: bool = True
@@ -140,26 +160,27 @@ def _prepare_registration_data(
     predicted_path = Path(dirname) / f"predicted_{vol_idx:05d}.nii.gz"
     sample_path = Path(dirname) / f"sample_{vol_idx:05d}.nii.gz"
 
-    _to_nifti(
-        sample,
-        affine,
-        sample_path,
-        clip=str(clip).lower() in ("sample", "both", "true"),
-    )
-    _to_nifti(
-        predicted,
-        affine,
-        predicted_path,
-        clip=str(clip).lower() in ("predicted", "both", "true"),
-    )
-
-    init_path = None
-    if init_affine is not None:
-        ImageGrid = namedtuple("ImageGrid", ("shape", "affine"))
-        reference = ImageGrid(shape=sample.shape[:3], affine=affine)
-        initial_xform = Affine(matrix=init_affine, reference=reference)
-        init_path = Path(dirname) / f"init_{vol_idx:05d}.mat"
-        initial_xform.to_filename(init_path, fmt="itk")
+    with measure(STEP_WRITE, vol_idx):
+        _to_nifti(
+            sample,
+            affine,
+            sample_path,
+            clip=str(clip).lower() in ("sample", "both", "true"),
+        )
+        _to_nifti(
+            predicted,
+            affine,
+            predicted_path,
+            clip=str(clip).lower() in ("predicted", "both", "true"),
+        )
+
+        init_path = None
+        if init_affine is not None:
+            ImageGrid = namedtuple("ImageGrid", ("shape", "affine"))
+            reference = ImageGrid(shape=sample.shape[:3], affine=affine)
+            initial_xform = Affine(matrix=init_affine, reference=reference)
+            init_path = Path(dirname) / f"init_{vol_idx:05d}.mat"
+            initial_xform.to_filename(init_path, fmt="itk")
 
     return predicted_path, sample_path, init_path
 
@@ -438,15 +459,17 @@ def generate_command(
     return reg_iface
 
 
-def _run_registration(
+def _registration_command(
     fixed_path: str | Path,
     moving_path: str | Path,
     vol_idx: int,
     dirname: Path,
     **kwargs,
-) -> nt.base.BaseTransform:
+) -> Registration:
     """
-    Register the moving image to the fixed image.
+    Configure the registration of the moving image to the fixed image.
+
+    The command line is also written into ``dirname`` for reference.
 
     Parameters
     ----------
@@ -463,8 +486,8 @@ def _run_registration(
 
     Returns
     -------
-    xform : :obj:`~nitransforms.base.BaseTransform`
-        Registration transformation.
+    :obj:`~nipype.interfaces.ants.Registration`
+        The configured Nipype interface of ANTs registration.
 
     """
 
@@ -489,19 +512,271 @@ def _run_registration(
     )
 
     (dirname / f"cmd-{vol_idx:05d}.sh").write_text(registration.cmdline)
+    return registration
+
+
+def _read_transform(
+    xform_path: str | Path,
+    fixed_path: str | Path,
+    moving_path: str | Path,
+    vol_idx: int,
+    dirname: Path,
+) -> nt.base.BaseTransform:
+    """Read the transform estimated by ANTs (and resample the moving image for debugging)."""
+    with measure(STEP_READBACK, vol_idx):
+        # read output transform
+        xform = nt.linear.Affine(
+            nt.io.itk.ITKLinearTransform.from_filename(xform_path).to_ras(
+                reference=fixed_path, moving=moving_path
+            ),
+        )
+        # debugging: generate aligned file for testing
+        apply(xform, moving_path, reference=fixed_path).to_filename(
+            dirname / f"dbg_{vol_idx:05d}.nii.gz"
+        )
+
+    return xform
+
+
+def _run_registration(
+    fixed_path: str | Path,
+    moving_path: str | Path,
+    vol_idx: int,
+    dirname: Path,
+    **kwargs,
+) -> nt.base.BaseTransform:
+    """
+    Register the moving image to the fixed image.
+
+    Parameters
+    ----------
+    fixed_path : :obj:`Path`
+        Fixed image filename.
+    moving_path : :obj:`Path`
+        Moving image filename.
+    vol_idx : :obj:`int`
+        Dataset volume index.
+    dirname : :obj:`Path`
+        Directory name where the transformation is saved.
+    kwargs : :obj:`dict`
+        Parameters to configure the image registration process.
+
+    Returns
+    -------
+    xform : :obj:`~nitransforms.base.BaseTransform`
+        Registration transformation.
+
+    """
+
+    registration = _registration_command(fixed_path, moving_path, vol_idx, dirname, **kwargs)
 
     # execute ants command line
-    result = registration.run(cwd=str(dirname)).outputs
+    with measure(STEP_REGISTRATION, vol_idx, children=True):
+        result = registration.run(cwd=str(dirname)).outputs
+
+    return _read_transform(result.forward_transforms[0], fixed_path, moving_path, vol_idx, dirname)
+
 
-    # read output transform
-    xform = nt.linear.Affine(
-        nt.io.itk.ITKLinearTransform.from_filename(result.forward_transforms[0]).to_ras(
-            reference=fixed_path, moving=moving_path
-        ),
+async def _arun_registration(
+    fixed_path: str | Path,
+    moving_path: str | Path,
+    vol_idx: int,
+    dirname: Path,
+    **kwargs,
+) -> nt.base.BaseTransform:
+    """
+    Register the moving image to the fixed image, awaiting ANTs as a subprocess.
+
+    Unlike :func:`_run_registration`, the event loop is not blocked while ANTs
+    runs, and cancelling the coroutine kills the ANTs process.
+    Parameters are those of :func:`_run_registration`.
+
+    """
+
+    # nipype may query ``antsRegistration --version`` while building the command line
+    registration = await asyncio.to_thread(
+        _registration_command, fixed_path, moving_path, vol_idx, dirname, **kwargs
     )
-    # debugging: generate aligned file for testing
-    apply(xform, moving_path, reference=fixed_path).to_filename(
-        dirname / f"dbg_{vol_idx:05d}.nii.gz"
+    cmdline = await asyncio.to_thread(getattr, registration, "cmdline")
+    log_prefix = dirname / f"ants-{vol_idx:05d}"
+
+    # execute ants command line
+    with (
+        measure(STEP_REGISTRATION, vol_idx, children=True),
+        open(f"{log_prefix}.out", "w") as stdout,
+        open(f"{log_prefix}.err", "w") as stderr,
+    ):
+        process = await asyncio.create_subprocess_exec(
+            *shlex.split(cmdline),
+            cwd=dirname,
+            stdout=stdout,
+            stderr=stderr,
+            env=os.environ | dict(registration.inputs.environ),
+        )
+        try:
+            returncode = await process.wait()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+
+    if returncode:
+        raise RuntimeError(
+            REGISTRATION_FAILED_ERROR_MSG.format(
+                index=vol_idx, returncode=returncode, log=f"{log_prefix}.err"
+            )
+        )
+
+    outputs = await asyncio.to_thread(registration.aggregate_outputs)
+    return await asyncio.to_thread(
+        _read_transform,
+        outputs.forward_transforms[0],
+        fixed_path,
+        moving_path,
+        vol_idx,
+        dirname,
     )
 
-    return xform
+
+def _write_mask(mask: np.ndarray, affine: np.ndarray, dirname: Path) -> Path:
+    """
+    Write a mask as a NIfTI file, once per distinct mask and affine.
+
+    The file name is derived from the contents, so that concurrent
+    registrations (threads or processes) sharing ``dirname`` reuse the file.
+
+    """
+    digest = sha1(np.ascontiguousarray(mask, dtype=np.uint8).tobytes())
+    digest.update(np.ascontiguousarray(affine, dtype=float).tobytes())
+    mask_path = Path(dirname) / f"mask-{digest.hexdigest()[:16]}.nii.gz"
+    if mask_path.exists():
+        return mask_path
+
+    with measure(STEP_WRITE):
+        # Write to a private file first and atomically move into place
+        tmp_path = mask_path.with_name(f".{getpid()}-{get_ident()}-{mask_path.name}")
+        nb.Nifti1Image(mask.astype(np.uint8), affine, None).to_filename(tmp_path)
+        replace(tmp_path, mask_path)
+    return mask_path
+
+
+class ANTsBackend(RegistrationBackend):
+    """
+    Register volumes with ``antsRegistration`` (through *Nipype*).
+
+    Volumes (and masks) are written out as NIfTI files into ``workdir``, where
+    ANTs is executed and its outputs are read back.
+
+    Parameters
+    ----------
+    workdir : :obj:`os.pathlike`, optional
+        Directory where inputs and outputs of ANTs are stored. By default,
+        a temporary directory owned by the backend, which is removed with
+        :meth:`cleanup` or when the backend is garbage collected.
+    clip : :obj:`str`, optional
+        Clip intensity of ``"sample"``, ``"predicted"``, ``"both"``,
+        or ``"none"`` of the images before registration.
+    **kwargs : :obj:`dict`
+        Parameters to configure the image registration process
+        (see :func:`_run_registration`).
+
+    """
+
+    __slots__ = ("_workdir", "_tmpdir", "_clip", "_settings")
+
+    def __init__(
+        self,
+        workdir: str | Path | None = None,
+        clip: str | bool | None = "both",
+        **kwargs,
+    ):
+        self._tmpdir: TemporaryDirectory | None = None
+        if workdir is None:
+            self._tmpdir = TemporaryDirectory(prefix="nifreeze-ants-")
+            workdir = self._tmpdir.name
+        self._workdir = Path(workdir)
+        self._clip = clip
+        self._settings = kwargs
+
+    def __getstate__(self) -> tuple[None, dict]:
+        """
+        State of the backend, for copying and pickling.
+
+        Copies (e.g., in worker processes) share the working directory, which
+        remains owned (and removed) by the original backend.
+
+        """
+        return None, {
+            "_workdir": self._workdir,
+            "_tmpdir": None,
+            "_clip": self._clip,
+            "_settings": self._settings,
+        }
+
+    def cleanup(self) -> None:
+        """Remove the working directory, if it is a temporary one owned by the backend."""
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+
+    def register(
+        self,
+        fixed: np.ndarray,
+        moving: np.ndarray,
+        affine: np.ndarray,
+        index: int = 0,
+        fixedmask: np.ndarray | None = None,
+        init_affine: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Run ANTs to register ``moving`` to ``fixed`` (see :obj:`RegistrationBackend`)."""
+        args, kwargs = self._prepare(fixed, moving, affine, index, fixedmask, init_affine)
+        return _run_registration(*args, **kwargs).matrix
+
+    async def aregister(
+        self,
+        fixed: np.ndarray,
+        moving: np.ndarray,
+        affine: np.ndarray,
+        index: int = 0,
+        fixedmask: np.ndarray | None = None,
+        init_affine: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Await ANTs as a subprocess, which is killed if cancelled (see :meth:`register`)."""
+        args, kwargs = await asyncio.to_thread(
+            self._prepare, fixed, moving, affine, index, fixedmask, init_affine
+        )
+        return (await _arun_registration(*args, **kwargs)).matrix
+
+    def _prepare(
+        self,
+        fixed: np.ndarray,
+        moving: np.ndarray,
+        affine: np.ndarray,
+        index: int,
+        fixedmask: np.ndarray | None,
+        init_affine: np.ndarray | None,
+    ) -> tuple[tuple, dict]:
+        """Write the inputs of ANTs, and return the arguments of :func:`_run_registration`."""
+        workdir = self._workdir
+
+        # prepare data for running ANTs
+        predicted_path, volume_path, init_path = _prepare_registration_data(
+            moving,
+            fixed,
+            affine,
+            index,
+            workdir,
+            self._clip,
+            init_affine=init_affine,
+        )
+
+        fixedmask_path = None
+        if fixedmask is not None:
+            fixedmask_path = _write_mask(fixedmask, affine, workdir)
+
+        # Absolute prefix: concurrent registrations may change the working directory
+        return (predicted_path, volume_path, index, workdir), {
+            "init_affine": init_path,
+            "fixedmask_path": fixedmask_path,
+            "output_transform_prefix": str(workdir / f"ants-{index:05d}"),
+            **self._settings,
+        }
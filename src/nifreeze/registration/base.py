@@ -0,0 +1,156 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Base infrastructure for nifreeze's registration engines."""
+
+from __future__ import annotations
+
+import asyncio
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+DEFAULT_REGISTRATION_BACKEND = "ants"
+"""Registration backend used unless otherwise requested."""
+UNSUPPORTED_BACKEND_ERROR_MSG = "Unsupported registration backend <{backend}>."
+"""Unsupported registration backend error message."""
+
+
+class RegistrationBackend(ABC):
+    """
+    Estimate the transform aligning an observed volume to its prediction.
+
+    Backends operate on in-memory arrays. Both volumes share the same voxel
+    grid, described by a single affine. The returned 4x4 matrix follows the
+    convention of :obj:`~nitransforms.linear.Affine` for image registration:
+    it maps world (RAS+) coordinates of the *fixed* (predicted) image onto
+    world coordinates of the *moving* (observed) image, i.e., it is the
+    transform that resamples the observed volume into alignment.
+
+    """
+
+    __slots__ = ()
+
+    @abstractmethod
+    def register(
+        self,
+        fixed: np.ndarray,
+        moving: np.ndarray,
+        affine: np.ndarray,
+        index: int = 0,
+        fixedmask: np.ndarray | None = None,
+        init_affine: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Register ``moving`` to ``fixed``.
+
+        Parameters
+        ----------
+        fixed : :obj:`~numpy.ndarray`
+            The reference (predicted) volume.
+        moving : :obj:`~numpy.ndarray`
+            The observed volume.
+        affine : :obj:`~numpy.ndarray`
+            Voxel-to-world (RAS+) affine of both volumes.
+        index : :obj:`int`, optional
+            Index of the volume within the dataset (for bookkeeping).
+        fixedmask : :obj:`~numpy.ndarray`, optional
+            A mask restricting the computation of the metric in the fixed image.
+        init_affine : :obj:`~numpy.ndarray`, optional
+            Initial transform (same convention as the returned matrix).
+
+        Returns
+        -------
+        :obj:`~numpy.ndarray`
+            The 4x4 matrix of the estimated transform.
+
+        """
+
+    async def aregister(
+        self,
+        fixed: np.ndarray,
+        moving: np.ndarray,
+        affine: np.ndarray,
+        index: int = 0,
+        fixedmask: np.ndarray | None = None,
+        init_affine: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Register ``moving`` to ``fixed`` without blocking the event loop.
+
+        Parameters are those of :meth:`register`. By default, :meth:`register`
+        runs in a worker thread (which cannot be interrupted if the coroutine is
+        cancelled); backends driving subprocesses override this method to await
+        (and kill) them.
+
+        """
+        return await asyncio.to_thread(
+            self.register,
+            fixed,
+            moving,
+            affine,
+            index=index,
+            fixedmask=fixedmask,
+            init_affine=init_affine,
+        )
+
+
+class RegistrationFactory:
+    """A factory for instantiating registration backends."""
+
+    @staticmethod
+    def init(backend: str | None = None, **kwargs) -> RegistrationBackend:
+        """
+        Instantiate a registration backend.
+
+        Parameters
+        ----------
+        backend : :obj:`str`, optional
+            Name of the backend (defaults to :data:`DEFAULT_REGISTRATION_BACKEND`).
+            Options: ``"ants"`` and ``"native"``.
+        **kwargs : :obj:`dict`
+            Settings of the backend.
+
+        Returns
+        -------
+        :obj:`~nifreeze.registration.base.RegistrationBackend`
+            The registration backend.
+
+        Examples
+        --------
+        >>> RegistrationFactory.init("ants", clip="none")  # doctest: +ELLIPSIS
+        <nifreeze.registration.ants.ANTsBackend object at ...>
+
+        """
+        backend = (backend or DEFAULT_REGISTRATION_BACKEND).lower()
+
+        if backend in ("ants", "antsregistration"):
+            from nifreeze.registration.ants import ANTsBackend
+
+            return ANTsBackend(**kwargs)
+
+        if backend == "native":
+            from nifreeze.registration.native import NativeBackend
+
+            return NativeBackend(**kwargs)
+
+        raise NotImplementedError(UNSUPPORTED_BACKEND_ERROR_MSG.format(backend=backend))
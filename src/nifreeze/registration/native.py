@@ -0,0 +1,491 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""
+In-process linear image registration with NumPy and SciPy.
+
+The engine mirrors the multi-stage, multi-resolution scheme of
+``antsRegistration`` and reads the same settings files
+(see :func:`~nifreeze.registration.ants.generate_command`), so that the
+native and the ANTs backends can be swapped without retuning.
+Each stage optimizes a rigid (6-DOF), affine (12-DOF) or translation
+transform with L-BFGS-B, using analytic gradients of the global
+correlation (``"GC"``) or Mattes mutual information (``"Mattes"``) metrics
+evaluated on a subsample of the voxels of the fixed image (within its mask).
+
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from importlib.resources import files
+from json import loads
+
+import numpy as np
+from scipy.ndimage import gaussian_filter, map_coordinates
+from scipy.optimize import minimize
+
+from nifreeze.registration.base import RegistrationBackend
+from nifreeze.utils.instrumentation import STEP_REGISTRATION, measure
+
+DEFAULT_SETTINGS = "b0-to-b0_level0"
+"""Settings file used unless otherwise requested."""
+
+STAGE_PARAMETERS = (
+    "metric",
+    "number_of_iterations",
+    "convergence_threshold",
+    "radius_or_number_of_bins",
+    "sampling_percentage",
+    "sampling_strategy",
+    "shrink_factors",
+    "smoothing_sigmas",
+    "sigma_units",
+    "transforms",
+)
+"""Per-stage settings honored by the native engine."""
+
+MIN_SAMPLES = 32
+"""Minimum number of samples mapped within the moving image to evaluate a metric."""
+
+UNSUPPORTED_METRIC_ERROR_MSG = "Unsupported registration metric <{metric}>."
+"""Unsupported registration metric error message."""
+UNSUPPORTED_TRANSFORM_ERROR_MSG = "Unsupported registration transform <{transform}>."
+"""Unsupported registration transform error message."""
+
+
+def _load_settings(settings: str = DEFAULT_SETTINGS, **kwargs) -> list[dict]:
+    """
+    Read a registration settings file and split it into stages.
+
+    Overrides follow the rules of :func:`~nifreeze.registration.ants.generate_command`:
+    scalar settings are replaced, whereas per-stage settings replace those of the
+    last stage.
+
+    Parameters
+    ----------
+    settings : :obj:`str`, optional
+        Name of the settings file (with or without the ``.json`` extension).
+    **kwargs : :obj:`dict`
+        Settings overriding those read from the file (unknown keys are ignored).
+
+    Returns
+    -------
+    :obj:`list` of :obj:`dict`
+        The settings of each stage.
+
+    Examples
+    --------
+    >>> [(s["transforms"], s["metric"], s["shrink_factors"]) for s in _load_settings()]
+    [('Rigid', 'GC', [3]), ('Rigid', 'GC', [2])]
+
+    >>> _load_settings("dwi-to-b0_level0", number_of_iterations=[5])[-1]["number_of_iterations"]
+    [5]
+
+    """
+    config = loads(
+        files("nifreeze.registration")
+        .joinpath(f"config/{settings.removesuffix('.json')}.json")
+        .read_text()
+    )
+    nstages = len(config["metric"])
+
+    stages = []
+    for i in range(nstages):
+        stage = {key: config[key][i] for key in STAGE_PARAMETERS if key in config}
+        stage["winsorize"] = (
+            kwargs.get("winsorize_lower_quantile", config.get("winsorize_lower_quantile", 0.0)),
+            kwargs.get("winsorize_upper_quantile", config.get("winsorize_upper_quantile", 1.0)),
+        )
+        stages.append(stage)
+
+    stages[-1] |= {key: value for key, value in kwargs.items() if key in STAGE_PARAMETERS}
+    return stages
+
+
+def _rotation(angles: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Rotation matrix (``Rz @ Ry @ Rx``) and its derivatives with respect to the angles."""
+    cx, cy, cz = np.cos(angles)
+    sx, sy, sz = np.sin(angles)
+    rx = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    rz = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+    drx = np.array([[0, 0, 0], [0, -sx, -cx], [0, cx, -sx]])
+    dry = np.array([[-sy, 0, cy], [0, 0, 0], [-cy, 0, -sy]])
+    drz = np.array([[-sz, -cz, 0], [cz, -sz, 0], [0, 0, 0]])
+    return rz @ ry @ rx, np.stack((rz @ ry @ drx, rz @ dry @ rx, drz @ ry @ rx))
+
+
+class _Parametrization:
+    """
+    A linear transform about a center, parametrized in millimeters.
+
+    Rotations (or the entries of the linear part of affines) are scaled by
+    a characteristic length, so that a unit step of any parameter moves the
+    image by about one millimeter, which keeps the problem well conditioned.
+
+    """
+
+    __slots__ = ("_center", "_length", "_kind")
+
+    ndof = {"translation": 3, "rigid": 6, "affine": 12}
+
+    def __init__(self, kind: str, center: np.ndarray, length: float):
+        kind = kind.lower()
+        if kind not in self.ndof:
+            raise NotImplementedError(UNSUPPORTED_TRANSFORM_ERROR_MSG.format(transform=kind))
+        self._kind = kind
+        self._center = center
+        self._length = length
+
+    @property
+    def size(self) -> int:
+        """Number of parameters."""
+        return self.ndof[self._kind]
+
+    def __call__(self, theta: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return the 4x4 matrix and its derivatives (``size`` x 4 x 4) at ``theta``."""
+        linear = np.eye(3)
+        dlinear = np.zeros((0, 3, 3))
+        if self._kind == "rigid":
+            linear, dlinear = _rotation(theta[3:] / self._length)
+        elif self._kind == "affine":
+            linear = linear + theta[3:].reshape(3, 3) / self._length
+            dlinear = np.eye(9).reshape(9, 3, 3)
+        dlinear = dlinear / self._length
+
+        matrix = np.eye(4)
+        matrix[:3, :3] = linear
+        matrix[:3, 3] = self._center + theta[:3] - linear @ self._center
+
+        deriv = np.zeros((self.size, 4, 4))
+        deriv[:3, :3, 3] = np.eye(3)
+        deriv[3:, :3, :3] = dlinear
+        deriv[3:, :3, 3] = -dlinear @ self._center
+        return matrix, deriv
+
+
+def _bspline3(u: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Cubic B-spline kernel and its derivative."""
+    a = np.abs(u)
+    inner = a < 1
+    outer = (a >= 1) & (a < 2)
+    value = np.where(inner, (4 - 6 * a**2 + 3 * a**3) / 6, np.where(outer, (2 - a) ** 3 / 6, 0))
+    deriv = np.where(
+        inner,
+        -2 * u + 1.5 * u * a,
+        np.where(outer, -0.5 * np.sign(u) * (2 - a) ** 2, 0),
+    )
+    return value, deriv
+
+
+def _correlation(fixed: np.ndarray, moving: np.ndarray, nbins: int) -> Callable:
+    """Global (normalized) correlation metric, as ANTs' ``GC``."""
+
+    def metric(inside: np.ndarray, moving: np.ndarray) -> tuple[float, np.ndarray]:
+        f = fixed[inside] - fixed[inside].mean()
+        m = moving - moving.mean()
+        fn, mn = np.sqrt(f @ f), np.sqrt(m @ m)
+        if fn == 0 or mn == 0:
+            return 0.0, np.zeros_like(moving)
+        rho = (f @ m) / (fn * mn)
+        # Minimize the negative correlation
+        return -rho, -(f / (fn * mn) - rho * m / mn**2)
+
+    return metric
+
+
+def _mattes(fixed: np.ndarray, moving: np.ndarray, nbins: int) -> Callable:
+    """Mattes mutual information, with B-spline Parzen windowing of the moving image."""
+    pad = 2
+    fmin, fmax = fixed.min(), fixed.max()
+    fbins = np.clip(((fixed - fmin) / ((fmax - fmin) or 1.0) * nbins).astype(int), 0, nbins - 1)
+    mmin, mmax = moving.min(), moving.max()
+    width = ((mmax - mmin) or 1.0) / (nbins - 2 * pad - 1)
+
+    def metric(inside: np.ndarray, moving: np.ndarray) -> tuple[float, np.ndarray]:
+        position = np.clip((moving - mmin) / width, 0, nbins - 2 * pad - 1) + pad
+
+        # Each sample contributes to four consecutive bins of the moving intensity
+        bins = np.floor(position).astype(int)[:, None] + np.arange(-1, 3)
+        weights, dweights = _bspline3(bins - position[:, None])
+        rows = fbins[inside][:, None]
+
+        joint = np.bincount(
+            (rows * nbins + bins).ravel(), weights=weights.ravel(), minlength=nbins * nbins
+        ).reshape(nbins, nbins)
+        joint = joint / joint.sum()
+        pfixed = joint.sum(axis=1, keepdims=True)
+        pmoving = joint.sum(axis=0, keepdims=True)
+
+        nonzero = joint > 0
+        ratio = np.zeros_like(joint)
+        ratio[nonzero] = np.log(joint[nonzero] / (pfixed * pmoving)[nonzero])
+        mi = (joint * ratio).sum()
+
+        # d MI / d p(f, m) = log(p(f, m) / p(m)), up to terms that add to zero
+        logcond = np.zeros_like(joint)
+        logcond[nonzero] = np.log(joint[nonzero] / np.broadcast_to(pmoving, joint.shape)[nonzero])
+        grad = (logcond[rows, bins] * dweights).sum(axis=1) / (width * moving.size)
+        # Minimize the negative mutual information
+        return -mi, grad
+
+    return metric
+
+
+METRICS: dict[str, Callable] = {"gc": _correlation, "mattes": _mattes}
+"""Factories of the supported metrics (keyed by the lowercase ANTs name)."""
+
+
+def _winsorize(data: np.ndarray, quantiles: tuple[float, float]) -> np.ndarray:
+    """Clip the intensities of ``data`` to the given quantiles."""
+    low, high = np.quantile(data, quantiles)
+    return np.clip(data, low, high)
+
+
+def _sample(
+    mask: np.ndarray,
+    percentage: float,
+    strategy: str,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Choose the voxels (as flat indices) where the metric is evaluated."""
+    candidates = np.flatnonzero(mask)
+    size = max(min(int(round(percentage * candidates.size)), candidates.size), MIN_SAMPLES)
+    if size >= candidates.size:
+        return candidates
+    if str(strategy).lower() == "regular":
+        return candidates[:: candidates.size // size]
+    return np.sort(rng.choice(candidates, size=size, replace=False))
+
+
+def _register_level(
+    fixed: np.ndarray,
+    moving: np.ndarray,
+    affine: np.ndarray,
+    mask: np.ndarray,
+    stage: dict,
+    parametrization: _Parametrization,
+    initial: np.ndarray,
+    rng: np.random.Generator,
+    maxiter: int,
+) -> np.ndarray:
+    """Optimize one resolution level, returning the updated fixed-to-moving matrix."""
+    samples = _sample(
+        mask,
+        stage.get("sampling_percentage", 1.0),
+        stage.get("sampling_strategy", "Random"),
+        rng,
+    )
+    ijk = np.column_stack((*np.unravel_index(samples, fixed.shape), np.ones(samples.size)))
+    xyz = ijk @ affine.T
+    metric = METRICS[stage["metric"].lower()](
+        fixed.ravel()[samples], moving, int(stage.get("radius_or_number_of_bins", 32))
+    )
+
+    # Gradient of the moving image with respect to world coordinates
+    ras2vox = np.linalg.inv(affine)
+    gradients = np.gradient(moving)
+    upper = np.array(moving.shape) - 1
+
+    def objective(theta: np.ndarray) -> tuple[float, np.ndarray]:
+        delta, deriv = parametrization(theta)
+        vox = xyz @ (ras2vox @ initial @ delta).T
+        inside = np.flatnonzero(np.all((vox[:, :3] >= 0) & (vox[:, :3] <= upper), axis=1))
+        if inside.size < MIN_SAMPLES:
+            return 0.0, np.zeros_like(theta)
+
+        coords = vox[inside, :3].T
+        values = map_coordinates(moving, coords, order=1)
+        cost, dcost = metric(inside, values)
+
+        grad_vox = np.column_stack([map_coordinates(g, coords, order=1) for g in gradients])
+        grad_ras = (dcost[:, None] * grad_vox) @ ras2vox[:3, :3]
+        outer = grad_ras.T @ xyz[inside]
+        return float(cost), np.einsum("kij,ij->k", (initial @ deriv)[:, :3, :], outer)
+
+    result = minimize(
+        objective,
+        np.zeros(parametrization.size),
+        jac=True,
+        method="L-BFGS-B",
+        options={"maxiter": maxiter, "ftol": stage.get("convergence_threshold", 1e-6)},
+    )
+    return initial @ parametrization(result.x)[0]
+
+
+def register(
+    fixed: np.ndarray,
+    moving: np.ndarray,
+    affine: np.ndarray,
+    fixedmask: np.ndarray | None = None,
+    init_affine: np.ndarray | None = None,
+    settings: str = DEFAULT_SETTINGS,
+    rng: np.random.Generator | None = None,
+    **kwargs,
+) -> np.ndarray:
+    """
+    Estimate the linear transform aligning ``moving`` to ``fixed``.
+
+    Parameters
+    ----------
+    fixed : :obj:`~numpy.ndarray`
+        The reference volume.
+    moving : :obj:`~numpy.ndarray`
+        The volume to be aligned (on the same grid as ``fixed``).
+    affine : :obj:`~numpy.ndarray`
+        Voxel-to-world (RAS+) affine of both volumes.
+    fixedmask : :obj:`~numpy.ndarray`, optional
+        Restrict the computation of the metric to this region of the fixed image.
+    init_affine : :obj:`~numpy.ndarray`, optional
+        Initial transform (fixed-to-moving world coordinates).
+    settings : :obj:`str`, optional
+        Name of the settings file (see :func:`_load_settings`).
+    rng : :obj:`~numpy.random.Generator`, optional
+        Random generator used to subsample the voxels.
+    **kwargs : :obj:`dict`
+        Settings overriding those read from the file.
+
+    Returns
+    -------
+    :obj:`~numpy.ndarray`
+        The 4x4 matrix mapping world coordinates of ``fixed`` onto ``moving``.
+
+    """
+    rng = rng or np.random.default_rng()
+    fixed = np.asanyarray(fixed, dtype=float)
+    moving = np.asanyarray(moving, dtype=float)
+    fullmask = np.ones(fixed.shape, dtype=bool) if fixedmask is None else fixedmask > 0
+    zooms = np.linalg.norm(affine[:3, :3], axis=0)
+
+    # Transforms rotate about the center of the grid
+    center = affine[:3, :3] @ (0.5 * (np.array(fixed.shape) - 1)) + affine[:3, 3]
+    length = 0.25 * float(np.mean(np.array(fixed.shape) * zooms))
+
+    matrix = np.eye(4) if init_affine is None else np.asanyarray(init_affine, dtype=float)
+    for stage in _load_settings(settings, **kwargs):
+        if stage["metric"].lower() not in METRICS:
+            raise NotImplementedError(UNSUPPORTED_METRIC_ERROR_MSG.format(metric=stage["metric"]))
+
+        parametrization = _Parametrization(stage["transforms"], center, length)
+        fixed_w = _winsorize(fixed, stage["winsorize"])
+        moving_w = _winsorize(moving, stage["winsorize"])
+        iterations = stage.get("number_of_iterations", [100])
+        sigmas = stage.get("smoothing_sigmas", [0.0] * len(iterations))
+        shrinks = stage.get("shrink_factors", [1] * len(iterations))
+
+        for maxiter, sigma, shrink in zip(iterations, sigmas, shrinks, strict=False):
+            sigma_vox = sigma / zooms if stage.get("sigma_units", "vox") == "mm" else sigma
+            level = (slice(None, None, int(shrink)),) * 3
+            level_affine = affine @ np.diag([shrink, shrink, shrink, 1.0])
+            matrix = _register_level(
+                gaussian_filter(fixed_w, sigma_vox)[level],
+                gaussian_filter(moving_w, sigma_vox)[level],
+                level_affine,
+                fullmask[level],
+                stage,
+                parametrization,
+                matrix,
+                rng,
+                int(maxiter),
+            )
+
+    return matrix
+
+
+class NativeBackend(RegistrationBackend):
+    """
+    Register volumes in-process with NumPy and SciPy (see :func:`register`).
+
+    Nothing is written to disk, and no external software (e.g., ANTs) is required.
+    Histogram matching and the convergence window of ANTs are not implemented,
+    and any settings other than those in :data:`STAGE_PARAMETERS` and the
+    winsorizing quantiles are ignored.
+
+    Parameters
+    ----------
+    settings : :obj:`str`, optional
+        Name of the settings file (``ants_config`` is accepted as an alias).
+    clip : :obj:`str`, optional
+        Clip intensity of ``"sample"``, ``"predicted"``, ``"both"``,
+        or ``"none"`` of the images before registration.
+    seed : :obj:`int`, optional
+        Seed of the random subsampling of voxels (combined with the volume index).
+    **kwargs : :obj:`dict`
+        Settings overriding those read from the file.
+
+    Examples
+    --------
+    >>> from nifreeze.registration.base import RegistrationFactory
+    >>> RegistrationFactory.init("native", clip="none")  # doctest: +ELLIPSIS
+    <nifreeze.registration.native.NativeBackend object at ...>
+
+    """
+
+    __slots__ = ("_clip", "_seed", "_settings", "_overrides")
+
+    def __init__(
+        self,
+        settings: str | None = None,
+        clip: str | bool | None = "both",
+        seed: int | None = None,
+        **kwargs,
+    ):
+        self._settings = settings or kwargs.pop("ants_config", None) or DEFAULT_SETTINGS
+        self._clip = str(clip).lower()
+        self._seed = seed
+        # Drop options of other backends (e.g., ``workdir`` or ``num_threads``)
+        self._overrides = {
+            key: value
+            for key, value in kwargs.items()
+            if key in STAGE_PARAMETERS or key.startswith("winsorize_")
+        }
+
+    def register(
+        self,
+        fixed: np.ndarray,
+        moving: np.ndarray,
+        affine: np.ndarray,
+        index: int = 0,
+        fixedmask: np.ndarray | None = None,
+        init_affine: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Register ``moving`` to ``fixed`` in memory (see :obj:`RegistrationBackend`)."""
+        from nifreeze.data.filtering import advanced_clip
+
+        if self._clip in ("predicted", "both", "true"):
+            fixed = advanced_clip(np.squeeze(fixed), dtype="float32")  # type: ignore[assignment]
+        if self._clip in ("sample", "both", "true"):
+            moving = advanced_clip(np.squeeze(moving), dtype="float32")  # type: ignore[assignment]
+
+        rng = np.random.default_rng(None if self._seed is None else (self._seed, index))
+        with measure(STEP_REGISTRATION, index):
+            return register(
+                np.squeeze(fixed),
+                np.squeeze(moving),
+                affine,
+                fixedmask=fixedmask,
+                init_affine=init_affine,
+                settings=self._settings,
+                rng=rng,
+                **self._overrides,
+            )
@@ -0,0 +1,228 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Per-volume timing and memory instrumentation of the estimation loop."""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from pathlib import Path
+from threading import Lock
+from time import time
+from timeit import default_timer as timer
+
+import attrs
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+STEP_FIT = "fit"
+"""Fitting the model on the training volumes."""
+STEP_PREDICT = "predict"
+"""Predicting the held-out volume."""
+STEP_MODEL = "fit_predict"
+"""The whole :meth:`~nifreeze.model.base.BaseModel.fit_predict` call."""
+STEP_WRITE = "nifti_write"
+"""Writing the registration inputs to disk."""
+STEP_REGISTRATION = "registration"
+"""Running the registration subprocess."""
+STEP_READBACK = "readback"
+"""Reading the estimated transform back (and resampling the debugging output)."""
+
+_RSS_UNITS = 1 if sys.platform == "darwin" else 1024
+"""Bytes per unit of ``ru_maxrss`` (bytes on macOS, kibibytes elsewhere)."""
+
+_current: ContextVar[Instrumentation | None] = ContextVar("instrumentation", default=None)
+
+
+@attrs.define(frozen=True)
+class Event:
+    """A measurement of one step of the estimation loop."""
+
+    step: str
+    """Name of the step (e.g., :data:`STEP_FIT`)."""
+    index: int | None
+    """Index of the held-out volume (:obj:`None` if not volume-specific)."""
+    elapsed: float
+    """Wall time, in seconds."""
+    rss_delta: int
+    """Growth of the peak resident set size during the step, in bytes."""
+    start: float = attrs.field(factory=time)
+    """Wall-clock (epoch) time when the step started."""
+    pid: int = attrs.field(factory=os.getpid)
+    """Process that executed the step."""
+
+
+def _maxrss(children: bool = False) -> int:
+    """Peak resident set size (in bytes) of this process or of its finished children."""
+    if resource is None:  # pragma: no cover
+        return 0
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    return resource.getrusage(who).ru_maxrss * _RSS_UNITS
+
+
+class Instrumentation:
+    """
+    Collect timing and memory events of the estimation loop.
+
+    Instrumentation is enabled within its context (``with instrumentation:``),
+    and the code of the loop reports each step by means of :func:`measure`.
+    Events are kept in memory, passed to every registered callback, and
+    optionally appended to a JSONL file as they arrive.
+
+    Peak RSS deltas are derived from :func:`resource.getrusage`, which only
+    tracks the high-water mark of resident memory: a step that does not set a
+    new peak reports ``0``. Subprocess steps (e.g., ANTs) are measured on the
+    children of the process, whose peak is that of the largest finished child.
+
+    Parameters
+    ----------
+    callbacks : :obj:`list` of :obj:`callable`, optional
+        Functions called with every :obj:`Event`.
+    jsonl : :obj:`os.pathlike`, optional
+        A file where events are appended, one JSON object per line.
+
+    Examples
+    --------
+    >>> instrumentation = Instrumentation()
+    >>> with instrumentation:
+    ...     with measure(STEP_FIT, index=3):
+    ...         pass
+    >>> [(e.step, e.index) for e in instrumentation.events]
+    [('fit', 3)]
+
+    """
+
+    __slots__ = ("_callbacks", "_events", "_jsonl", "_lock", "_tokens")
+
+    def __init__(
+        self,
+        callbacks: Iterable[Callable[[Event], object]] | None = None,
+        jsonl: Path | str | None = None,
+    ):
+        self._callbacks = list(callbacks or [])
+        self._events: list[Event] = []
+        self._jsonl = Path(jsonl) if jsonl is not None else None
+        self._lock = Lock()
+        self._tokens: list[Token] = []
+
+    def __enter__(self) -> Instrumentation:
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, *_) -> None:
+        _current.reset(self._tokens.pop())
+
+    @property
+    def events(self) -> list[Event]:
+        """The events recorded so far."""
+        return list(self._events)
+
+    def add_callback(self, callback: Callable[[Event], object]) -> None:
+        """Register a function to be called with every new event."""
+        self._callbacks.append(callback)
+
+    def emit(self, event: Event) -> None:
+        """Record an event (thread-safe)."""
+        with self._lock:
+            self._events.append(event)
+            if self._jsonl is not None:
+                with self._jsonl.open("a") as fobj:
+                    fobj.write(json.dumps(attrs.asdict(event)) + "\n")
+            for callback in self._callbacks:
+                callback(event)
+
+    def summary(self) -> str:
+        """
+        Tabulate the events by step.
+
+        Returns
+        -------
+        :obj:`str`
+            A table with the number of events, the total, mean and maximum
+            wall time, and the maximum peak RSS delta of every step.
+
+        """
+        steps: dict[str, list[Event]] = {}
+        for event in self._events:
+            steps.setdefault(event.step, []).append(event)
+
+        lines = [
+            f"{'Step':<14}{'Count':>7}{'Total (s)':>12}{'Mean (s)':>11}"
+            f"{'Max (s)':>10}{'Max ΔRSS (MiB)':>16}"
+        ]
+        for step, events in steps.items():
+            elapsed = [e.elapsed for e in events]
+            lines.append(
+                f"{step:<14}{len(events):>7}{sum(elapsed):>12.2f}"
+                f"{sum(elapsed) / len(events):>11.3f}{max(elapsed):>10.3f}"
+                f"{max(e.rss_delta for e in events) / 2**20:>16.1f}"
+            )
+        return "\n".join(lines)
+
+
+def current_instrumentation() -> Instrumentation | None:
+    """Get the active :obj:`Instrumentation` (if any)."""
+    return _current.get()
+
+
+@contextmanager
+def measure(step: str, index: int | None = None, children: bool = False) -> Iterator[None]:
+    """
+    Measure a step of the estimation loop (a no-op unless instrumentation is active).
+
+    Parameters
+    ----------
+    step : :obj:`str`
+        Name of the step.
+    index : :obj:`int`, optional
+        Index of the held-out volume.
+    children : :obj:`bool`, optional
+        Measure memory on the children of this process (for subprocesses).
+
+    """
+    instrumentation = _current.get()
+    if instrumentation is None:
+        yield
+        return
+
+    start, rss = time(), _maxrss(children)
+    tic = timer()
+    try:
+        yield
+    finally:
+        instrumentation.emit(
+            Event(
+                step=step,
+                index=index,
+                elapsed=timer() - tic,
+                rss_delta=max(_maxrss(children) - rss, 0),
+                start=start,
+            )
+        )
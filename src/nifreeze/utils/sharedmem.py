@@ -0,0 +1,161 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Share large arrays with worker processes without copying them."""
+
+from __future__ import annotations
+
+import sys
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+DEFAULT_SHARED_FIELDS: tuple[str, ...] = ("dataobj", "brainmask")
+"""Dataset attributes placed in shared memory by :func:`share_dataset`."""
+
+
+class SharedArray(np.ndarray):
+    """
+    A :obj:`~numpy.ndarray` backed by a :obj:`~multiprocessing.shared_memory.SharedMemory` block.
+
+    Pickling a :obj:`SharedArray` only serializes the name of the memory block,
+    its shape and its data type, so that worker processes attach to the same
+    buffer instead of receiving a copy.
+    Arrays derived from a :obj:`SharedArray` (slices, results of arithmetic)
+    do not own the block and are pickled by value as usual.
+
+    Examples
+    --------
+    >>> import pickle
+    >>> arr = SharedArray.from_array(np.arange(6, dtype="float32").reshape(2, 3))
+    >>> len(pickle.dumps(arr)) < arr.nbytes + 64
+    True
+    >>> clone = pickle.loads(pickle.dumps(arr))
+    >>> clone[0, 0] = 10.0
+    >>> float(arr[0, 0])
+    10.0
+    >>> del clone
+    >>> arr.release()
+
+    """
+
+    _shm: SharedMemory | None
+
+    def __new__(cls, shm: SharedMemory, shape: Sequence[int], dtype: Any) -> SharedArray:
+        obj = super().__new__(cls, tuple(shape), dtype=dtype, buffer=shm.buf)
+        obj._shm = shm
+        return obj
+
+    def __array_finalize__(self, obj: Any) -> None:
+        # Views and results of operations never own the memory block
+        self._shm = None
+
+    def __reduce__(self) -> str | tuple[Any, ...]:
+        if self._shm is None:
+            return super().__reduce__()
+        return (_attach, (self._shm.name, self.shape, self.dtype.str))
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> SharedArray:
+        """Copy ``array`` into a newly allocated shared memory block."""
+        shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+        obj = cls(shm, array.shape, array.dtype)
+        obj[...] = array
+        return obj
+
+    def release(self, unlink: bool = True) -> None:
+        """
+        Detach from the memory block (and free it when ``unlink`` is set).
+
+        The array must not be accessed after releasing it.
+
+        """
+        if self._shm is None:
+            return
+        shm, self._shm = self._shm, None
+        try:
+            shm.close()
+        except BufferError:
+            # Views of the buffer are still alive; the mapping goes with them
+            pass
+        if unlink:
+            shm.unlink()
+
+
+def _attach(name: str, shape: Sequence[int], dtype: str) -> SharedArray:
+    """Attach to an existing memory block (unpickling hook of :obj:`SharedArray`)."""
+    if sys.version_info >= (3, 13):
+        shm = SharedMemory(name=name, track=False)
+    else:  # pragma: no cover
+        shm = SharedMemory(name=name)
+        # The creating process owns the block: do not let this one unlink it
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    return SharedArray(shm, shape, np.dtype(dtype))
+
+
+@contextmanager
+def share_dataset(
+    dataset: Any,
+    fields: Sequence[str] = DEFAULT_SHARED_FIELDS,
+) -> Iterator[Any]:
+    """
+    Temporarily place the large arrays of a dataset in shared memory.
+
+    Within the context, the listed attributes of ``dataset`` are replaced
+    by :obj:`SharedArray` copies so that pickling the dataset (or a model
+    holding a reference to it) to worker processes is cheap.
+    The original arrays are restored and the memory blocks freed on exit.
+    Writes made to the shared copies are **not** propagated back.
+
+    Parameters
+    ----------
+    dataset : :obj:`~nifreeze.data.base.BaseDataset`
+        The dataset whose arrays will be shared.
+    fields : :obj:`tuple` of :obj:`str`, optional
+        Names of the array attributes to share (unset or ``None`` are skipped).
+
+    Yields
+    ------
+    :obj:`~nifreeze.data.base.BaseDataset`
+        The same dataset, with its arrays in shared memory.
+
+    """
+    originals: dict[str, np.ndarray] = {}
+    shared: list[SharedArray] = []
+    try:
+        for field in fields:
+            array = getattr(dataset, field, None)
+            if not isinstance(array, np.ndarray) or isinstance(array, SharedArray):
+                continue
+            shared.append(SharedArray.from_array(array))
+            originals[field] = array
+            setattr(dataset, field, shared[-1])
+        yield dataset
+    finally:
+        for field, array in originals.items():
+            setattr(dataset, field, array)
+        for array in shared:
+            array.release()
@@ -0,0 +1,408 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Pick the parallelization settings of the estimation loop for a dataset and a host."""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from timeit import default_timer as timer
+
+import attrs
+import numpy as np
+
+DEFAULT_CHUNK_SIZE: int = int(1e6)
+"""Voxels fitted at once (per thread) when memory is not limiting."""
+MIN_CHUNK_SIZE: int = 1000
+"""Fewest voxels fitted at once when memory is limiting."""
+WORKER_OVERHEAD: int = 200 * 2**20
+"""Memory (bytes) taken by each worker process, regardless of the data."""
+MEMORY_FRACTION: float = 0.8
+"""Fraction of the available memory the plan may use (unless given a budget)."""
+MEMINFO_PATH: Path = Path("/proc/meminfo")
+"""Kernel report of the memory of the host (Linux), read by :func:`available_memory`."""
+
+MEMORY_BUDGET_ERROR_MSG = (
+    "{model} needs an estimated {estimate:.2f} GiB to fit {voxels} voxels x {volumes} "
+    "volumes with the leanest settings (n_jobs={n_jobs}, chunk size {chunk_size}, "
+    "{dtype}), which exceeds the memory budget of {budget:.2f} GiB."
+)
+"""Memory budget too small error message."""
+
+
+@attrs.define(frozen=True)
+class ModelCost:
+    """How a family of models uses cores and memory."""
+
+    parallel: bool
+    """Whether the fit is split over voxels across ``n_jobs`` worker processes."""
+    min_voxels: int = 0
+    """Voxels below which a worker does not pay off its startup and data transfer."""
+    copies: float = 2.0
+    """Copies of the (masked) data held in memory while fitting."""
+    voxel_bytes: int = 64
+    """Memory of the fitting intermediates, per voxel and volume."""
+    grid_copy: bool = True
+    """Whether the training volumes are copied on the full grid before masking."""
+    downcast: bool = True
+    """Whether the model may fit single-precision data (see :attr:`ExecutionPlan.dtype`)."""
+
+
+MODEL_COSTS: dict[str, ModelCost] = {
+    "DTIModel": ModelCost(parallel=True, min_voxels=20000, voxel_bytes=48),
+    "DKIModel": ModelCost(parallel=True, min_voxels=5000, voxel_bytes=160),
+    "GQIModel": ModelCost(parallel=True, min_voxels=10000, voxel_bytes=96),
+    # A single GP (or PET B-spline least-squares) over all voxels: BLAS threads only,
+    # and the solvers work in double precision
+    "GPModel": ModelCost(parallel=False, copies=4.0, voxel_bytes=0, downcast=False),
+    "BSplinePETModel": ModelCost(
+        parallel=False, copies=3.0, voxel_bytes=0, grid_copy=False, downcast=False
+    ),
+}
+"""Costs of the model classes."""
+_DEFAULT_COST = ModelCost(parallel=False, downcast=False)
+"""Cost of models not listed in :data:`MODEL_COSTS` (fitted serially, as given)."""
+
+
+def _model_name(model: object) -> str:
+    """Name of the class of a model (``model`` may be the class itself)."""
+    return model.__name__ if isinstance(model, type) else type(model).__name__
+
+
+@attrs.define(frozen=True)
+class ExecutionPlan:
+    """Parallelization settings of the estimation loop."""
+
+    n_jobs: int
+    """Worker processes fitting the model."""
+    omp_nthreads: int
+    """Threads of each registration (and of the numerical libraries)."""
+    chunk_size: int
+    """Voxels fitted at once (``step`` of DIPY's models)."""
+    reason: str = ""
+    """Why these values were chosen."""
+    dtype: str | None = None
+    """Precision the training data are cast to (:obj:`None` keeps that of the dataset)."""
+    memory: int = 0
+    """Estimated peak memory (bytes) of the fit."""
+
+    def as_kwargs(self) -> dict[str, int | str]:
+        """Keyword arguments of :meth:`~nifreeze.model.base.BaseModel.fit_predict`."""
+        kwargs: dict[str, int | str] = {"n_jobs": self.n_jobs, "omp_nthreads": self.omp_nthreads}
+        if self.dtype is not None:
+            kwargs["dtype"] = self.dtype
+        return kwargs
+
+
+def available_cpus() -> int:
+    """Number of CPUs this process may run on (honoring affinity masks)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1  # pragma: no cover
+
+
+def available_memory() -> int:
+    """
+    Memory (bytes) currently available on this host (0 if unknown).
+
+    The kernel's estimate of the memory available without swapping
+    (``MemAvailable`` of :data:`MEMINFO_PATH`) counts the reclaimable page cache,
+    unlike the free memory reported by :func:`os.sysconf`, which is only used
+    where the former is missing.
+
+    """
+    try:
+        for line in MEMINFO_PATH.read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024  # Reported in kB
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (AttributeError, ValueError, OSError):  # pragma: no cover
+        return 0
+
+
+def estimate_memory(
+    model: object,
+    num_voxels: int,
+    num_volumes: int,
+    n_jobs: int = 1,
+    chunk_size: int | None = None,
+    dtype: str | np.dtype = "float64",
+    concurrency: int = 1,
+    base: int = 0,
+) -> int:
+    """
+    Estimate the peak memory of fitting a model.
+
+    The estimate adds up the memory already taken (``base``, e.g., the
+    dataset), the training volumes extracted on the full grid (taken to be
+    as large as ``base``), the copies of the masked training data, the
+    overhead of worker processes, and the intermediates of the voxels being
+    fitted at once, for each of the ``concurrency`` volumes fitted at once.
+
+    Parameters
+    ----------
+    model : :obj:`~nifreeze.model.base.BaseModel`
+        The model, or its class (only the class name is looked up in :data:`MODEL_COSTS`).
+    num_voxels : :obj:`int`
+        Number of voxels fitted (within the brain mask).
+    num_volumes : :obj:`int`
+        Number of volumes of the dataset.
+    n_jobs : :obj:`int`, optional
+        Worker processes fitting the model.
+    chunk_size : :obj:`int`, optional
+        Voxels fitted at once (defaults to all the voxels of a worker).
+    dtype : :obj:`str` or :obj:`~numpy.dtype`, optional
+        Type of the masked training data.
+    concurrency : :obj:`int`, optional
+        Volumes fitted at once.
+    base : :obj:`int`, optional
+        Memory (bytes) taken before fitting.
+
+    Returns
+    -------
+    :obj:`int`
+        The estimated peak memory, in bytes.
+
+    Examples
+    --------
+    >>> class GPModel: ...
+    >>> estimate_memory(GPModel(), 100000, 100) / 2**20
+    305.17578125
+    >>> estimate_memory(GPModel(), 100000, 100, base=2**30) / 2**30
+    2.298023223876953
+
+    """
+    cost = MODEL_COSTS.get(_model_name(model), _DEFAULT_COST)
+    n_jobs = max(n_jobs, 1)
+    chunk = min(chunk_size or num_voxels, -(-num_voxels // n_jobs))
+
+    fit = (
+        cost.copies * num_voxels * num_volumes * np.dtype(dtype).itemsize
+        + n_jobs * chunk * num_volumes * cost.voxel_bytes
+        + (n_jobs * WORKER_OVERHEAD if n_jobs > 1 else 0)
+        + (base if cost.grid_copy else 0)
+    )
+    return int(base + max(concurrency, 1) * fit)
+
+
+def plan_execution(
+    model: object,
+    num_voxels: int,
+    num_volumes: int,
+    cpus: int | None = None,
+    memory: int | None = None,
+    concurrency: int = 1,
+    reg_workers: int = 1,
+    n_jobs: int | None = None,
+    omp_nthreads: int | None = None,
+    chunk_size: int | None = None,
+    max_memory: int | None = None,
+    dtype: str | np.dtype = "float64",
+    base: int = 0,
+) -> ExecutionPlan:
+    """
+    Derive the parallelization settings of a model from a simple cost model.
+
+    The cores (divided among ``concurrency`` volumes processed at once) go to
+    fitting workers only for models whose fit is split over voxels
+    (:data:`MODEL_COSTS`), and only as long as each worker receives at least
+    :attr:`ModelCost.min_voxels` voxels.
+    The settings are then fit into the memory budget (``max_memory``, or
+    a fraction of the available memory) by, in turn, reducing the voxels fitted
+    at once, casting the training data to single precision, and fitting
+    serially (see :func:`estimate_memory`).
+
+    Parameters
+    ----------
+    model : :obj:`~nifreeze.model.base.BaseModel`
+        The model, or its class (only the class name is looked up).
+    num_voxels : :obj:`int`
+        Number of voxels fitted (within the brain mask).
+    num_volumes : :obj:`int`
+        Number of volumes of the dataset.
+    cpus : :obj:`int`, optional
+        Cores available (defaults to :func:`available_cpus`).
+    memory : :obj:`int`, optional
+        Memory available, in bytes (defaults to :func:`available_memory`;
+        ``0`` disables the memory bounds).
+    concurrency : :obj:`int`, optional
+        Volumes fitted at once (e.g., ``volume_jobs``).
+    reg_workers : :obj:`int`, optional
+        Registrations run at once.
+    n_jobs, omp_nthreads, chunk_size : :obj:`int`, optional
+        Values that override the ones of the plan.
+    max_memory : :obj:`int`, optional
+        Memory budget (bytes) of the whole run, which takes precedence over
+        ``memory``.
+    dtype : :obj:`str` or :obj:`~numpy.dtype`, optional
+        Type of the data.
+    base : :obj:`int`, optional
+        Memory (bytes) taken before fitting (e.g., by the dataset).
+
+    Returns
+    -------
+    :obj:`ExecutionPlan`
+        The plan.
+
+    Raises
+    ------
+    :obj:`MemoryError`
+        If the fit cannot be made to fit within ``max_memory``.
+
+    Examples
+    --------
+    >>> class DTIModel: ...
+    >>> plan_execution(DTIModel(), 5000, 60, cpus=16, memory=16 * 2**30)
+    ExecutionPlan(n_jobs=1, omp_nthreads=16, chunk_size=5000, reason='DTIModel: ...', ...)
+    >>> plan = plan_execution(DTIModel(), 500000, 60, cpus=16, memory=16 * 2**30)
+    >>> plan.n_jobs, plan.omp_nthreads
+    (16, 16)
+    >>> plan_execution(DTIModel(), 500000, 60, cpus=16, memory=2 * 2**30).n_jobs
+    5
+    >>> plan_execution(DTIModel(), 500000, 60, cpus=16, n_jobs=2).n_jobs
+    2
+    >>> plan = plan_execution(DTIModel(), 500000, 60, max_memory=2**28)
+    >>> plan.n_jobs, plan.dtype
+    (1, 'float32')
+
+    """
+    name = _model_name(model)
+    cost = MODEL_COSTS.get(name, _DEFAULT_COST)
+    cpus = max(cpus or available_cpus(), 1)
+    if max_memory:
+        budget = float(max_memory)
+    else:
+        budget = (available_memory() if memory is None else memory) * MEMORY_FRACTION
+
+    def _estimate(jobs: int, step: int, fit_dtype: str | np.dtype) -> int:
+        return estimate_memory(
+            model, num_voxels, num_volumes, jobs, step, fit_dtype, concurrency, base
+        )
+
+    cores = max(cpus // max(concurrency, 1), 1)
+    by_voxels = num_voxels // cost.min_voxels if cost.min_voxels else cores
+    by_memory = cores
+    if budget:
+        lean = _estimate(1, MIN_CHUNK_SIZE, dtype)
+        by_memory = int((budget - lean) // (WORKER_OVERHEAD * max(concurrency, 1)))
+    jobs = n_jobs or (max(min(cores, by_voxels, by_memory), 1) if cost.parallel else 1)
+    limits = {"cores": cores, "voxels": by_voxels, "memory": by_memory}
+    reason = f"{name}: {num_voxels} voxels x {num_volumes} volumes, {cpus} CPUs, " + (
+        f"{budget / 2**30:.1f} GiB budget; n_jobs limited by {min(limits, key=limits.__getitem__)}"
+        if cost.parallel
+        else f"{budget / 2**30:.1f} GiB budget; serial fit"
+    )
+
+    step = chunk_size or min(DEFAULT_CHUNK_SIZE * cores, max(-(-num_voxels // jobs), 1))
+    plan = ExecutionPlan(
+        n_jobs=jobs,
+        omp_nthreads=omp_nthreads or max(cpus // max(reg_workers, concurrency, 1), 1),
+        chunk_size=step,
+        reason=reason,
+        memory=_estimate(jobs, step, dtype),
+    )
+    if not budget or plan.memory <= budget:
+        return plan
+
+    # Over budget: progressively trade speed for memory
+    if not chunk_size:
+        fixed = _estimate(jobs, 0, dtype)
+        per_voxel = jobs * num_volumes * cost.voxel_bytes * max(concurrency, 1)
+        step = max(int((budget - fixed) // per_voxel) if per_voxel else step, MIN_CHUNK_SIZE)
+        plan = attrs.evolve(plan, chunk_size=min(step, plan.chunk_size))
+    if _estimate(plan.n_jobs, plan.chunk_size, dtype) > budget and cost.downcast:
+        if np.dtype(dtype).itemsize > 4:
+            plan = attrs.evolve(plan, dtype="float32")
+    if _estimate(plan.n_jobs, plan.chunk_size, plan.dtype or dtype) > budget and not n_jobs:
+        plan = attrs.evolve(plan, n_jobs=1)
+
+    plan = attrs.evolve(
+        plan,
+        memory=_estimate(plan.n_jobs, plan.chunk_size, plan.dtype or dtype),
+        reason=f"{reason}; reduced to fit in memory",
+    )
+    if max_memory and plan.memory > max_memory:
+        raise MemoryError(
+            MEMORY_BUDGET_ERROR_MSG.format(
+                model=name,
+                estimate=plan.memory / 2**30,
+                voxels=num_voxels,
+                volumes=num_volumes,
+                n_jobs=plan.n_jobs,
+                chunk_size=plan.chunk_size,
+                dtype=plan.dtype or np.dtype(dtype).name,
+                budget=max_memory / 2**30,
+            )
+        )
+    return plan
+
+
+def calibrate(
+    plan: ExecutionPlan,
+    run: Callable[[int], object],
+    candidates: Iterable[int] | None = None,
+) -> ExecutionPlan:
+    """
+    Time a quick run with every candidate number of jobs and keep the fastest.
+
+    Parameters
+    ----------
+    plan : :obj:`ExecutionPlan`
+        The plan to calibrate.
+    run : :obj:`callable`
+        Runs the workload (e.g., fits and predicts one volume) with the given
+        number of jobs.
+    candidates : :obj:`iterable` of :obj:`int`, optional
+        Numbers of jobs to try (defaults to ``1`` and the planned ``n_jobs``).
+
+    Returns
+    -------
+    :obj:`ExecutionPlan`
+        The plan, with the fastest number of jobs.
+
+    Examples
+    --------
+    >>> from time import sleep
+    >>> plan = ExecutionPlan(n_jobs=4, omp_nthreads=4, chunk_size=1000)
+    >>> calibrate(plan, lambda n: sleep(0.01 * n)).n_jobs
+    1
+
+    """
+    candidates = sorted(set(candidates or (1, plan.n_jobs)))
+    if len(candidates) < 2:
+        return plan
+
+    timings = {}
+    for n_jobs in candidates:
+        tic = timer()
+        run(n_jobs)
+        timings[n_jobs] = timer() - tic
+
+    best = min(timings, key=timings.__getitem__)
+    summary = ", ".join(f"{n}: {t:.2f}s" for n, t in timings.items())
+    return attrs.evolve(plan, n_jobs=best, reason=f"{plan.reason}; calibrated ({summary})")
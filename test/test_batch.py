@@ -0,0 +1,137 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Unit tests exercising the multi-subject batch runner."""
+
+import csv
+import sys
+
+import pytest
+
+from nifreeze.cli import batch
+
+
+@pytest.mark.parametrize(
+    ("free_cores", "free_mem", "pending", "min_cores", "subject_mem", "expected"),
+    [
+        (16, 64.0, 100, 4, 4.0, [4, 4, 4, 4]),
+        (16, 64.0, 3, 4, 4.0, [6, 5, 5]),
+        (16, 10.0, 100, 2, 4.0, [8, 8]),
+        (3, 64.0, 100, 4, 4.0, []),
+        (16, 64.0, 0, 1, 4.0, []),
+        (8, 0.0, 2, 1, 0.0, [4, 4]),
+    ],
+)
+def test_allocate(free_cores, free_mem, pending, min_cores, subject_mem, expected):
+    """Cores are split evenly among as many subjects as the budget allows."""
+    assert batch.allocate(free_cores, free_mem, pending, min_cores, subject_mem) == expected
+
+
+def test_read_manifest(tmp_path):
+    """Optional columns are translated into options of nifreeze."""
+    (tmp_path / "manifest.tsv").write_text(
+        "input_file\tbrainmask\tgradient_file\toutput_dir\n"
+        "sub-01_dwi.nii.gz\tmask.nii.gz\tdwi.bval dwi.bvec\t\n"
+        "sub-02_pet.h5\t\t\tcustom\n"
+    )
+    subjects = batch.read_manifest(tmp_path / "manifest.tsv", tmp_path / "out")
+
+    assert [s.name for s in subjects] == ["sub-01_dwi", "sub-02_pet"]
+    assert subjects[0].output_dir == tmp_path / "out" / "sub-01_dwi"
+    assert subjects[0].options == (
+        "--brainmask",
+        str(tmp_path / "mask.nii.gz"),
+        "--gradient-file",
+        str(tmp_path / "dwi.bval"),
+        str(tmp_path / "dwi.bvec"),
+    )
+    assert subjects[1].output_dir == tmp_path / "custom"
+    assert subjects[1].options == ()
+
+    (tmp_path / "bad.tsv").write_text("brainmask\nmask.nii.gz\n")
+    with pytest.raises(ValueError, match="input_file"):
+        batch.read_manifest(tmp_path / "bad.tsv", tmp_path)
+
+    (tmp_path / "timing.tsv").write_text(
+        "input_file\ttiming_file\nsub-01_pet.h5\t\nsub-02_pet.h5\ttiming.json\n"
+    )
+    with pytest.raises(ValueError, match="timing_file.*sub-02_pet"):
+        batch.read_manifest(tmp_path / "timing.tsv", tmp_path)
+
+
+def test_command(tmp_path):
+    """Subjects bind their threads to their cores, and plan their model jobs."""
+    subject = batch.Subject(input_file=tmp_path / "sub-01_dwi.h5", output_dir=tmp_path)
+    command = batch._command(subject, 4, ["--models", "dti"])
+
+    assert command[command.index("--nthreads") + 1] == "4"
+    assert "--n-jobs" not in command
+    assert "--n-jobs" in batch._command(subject, 4, ["--n-jobs", "2"])
+
+
+def test_batch_main(tmp_path, monkeypatch):
+    """Subjects run under the core budget and their throughput is reported."""
+    script = (
+        "import json, os, sys; "
+        "cores = int(os.environ['OMP_NUM_THREADS']); "
+        "open(sys.argv[1], 'w').write("
+        "''.join(json.dumps({'step': 'fit_predict', 'index': i}) + '\\n' for i in range(cores))"
+        " + json.dumps({'step': 'fit_predict', 'index': None}) + '\\n'); "
+        "sys.exit(int('fail' in sys.argv[1]))"
+    )
+
+    def _command(subject, cores, extra_args):
+        assert extra_args == ["--models", "dti"]
+        return [sys.executable, "-c", script, str(subject.events)]
+
+    monkeypatch.setattr(batch, "_command", _command)
+
+    names = ["sub-01", "sub-02", "sub-03", "sub-fail"]
+    (tmp_path / "manifest.tsv").write_text(
+        "input_file\n" + "".join(f"{name}.h5\n" for name in names)
+    )
+
+    with pytest.raises(SystemExit):
+        batch.main(
+            [
+                str(tmp_path / "manifest.tsv"),
+                "--output-dir",
+                str(tmp_path / "out"),
+                "--nprocs",
+                "4",
+                "--min-cores",
+                "2",
+                "--models",
+                "dti",
+            ]
+        )
+
+    with (tmp_path / "out" / "batch_report.tsv").open() as fobj:
+        report = {row["subject"]: row for row in csv.DictReader(fobj, delimiter="\t")}
+
+    assert sorted(report) == names
+    # The first subjects share the node, the last one may get all the free cores
+    assert all(int(row["cores"]) in (2, 4) for row in report.values())
+    assert all(row["volumes"] == row["cores"] for row in report.values())
+    assert int(report["sub-fail"]["returncode"]) == 1
+    assert int(report["sub-01"]["returncode"]) == 0
+    assert (tmp_path / "out" / "sub-01" / "sub-01.log").exists()
@@ -0,0 +1,83 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+
+import re
+
+import numpy as np
+import pytest
+
+from nifreeze.data.base import BaseDataset
+from nifreeze.data.journal import (
+    JOURNAL_LABEL_MISMATCH_ERROR_MSG,
+    JOURNAL_SHAPE_MISMATCH_ERROR_MSG,
+    TransformJournal,
+)
+
+
+@pytest.fixture
+def dataset(request, tmp_path):
+    return BaseDataset(
+        dataobj=request.node.rng.random((4, 4, 4, 5)),
+        affine=np.eye(4),
+        filepath=tmp_path / "cache.h5",
+    )
+
+
+def test_journal_roundtrip(dataset):
+    journal = TransformJournal.from_dataset(dataset, stage=1)
+    assert journal is not None
+    assert dataset.get_filename().exists()
+
+    # Reading the cache back ignores the journal
+    assert BaseDataset.from_filename(dataset.get_filename()) == dataset
+
+    journal.reset(len(dataset), label="dti")
+    assert journal.load() == {}
+
+    matrix = np.eye(4)
+    matrix[:3, 3] = 1.0
+    journal.record(3, matrix)
+    loaded = journal.load(label="dti")
+    assert list(loaded) == [3]
+    assert np.allclose(loaded[3], matrix)
+
+    # Reopening an existing cache keeps the journal, overwriting drops it
+    assert list(TransformJournal.from_dataset(dataset, stage=1).load()) == [3]
+    assert TransformJournal.from_dataset(dataset, stage=1, overwrite=True).load() == {}
+
+
+def test_journal_mismatch(dataset):
+    journal = TransformJournal.from_dataset(dataset)
+    journal.reset(len(dataset), label="dti")
+
+    with pytest.raises(
+        ValueError,
+        match=re.escape(
+            JOURNAL_LABEL_MISMATCH_ERROR_MSG.format(stage=0, journal="dti", current="gp")
+        ),
+    ):
+        journal.load(label="gp")
+
+    dataset.dataobj = dataset.dataobj[..., :-1]
+    with pytest.raises(ValueError, match=re.escape(JOURNAL_SHAPE_MISMATCH_ERROR_MSG[:20])):
+        TransformJournal.from_dataset(dataset)
@@ -0,0 +1,137 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Unit tests exercising sharded execution."""
+
+import re
+
+import nibabel as nb
+import numpy as np
+import pytest
+
+from nifreeze.cli import run as cli_run
+from nifreeze.data.base import BaseDataset
+from nifreeze.data.shards import (
+    SHARD_DUPLICATE_ERROR_MSG,
+    SHARD_MISSING_ERROR_MSG,
+    SHARD_SIZE_ERROR_MSG,
+    SHARD_SPEC_ERROR_MSG,
+    merge_shards,
+    shard_indices,
+    write_shard,
+)
+
+SIZE = 11
+
+
+@pytest.fixture
+def dataset(request):
+    return BaseDataset(
+        dataobj=request.node.rng.random((4, 4, 4, SIZE)).astype("float32"),
+        affine=np.eye(4),
+    )
+
+
+def _translate(index: int) -> np.ndarray:
+    matrix = np.eye(4)
+    matrix[0, 3] = 0.1 * index
+    return matrix
+
+
+@pytest.mark.parametrize("nshards", [1, 3, 4, SIZE + 2])
+def test_shard_indices(request, nshards):
+    order = list(request.node.rng.permutation(SIZE))
+    shards = [shard_indices(order, k, nshards) for k in range(nshards)]
+
+    assert sorted(i for shard in shards for i in shard) == list(range(SIZE))
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
+    for shard in shards:
+        assert shard == [i for i in order if i in shard]
+
+    with pytest.raises(ValueError, match=re.escape(SHARD_SPEC_ERROR_MSG.format(shard="3/3"))):
+        shard_indices(order, 3, 3)
+
+
+def test_merge_shards(tmp_path, dataset):
+    dataset.motion_affines = np.stack([_translate(i) for i in range(SIZE)])
+    filenames = [
+        write_shard(tmp_path / f"shard-{k}.h5", dataset, shard_indices(range(SIZE), k, 3), k, 3)
+        for k in range(3)
+    ]
+
+    merged = merge_shards(reversed(filenames), size=SIZE)
+    assert sorted(merged) == list(range(SIZE))
+    assert np.allclose(np.stack([merged[i] for i in range(SIZE)]), dataset.motion_affines)
+
+    with pytest.raises(
+        ValueError, match=re.escape(SHARD_MISSING_ERROR_MSG.format(missing=[1], nshards=3))
+    ):
+        merge_shards(filenames[::2])
+
+    with pytest.raises(
+        ValueError,
+        match=re.escape(SHARD_DUPLICATE_ERROR_MSG.format(shard=0, filename=filenames[0])),
+    ):
+        merge_shards([*filenames, filenames[0]])
+
+    with pytest.raises(
+        ValueError, match=re.escape(SHARD_SIZE_ERROR_MSG.format(size=SIZE, expected=SIZE - 1))
+    ):
+        merge_shards(filenames, size=SIZE - 1)
+
+    other = write_shard(tmp_path / "other.h5", dataset, [0], 0, 2)
+    with pytest.raises(ValueError, match="does not belong to the same run"):
+        merge_shards([*filenames, other])
+
+
+def test_cli_shard_and_merge(tmp_path, monkeypatch, dataset):
+    """Run every shard of a dataset through the CLI, and merge their transforms."""
+    input_file = tmp_path / "data.h5"
+    dataset.to_filename(input_file)
+    processed = []
+
+    def fake_run(self, dataset, **kwargs):
+        # Skip the last volume (e.g., a ``stop_index``): it must not be written out
+        indices = shard_indices(range(len(dataset) - 1), *kwargs["shard"])
+        processed.extend(indices)
+        for index in indices:
+            dataset.set_transform(index, _translate(index))
+        self._indices = indices
+        return self
+
+    monkeypatch.setattr(cli_run.Estimator, "run", fake_run)
+
+    for k in range(3):
+        cli_run.main([str(input_file), "--shard", f"{k}/3", "--output-dir", str(tmp_path)])
+    assert sorted(processed) == list(range(SIZE - 1))
+    assert not list(tmp_path.glob("*.nii.gz"))
+    assert not list(tmp_path.glob("*checkpoint*"))
+
+    shards = sorted(tmp_path.glob("data_shard-*.h5"))
+    assert len(shards) == 3
+    assert sorted(merge_shards(shards)) == list(range(SIZE - 1))
+
+    cli_run.main(
+        [str(input_file), "--merge-shards", *map(str, shards), "--output-dir", str(tmp_path)]
+    )
+    assert len(processed) == SIZE - 1
+    assert nb.load(tmp_path / "data.nii.gz").shape == dataset.dataobj.shape
@@ -0,0 +1,74 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+
+import json
+
+import numpy as np
+import pytest
+
+from nifreeze.utils.instrumentation import (
+    STEP_FIT,
+    STEP_PREDICT,
+    Instrumentation,
+    current_instrumentation,
+    measure,
+)
+
+
+def test_measure_inactive():
+    assert current_instrumentation() is None
+    with measure(STEP_FIT, index=0):
+        pass
+
+
+def test_instrumentation(tmp_path):
+    received = []
+    instrumentation = Instrumentation(jsonl=tmp_path / "events.jsonl")
+    instrumentation.add_callback(received.append)
+
+    with instrumentation:
+        assert current_instrumentation() is instrumentation
+        for index in range(3):
+            with measure(STEP_FIT, index=index):
+                # Allocate some memory to raise the peak RSS
+                np.ones(2**24).sum()
+            with measure(STEP_PREDICT, index=index):
+                pass
+
+        with pytest.raises(RuntimeError):
+            with measure(STEP_PREDICT, index=3):
+                raise RuntimeError
+
+    assert current_instrumentation() is None
+    assert received == instrumentation.events
+    assert [e.index for e in received if e.step == STEP_FIT] == [0, 1, 2]
+    assert [e.index for e in received if e.step == STEP_PREDICT] == [0, 1, 2, 3]
+    assert all(e.elapsed >= 0 and e.rss_delta >= 0 for e in received)
+
+    lines = (tmp_path / "events.jsonl").read_text().splitlines()
+    assert [json.loads(line)["step"] for line in lines] == [e.step for e in received]
+
+    summary = instrumentation.summary().splitlines()
+    assert len(summary) == 3
+    assert summary[1].split()[:2] == [STEP_FIT, "3"]
+    assert summary[2].split()[:2] == [STEP_PREDICT, "4"]
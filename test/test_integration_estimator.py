@@ -21,19 +21,24 @@
 #     https://www.nipreps.org/community/licensing/
 #
 
+import asyncio
+import multiprocessing
 import re
+import threading
 from typing import Union
 
 import numpy as np
 import pytest
 
-import nifreeze.estimator
 from nifreeze.data.base import BaseDataset
 from nifreeze.data.dmri.utils import DEFAULT_LOWB_THRESHOLD
+from nifreeze.data.pet import PET
 from nifreeze.data.pet.utils import compute_uptake_statistic
 from nifreeze.estimator import Estimator
 from nifreeze.model.base import BaseModel
+from nifreeze.registration import ants, native
 from nifreeze.utils import iterators
+from nifreeze.utils.instrumentation import STEP_MODEL, STEP_WRITE, Instrumentation
 
 DATAOBJ_SIZE = (5, 5, 5, 7)
 
@@ -149,7 +154,7 @@ def test_estimator_start_index(request, monkeypatch):
         matrix = np.eye(4)
 
     monkeypatch.setattr(
-        nifreeze.estimator,
+        ants,
         "_run_registration",
         lambda *a, **k: DummyXForm(),
     )
@@ -179,7 +184,7 @@ def test_estimator_start_and_end_index(request, monkeypatch):
         matrix = np.eye(4)
 
     monkeypatch.setattr(
-        nifreeze.estimator,
+        ants,
         "_run_registration",
         lambda *a, **k: DummyXForm(),
     )
@@ -253,7 +258,7 @@ def test_estimator_iterator_index_match(
         matrix = np.eye(4)
 
     monkeypatch.setattr(
-        nifreeze.estimator,
+        ants,
         "_run_registration",
         lambda *a, **k: DummyXForm(),
     )
@@ -294,3 +299,432 @@ def test_estimator_iterator_index_match(
     # Assert indices and matrices
     assert recorded_indices == expected_indices
     assert all(np.allclose(mat, np.eye(4)) for mat in recorded_matrices)
+
+
+def test_estimator_pipelined_overlaps_fit_and_registration(request, monkeypatch):
+    """Test that pipelined mode fits upcoming volumes while registrations run."""
+    recorded_indices = []
+    dataset = DummyDataset(rng=request.node.rng)
+
+    def fake_set_transform(self, i, xform):
+        recorded_indices.append(i)
+
+    monkeypatch.setattr(
+        dataset, "set_transform", fake_set_transform.__get__(dataset, type(dataset))
+    )
+
+    fitted = []
+    second_fit = threading.Event()
+
+    class RecorderModel(DummyInsiderModel):
+        def fit_predict(self, index: int | None = None, **kwargs):
+            fitted.append(index)
+            if len(fitted) == 2:
+                second_fit.set()
+            return super().fit_predict(index, **kwargs)
+
+    class DummyXForm:
+        matrix = np.eye(4)
+
+    async def blocking_registration(*args, **kwargs):
+        # The first registration can only finish once the next volume is being fit
+        assert second_fit.wait(timeout=10)
+        return DummyXForm()
+
+    # Pipelined registrations await ANTs as a subprocess
+    monkeypatch.setattr(ants, "_run_registration", None)
+    monkeypatch.setattr(ants, "_arun_registration", blocking_registration)
+
+    estimator = Estimator(RecorderModel(dataset=dataset), strategy="linear")
+    estimator.run(dataset, pipeline_depth=2, reg_jobs=2)
+
+    # Transforms are collected in the order given by the iterator
+    assert recorded_indices == list(range(len(dataset)))
+    assert fitted == list(range(len(dataset)))
+
+
+def test_estimator_pipelined_propagates_errors(request, monkeypatch):
+    """Test that a failing registration interrupts the pipelined loop."""
+    dataset = DummyDataset(rng=request.node.rng)
+
+    async def failing_registration(*args, **kwargs):
+        raise RuntimeError("registration failed")
+
+    monkeypatch.setattr(ants, "_arun_registration", failing_registration)
+
+    estimator = Estimator(DummyInsiderModel(dataset=dataset), strategy="linear")
+    with pytest.raises(RuntimeError, match="registration failed"):
+        estimator.run(dataset, pipeline_depth=3)
+
+
+def test_estimator_pipelined_resampled(request, monkeypatch):
+    """Test that datasets resampled upon setting a transform are not pipelined."""
+
+    class ResampledDataset(BaseDataset):
+        resamples_on_transform = True
+
+    rng = request.node.rng
+    dataset = ResampledDataset(
+        dataobj=rng.uniform(0.0, 1.0, DATAOBJ_SIZE),
+        affine=np.eye(4),
+        brainmask=np.ones(DATAOBJ_SIZE[:-1], dtype=bool),
+    )
+    steps = []
+
+    class RecorderModel(DummyInsiderModel):
+        def fit_predict(self, index: int | None = None, **kwargs):
+            steps.append(("fit", index))
+            return super().fit_predict(index, **kwargs)
+
+    def fake_register(fixed, moving, affine, fixedmask=None, init_affine=None, **kwargs):
+        return np.eye(4)
+
+    def fake_set_transform(self, i, xform):
+        steps.append(("transform", i))
+
+    monkeypatch.setattr(native, "register", fake_register)
+    monkeypatch.setattr(ResampledDataset, "set_transform", fake_set_transform)
+
+    estimator = Estimator(RecorderModel(dataset=dataset), strategy="linear")
+    with pytest.warns(UserWarning, match="pipeline_depth is ignored"):
+        estimator.run(dataset, backend="native", pipeline_depth=3)
+
+    # Every fit sees the transforms of all the volumes before it
+    assert steps == [(s, i) for i in range(len(dataset)) for s in ("fit", "transform")]
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="monkeypatched registration only reaches forked workers",
+)
+def test_estimator_volume_parallel(request, monkeypatch):
+    """Test that volumes processed in worker processes are merged in iterator order."""
+    recorded = []
+    dataset = DummyDataset(rng=request.node.rng)
+    dataobj = dataset.dataobj
+
+    def fake_set_transform(self, i, xform):
+        recorded.append((i, xform))
+
+    monkeypatch.setattr(
+        dataset, "set_transform", fake_set_transform.__get__(dataset, type(dataset))
+    )
+
+    class DummyXForm:
+        def __init__(self, index):
+            self.matrix = np.eye(4)
+            self.matrix[0, 3] = index
+
+    def fake_registration(predicted_path, volume_path, index, *args, **kwargs):
+        return DummyXForm(index)
+
+    monkeypatch.setattr(ants, "_run_registration", fake_registration)
+
+    estimator = Estimator(DummyInsiderModel(dataset=dataset), strategy="random")
+    estimator.run(dataset, volume_jobs=3, seed=1234)
+
+    expected = list(iterators.random_iterator(size=len(dataset), seed=1234))
+    assert [i for i, _ in recorded] == expected
+    assert all(xform[0, 3] == i for i, xform in recorded)
+    # The original arrays are restored once the pool is done
+    assert dataset.dataobj is dataobj
+
+
+def test_estimator_resume(request, tmp_path, monkeypatch):
+    """Test that a resumed run skips the volumes journaled by each stage."""
+    rng = request.node.rng
+    dataset = BaseDataset(
+        dataobj=rng.uniform(0.0, 1.0, DATAOBJ_SIZE),
+        affine=np.eye(4),
+        brainmask=np.ones(DATAOBJ_SIZE[:-1], dtype=bool),
+        filepath=tmp_path / "cache.h5",
+    )
+    registered = []
+
+    class DummyXForm:
+        def __init__(self, index):
+            self.matrix = np.eye(4)
+            self.matrix[0, 3] = index
+
+    def interrupted_registration(predicted_path, volume_path, index, *args, **kwargs):
+        if len(registered) == len(dataset) + 3:
+            raise KeyboardInterrupt
+        registered.append(index)
+        return DummyXForm(index)
+
+    monkeypatch.setattr(ants, "_run_registration", interrupted_registration)
+
+    def cascade():
+        first = Estimator(DummyInsiderModel(dataset=dataset), strategy="linear")
+        return Estimator(DummyInsiderModel(dataset=dataset), strategy="linear", prev=first)
+
+    # The second stage is interrupted after three volumes
+    with pytest.raises(KeyboardInterrupt):
+        cascade().run(dataset, checkpoint=True)
+
+    registered.clear()
+    dataset.motion_affines = None
+    cascade().run(dataset, resume=True)
+
+    # Only the volumes left by the second stage are registered again
+    assert registered == list(range(3, len(dataset)))
+    assert np.allclose(dataset.motion_affines[:, 0, 3], np.arange(len(dataset)))
+
+
+def test_estimator_instrumentation(request, tmp_path, monkeypatch, capsys):
+    """Test that the steps of every volume are reported, also from registration threads."""
+    dataset = DummyDataset(rng=request.node.rng)
+
+    class DummyXForm:
+        matrix = np.eye(4)
+
+    async def fake_registration(*args, **kwargs):
+        return DummyXForm()
+
+    monkeypatch.setattr(ants, "_arun_registration", fake_registration)
+
+    events = []
+    instrumentation = Instrumentation(callbacks=[events.append], jsonl=tmp_path / "events.jsonl")
+    estimator = Estimator(DummyInsiderModel(dataset=dataset), strategy="linear")
+    estimator.run(dataset, pipeline_depth=2, instrumentation=instrumentation)
+
+    for step in (STEP_MODEL, STEP_WRITE):
+        indices = sorted(e.index for e in events if e.step == step and e.index is not None)
+        assert indices == list(range(len(dataset)))
+    assert len((tmp_path / "events.jsonl").read_text().splitlines()) == len(events)
+    assert STEP_WRITE in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("warm_start", [None, False])
+def test_estimator_warm_start(request, monkeypatch, warm_start):
+    """Test that cascaded stages initialize registrations with the previous transforms."""
+    rng = request.node.rng
+    dataset = BaseDataset(
+        dataobj=rng.uniform(0.0, 1.0, DATAOBJ_SIZE),
+        affine=np.eye(4),
+        brainmask=np.ones(DATAOBJ_SIZE[:-1], dtype=bool),
+    )
+    calls = []
+
+    def fake_register(fixed, moving, affine, fixedmask=None, init_affine=None, **kwargs):
+        calls.append((kwargs["settings"], init_affine))
+        matrix = np.eye(4)
+        matrix[0, 3] = len(calls)
+        return matrix
+
+    monkeypatch.setattr(native, "register", fake_register)
+
+    first = Estimator(DummyInsiderModel(dataset=dataset), strategy="linear")
+    Estimator(
+        DummyInsiderModel(dataset=dataset),
+        strategy="linear",
+        prev=first,
+        warm_start=warm_start,
+    ).run(dataset, backend="native")
+
+    size = len(dataset)
+    assert {settings for settings, _ in calls[:size]} == {native.DEFAULT_SETTINGS}
+    assert all(init is None for _, init in calls[:size])
+    if warm_start is False:
+        assert {settings for settings, _ in calls[size:]} == {native.DEFAULT_SETTINGS}
+        assert all(init is None for _, init in calls[size:])
+    else:
+        assert {settings for settings, _ in calls[size:]} == {"b0-to-b0_level1"}
+        assert [init[0, 3] for _, init in calls[size:]] == list(range(1, size + 1))
+
+
+@pytest.mark.parametrize("resamples", [False, True])
+def test_estimator_warm_start_settings(request, monkeypatch, resamples):
+    """Test that warm starts keep the settings given, and are skipped for resampled data."""
+
+    class ResampledDataset(BaseDataset):
+        resamples_on_transform = True
+
+    rng = request.node.rng
+    dataset = (ResampledDataset if resamples else BaseDataset)(
+        dataobj=rng.uniform(0.0, 1.0, DATAOBJ_SIZE),
+        affine=np.eye(4),
+        brainmask=np.ones(DATAOBJ_SIZE[:-1], dtype=bool),
+    )
+    calls = []
+
+    def fake_register(fixed, moving, affine, fixedmask=None, init_affine=None, **kwargs):
+        calls.append((kwargs["settings"], init_affine))
+        return np.eye(4)
+
+    monkeypatch.setattr(native, "register", fake_register)
+
+    first = Estimator(DummyInsiderModel(dataset=dataset), strategy="linear")
+    Estimator(DummyInsiderModel(dataset=dataset), strategy="linear", prev=first).run(
+        dataset, backend="native", ants_config="dwi-to-b0_level0"
+    )
+
+    size = len(dataset)
+    assert {settings for settings, _ in calls} == {"dwi-to-b0_level0"}
+    assert all(init is None for _, init in calls[:size])
+    assert all((init is None) == resamples for _, init in calls[size:])
+
+
+def test_estimator_multipass(request, monkeypatch):
+    """Test that further passes only revisit the volumes that did not converge."""
+    rng = request.node.rng
+    dataset = BaseDataset(
+        dataobj=rng.uniform(0.0, 1.0, DATAOBJ_SIZE),
+        affine=np.eye(4),
+        brainmask=np.ones(DATAOBJ_SIZE[:-1], dtype=bool),
+    )
+    # Volume i stops moving after (i % 3 + 1) registrations
+    targets = [i % 3 + 1 for i in range(len(dataset))]
+    calls: dict[int, list[str]] = {i: [] for i in range(len(dataset))}
+
+    def fake_register(fixed, moving, affine, fixedmask=None, init_affine=None, **kwargs):
+        index = next(i for i in calls if np.array_equal(moving, dataset.dataobj[..., i]))
+        calls[index].append(kwargs["settings"])
+        matrix = np.eye(4)
+        matrix[0, 3] = min(len(calls[index]), targets[index])
+        return matrix
+
+    monkeypatch.setattr(native, "register", fake_register)
+
+    Estimator(DummyInsiderModel(dataset=dataset), strategy="linear", max_passes=4).run(
+        dataset, backend="native", clip="none"
+    )
+
+    assert [len(calls[i]) for i in calls] == [min(t + 1, 4) for t in targets]
+    assert {c[0] for c in calls.values()} == {native.DEFAULT_SETTINGS}
+    assert {s for c in calls.values() for s in c[1:]} == {"b0-to-b0_level1"}
+    assert np.allclose(dataset.motion_affines[:, 0, 3], targets)
+
+
+def test_estimator_multipass_pet(request, monkeypatch):
+    """Test that further passes over PET compose their residual with the previous transform."""
+    rng = request.node.rng
+    dataset = PET(
+        dataobj=rng.uniform(0.0, 1.0, DATAOBJ_SIZE),
+        affine=np.eye(4),
+        brainmask=np.ones(DATAOBJ_SIZE[:-1], dtype=bool),
+        midframe=np.arange(DATAOBJ_SIZE[-1]) * 10.0 + 5.0,
+        total_duration=DATAOBJ_SIZE[-1] * 10.0,
+    )
+    size = len(dataset)
+    calls = []
+
+    def fake_register(fixed, moving, affine, fixedmask=None, init_affine=None, **kwargs):
+        # Frames are realigned after resampling: two passes move them by 1 mm each
+        calls.append(init_affine)
+        matrix = np.eye(4)
+        matrix[0, 3] = 1.0 if len(calls) <= 2 * size else 0.0
+        return matrix
+
+    monkeypatch.setattr(native, "register", fake_register)
+
+    Estimator(DummyInsiderModel(dataset=dataset), strategy="linear", max_passes=5).run(
+        dataset, backend="native", clip="none"
+    )
+
+    # The third pass finds no residual, and the cumulative transform is kept
+    assert len(calls) == 3 * size
+    assert all(init is None for init in calls)
+    assert np.allclose([xform.matrix[0, 3] for xform in dataset.motion_affines], 2.0)
+
+
+def test_estimator_shard(request, monkeypatch):
+    """Test that a shard only processes its share of the held-out volumes."""
+    dataset = DummyDataset(rng=request.node.rng)
+    registered = []
+
+    class DummyXForm:
+        matrix = np.eye(4)
+
+    def fake_registration(predicted_path, volume_path, index, *args, **kwargs):
+        registered.append(index)
+        return DummyXForm()
+
+    monkeypatch.setattr(ants, "_run_registration", fake_registration)
+
+    estimator = Estimator(DummyInsiderModel(dataset=dataset), strategy="random").run(
+        dataset, shard=(1, 3), seed=1234
+    )
+    assert sorted(registered) == list(range(1, len(dataset), 3))
+    assert estimator.indices == registered
+
+    # The shard is drawn from the indices within ``start_index`` and ``stop_index``
+    registered.clear()
+    estimator = Estimator(
+        DummyInsiderModel(dataset=dataset), strategy="linear", start_index=2, stop_index=-1
+    ).run(dataset, shard=(0, 2))
+    assert registered == estimator.indices == list(range(2, len(dataset) - 1, 2))
+
+
+def test_estimator_arun(request, monkeypatch):
+    """Test that concurrent asynchronous runs share a bound on registrations."""
+    rng = request.node.rng
+    datasets = [
+        BaseDataset(
+            dataobj=rng.uniform(0.0, 1.0, DATAOBJ_SIZE),
+            affine=np.eye(4),
+            brainmask=np.ones(DATAOBJ_SIZE[:-1], dtype=bool),
+        )
+        for _ in range(3)
+    ]
+
+    class DummyXForm:
+        def __init__(self, index):
+            self.matrix = np.eye(4)
+            self.matrix[0, 3] = index
+
+    running, peak = [], []
+
+    async def fake_registration(predicted_path, volume_path, index, *args, **kwargs):
+        running.append(index)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(index)
+        return DummyXForm(index)
+
+    monkeypatch.setattr(ants, "_arun_registration", fake_registration)
+
+    async def _main():
+        semaphore = asyncio.Semaphore(2)
+        return await asyncio.gather(
+            *(
+                Estimator(DummyInsiderModel(dataset=dataset), strategy="linear").arun(
+                    dataset, semaphore=semaphore, pipeline_depth=2
+                )
+                for dataset in datasets
+            )
+        )
+
+    asyncio.run(_main())
+
+    assert max(peak) == 2
+    for dataset in datasets:
+        np.testing.assert_array_equal(dataset.motion_affines[:, 0, 3], np.arange(len(dataset)))
+
+
+def test_estimator_arun_cancel(request, monkeypatch):
+    """Test that cancelling an asynchronous run cancels pending registrations."""
+    dataset = DummyDataset(rng=request.node.rng)
+    started, cancelled = asyncio.Event(), []
+
+    async def hanging_registration(predicted_path, volume_path, index, *args, **kwargs):
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+
+    monkeypatch.setattr(ants, "_arun_registration", hanging_registration)
+
+    async def _main():
+        task = asyncio.create_task(
+            Estimator(DummyInsiderModel(dataset=dataset), strategy="linear").arun(dataset)
+        )
+        await asyncio.wait_for(started.wait(), timeout=10)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(_main())
+    assert cancelled == [0]
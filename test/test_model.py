@@ -42,6 +42,7 @@ from nifreeze.model.base import (
     PREDICTED_MAP_ERROR_MSG,
     UNSUPPORTED_MODEL_ERROR_MSG,
 )
+from nifreeze.model.loo import gp_loo, lstsq_loo
 
 
 # Dummy classes to simulate model factory essential features
@@ -185,6 +186,37 @@ def test_expectation_model(request):
     assert pred2 is pred
 
 
+@pytest.mark.parametrize("stat", ("mean", "median"))
+@pytest.mark.parametrize("n_volumes", (6, 7))
+def test_expectation_model_lovo_statistics(stat, n_volumes):
+    """LOVO summaries from cached statistics match summarizing the other volumes."""
+    rng = np.random.default_rng(1234)
+    dataobj = rng.integers(0, 5, size=(3, 4, 5, n_volumes)).astype(np.float32)
+    dataset = BaseDataset(dataobj=dataobj, affine=np.eye(4), brainmask=np.ones((3, 4, 5), bool))
+    em_model = model.ExpectationModel(dataset, stat=stat)
+
+    for index in range(n_volumes):
+        expected = getattr(np, stat)(np.delete(dataobj, index, axis=-1), axis=-1)
+        predicted = em_model.fit_predict(index)
+        assert predicted.dtype == expected.dtype
+        assert np.allclose(predicted, expected, atol=1e-6)
+
+    # The statistics were computed only once
+    assert len(em_model._loo) == 1
+
+    # Datasets resampled in place as they are realigned are summarized every time
+    class ResampledDataset(BaseDataset):
+        resamples_on_transform = True
+
+    dataset = ResampledDataset(dataobj=dataobj, affine=np.eye(4), brainmask=dataset.brainmask)
+    em_model = model.ExpectationModel(dataset, stat=stat)
+    em_model.fit_predict(0)
+    dataset.dataobj[..., 1] += 1.0
+    expected = getattr(np, stat)(dataset.dataobj[..., 1:], axis=-1)
+    assert np.allclose(em_model.fit_predict(0), expected)
+    assert not em_model._loo
+
+
 def test_factory_none_raises(setup_random_base_data):
     dataobj, affine, brainmask, motion_affines, datahdr = setup_random_base_data
     dataset: BaseDataset = BaseDataset(
@@ -429,6 +461,121 @@ def test_gpmodel_fit_predict(setup_random_dwi_data):
     assert predicted2.shape == dwi_dataobj.shape[:-1]
 
 
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+@pytest.mark.random_dwi_data(50, (8, 8, 4), True)
+def test_gpmodel_closed_form(setup_random_dwi_data):
+    """Closed-form LOVO matches refitting the GP with its hyperparameters fixed."""
+    from sklearn.gaussian_process import GaussianProcessRegressor
+
+    from nifreeze.model._dipy import GP_JITTER
+
+    dwi_dataobj, affine, brainmask_dataobj, gradients, _ = setup_random_dwi_data
+    dwi = DWI(
+        dataobj=dwi_dataobj,
+        affine=affine,
+        brainmask=brainmask_dataobj,
+        gradients=gradients,
+    )
+
+    gp = model.dmri.GPModel(dwi, kernel_model="spherical", closed_form=True)
+    predicted = [gp.fit_predict(index) for index in (0, 7)]
+    assert gp._lovo is not None
+    assert not gp._models
+
+    # The hyperparameters optimized on all volumes, kept fixed for every refit
+    fit = gp._gp_fit().model
+    X, y = fit.X_train_, dwi.dataobj[gp._data_mask].T
+    for index, pred in zip((0, 7), predicted, strict=True):
+        keep = np.arange(len(dwi)) != index
+        refit = GaussianProcessRegressor(
+            kernel=fit.kernel_, alpha=GP_JITTER, optimizer=None, normalize_y=True
+        ).fit(X[keep], y[keep])
+        assert pred is not None
+        assert np.allclose(pred[gp._data_mask], refit.predict(X[[index]])[0])
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+def test_gpmodel_blocked(setup_random_dwi_data):
+    """Blocked GP fitting reproduces the default fit, in single precision."""
+    from nifreeze.model.gpr import BlockedGPR
+
+    dwi_dataobj, affine, brainmask_dataobj, gradients, _ = setup_random_dwi_data
+    dwi = DWI(
+        dataobj=dwi_dataobj,
+        affine=affine,
+        brainmask=brainmask_dataobj,
+        gradients=gradients,
+    )
+
+    expected = model.dmri.GPModel(dwi, kernel_model="spherical").fit_predict(3)
+    gp = model.dmri.GPModel(dwi, kernel_model="spherical", block_size=7, dtype="float32")
+    predicted = gp.fit_predict(3)
+    assert isinstance(gp._models[0].model, BlockedGPR)
+    assert predicted is not None and expected is not None
+    assert predicted.dtype == np.float32
+    assert np.allclose(predicted, expected, rtol=1e-4, atol=1e-3)
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+@pytest.mark.random_dwi_data(50, (8, 8, 4), True)
+def test_gpmodel_warm_start(setup_random_dwi_data, monkeypatch):
+    """Each fold starts optimizing from the previous fold's optimum."""
+    from nifreeze.model.gpr import DiffusionGPR
+
+    dwi_dataobj, affine, brainmask_dataobj, gradients, _ = setup_random_dwi_data
+    dwi = DWI(
+        dataobj=dwi_dataobj,
+        affine=affine,
+        brainmask=brainmask_dataobj,
+        gradients=gradients,
+    )
+
+    starts = []
+    optimize = DiffusionGPR._constrained_optimization
+
+    def _spy(self, obj_func, initial_theta, bounds):
+        starts.append((initial_theta.copy(), self.tol))
+        return optimize(self, obj_func, initial_theta, bounds)
+
+    monkeypatch.setattr(DiffusionGPR, "_constrained_optimization", _spy)
+
+    gp = model.dmri.GPModel(dwi, kernel_model="spherical", warm_start=True, warm_tol=1e-3)
+    optima = []
+    for index in (0, 1, 2):
+        assert gp.fit_predict(index) is not None
+        optima.append(gp._models[0].model.kernel_.theta)
+
+    assert starts[0][1] is None
+    for (theta, tol), optimum in zip(starts[1:], optima[:-1], strict=True):
+        assert np.allclose(theta, optimum)
+        assert tol == 1e-3
+    assert set(gp._n_iter) == {0, 1, 2}
+    assert all(isinstance(n_iter, int) for n_iter in gp._n_iter.values())
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+@pytest.mark.random_dwi_data(50, (8, 8, 4), True)
+@pytest.mark.parametrize("model_name", ("DTIModel", "DKIModel", "GQIModel", "GPModel"))
+def test_model_deepcopy(setup_random_dwi_data, model_name):
+    """Models can be copied (sharing the dataset), leaving the original unfitted."""
+    import copy
+
+    dwi_dataobj, affine, brainmask_dataobj, gradients, _ = setup_random_dwi_data
+    dwi = DWI(
+        dataobj=dwi_dataobj,
+        affine=affine,
+        brainmask=brainmask_dataobj,
+        gradients=gradients,
+    )
+
+    original = getattr(model.dmri, model_name)(dwi)
+    copied = copy.deepcopy(original, {id(dwi): dwi})
+    assert copied._dataset is dwi
+    assert copied._model_class == original._model_class
+    assert np.allclose(copied.fit_predict(3), original.fit_predict(3))
+    assert copied._S0 is not original._S0
+
+
 @pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
 def test_single_fit_canary_warning(setup_random_dwi_data):
     """Canary models (GQI, GP) warn on single-fit; DTI and average do not."""
@@ -483,8 +630,11 @@ def test_model_capability_contract():
     # GQI drops b=0 volumes.
     assert model.dmri.GQIModel.excludes_b0 is True
 
-    # GP targets orientation data (kernel picks the concrete scheme).
-    assert model.dmri.GPModel.applicable_schemes == frozenset({"single-shell", "multi-shell"})
+    # GP targets orientation data (kernel picks the concrete scheme); DSI through
+    # the sparse approximation.
+    assert model.dmri.GPModel.applicable_schemes == frozenset(
+        {"single-shell", "multi-shell", "DSI"}
+    )
 
 
 def test_factory_initializations(datadir):
@@ -510,3 +660,48 @@ def test_factory_initializations(datadir):
     assert model1._atol_low == model2._atol_low
     assert model1._atol_high == model2._atol_high
     assert model1._stat == model2._stat
+
+
+@pytest.mark.parametrize("weighted", (False, True))
+def test_lstsq_loo(request, weighted):
+    """Leave-one-out coefficients match least squares without each observation."""
+    rng = request.node.rng
+    design = rng.normal(size=(12, 4))
+    data = rng.normal(size=(3, 12))
+    weights = rng.uniform(0.5, 2.0, size=data.shape) if weighted else np.ones_like(data)
+
+    coef = lstsq_loo(design, data, weights if weighted else None)
+
+    assert coef.shape == (3, 12, 4)
+    for voxel in range(3):
+        for held_out in range(12):
+            sqrt_w = np.sqrt(np.delete(weights[voxel], held_out))
+            expected = np.linalg.lstsq(
+                np.delete(design, held_out, axis=0) * sqrt_w[:, np.newaxis],
+                np.delete(data[voxel], held_out) * sqrt_w,
+                rcond=None,
+            )[0]
+            assert np.allclose(coef[voxel, held_out], expected)
+
+    # An observation that alone determines a coefficient cannot be left out
+    design[:, -1] = 0.0
+    design[5, -1] = 1.0
+    assert not np.isfinite(lstsq_loo(design, data)[:, 5]).any()
+
+
+def test_gp_loo(request):
+    """Leave-one-out GP means match refits, also when each fold is centered."""
+    rng = request.node.rng
+    x = np.sort(rng.uniform(size=10))
+    cov = np.exp(-((x[:, None] - x[None]) ** 2) / 0.05) + 0.1 * np.eye(10)
+    data = rng.normal(loc=3.0, size=(10, 4))
+
+    for center in (False, True):
+        loo = gp_loo(np.linalg.cholesky(cov), data, center=center)
+        for held_out in range(10):
+            keep = np.arange(10) != held_out
+            mean = data[keep].mean(axis=0) if center else 0.0
+            expected = mean + cov[held_out, keep] @ np.linalg.solve(
+                cov[np.ix_(keep, keep)], data[keep] - mean
+            )
+            assert np.allclose(loo[held_out], expected)
@@ -40,6 +40,7 @@ from nifreeze.data.dmri.utils import (
     DTI_MIN_ORIENTATIONS,
     format_gradients,
 )
+from nifreeze.data.filtering import dwi_select_shells
 from nifreeze.model._dipy import GaussianProcessModel
 from nifreeze.model.base import MASK_ABSENCE_WARN_MSG
 from nifreeze.model.dki import DiffusionKurtosisModel as _NFDKIModel
@@ -552,6 +553,28 @@ def test_average_model():
     assert np.allclose(avgmodel_median_2000.fit_predict(last), 1000)
 
 
+@pytest.mark.parametrize("stat", ("mean", "median"))
+@pytest.mark.parametrize("atol", (100, None))
+def test_average_model_lovo_statistics(stat, atol):
+    """Per-shell LOVO summaries from cached statistics match summarizing each shell."""
+    rng = np.random.default_rng(1234)
+    gtab = B_MATRIX.copy()
+    data = rng.normal(1000.0, 100.0, size=(5, 5, 5, gtab.shape[0])).astype(np.float32)
+    dataset = DWI(
+        dataobj=data, affine=np.eye(4), gradients=gtab, brainmask=np.ones((5, 5, 5), bool)
+    )
+    avgmodel = model.AverageDWIModel(dataset, stat=stat, atol_low=atol, atol_high=atol)
+
+    for index in range(1, len(dataset)):
+        shellmask = dwi_select_shells(dataset.gradients, index, atol_low=atol, atol_high=atol)
+        expected = getattr(np, stat)(dataset.dataobj[..., shellmask], axis=-1)
+        assert np.allclose(avgmodel.fit_predict(index), expected, rtol=1e-5)
+
+    # One set of statistics per shell
+    n_shells = len(np.unique(dataset.gradients[1:, -1])) if atol is not None else 1
+    assert len(avgmodel._loo) == n_shells
+
+
 @pytest.mark.random_dwi_data(50, (14, 16, 8), True)
 @pytest.mark.parametrize("index", (None, 4))
 def test_dti_prediction_shape(setup_random_dwi_data, index):
@@ -1165,6 +1188,85 @@ def test_dki_single_fit_locked_reuse(multi_shell_test_data):
     assert np.any(predicted != 0)
 
 
+@pytest.mark.parametrize(
+    "multi_shell_test_data",
+    [
+        {
+            "bval_shell": (1000, 2000, 3000),
+            "S0": 100,
+            "evals": (0.0015, 0.0003, 0.0003),
+            "hsph_dirs": (10, 10, 10),
+            "snr": 20,
+            "vol_shape": (4, 4, 3),
+        },
+    ],
+    indirect=True,
+)
+@pytest.mark.parametrize("model_name", ("DTIModel", "DKIModel"))
+@pytest.mark.parametrize(
+    ("fit_method", "closed_form_wls", "rtol"),
+    (("OLS", False, 1e-8), ("WLS", True, 5e-2)),
+)
+def test_closed_form_lovo(
+    multi_shell_test_data, monkeypatch, model_name, fit_method, closed_form_wls, rtol
+):
+    """The closed-form LOVO prediction matches refitting without the held-out volume.
+
+    The match is exact for OLS, whereas the opt-in closed-form WLS keeps the weights
+    of the fit of all volumes.
+    """
+    dataset, _, _, _ = setup_multi_shell_fit_predict_data(
+        multi_shell_test_data, ignore_bzero=False, use_mask=False
+    )
+    Model = getattr(model, model_name)
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=MASK_ABSENCE_WARN_MSG, category=UserWarning)
+        closed_form = Model(dataset, fit_method=fit_method, closed_form_wls=closed_form_wls)
+        predicted = [closed_form.fit_predict(index) for index in (0, 13, 29)]
+        assert closed_form._lovo is not None
+        assert not closed_form._models
+
+        monkeypatch.setattr(Model, "_design_matrix", None)
+        refit = Model(dataset, fit_method=fit_method)
+        expected = [refit.fit_predict(index) for index in (0, 13, 29)]
+
+    for pred, exp in zip(predicted, expected, strict=True):
+        assert pred is not None and exp is not None
+        assert np.allclose(pred, exp, rtol=rtol, atol=0)
+
+
+@pytest.mark.parametrize(
+    "single_shell_test_data",
+    [
+        {
+            "bval_shell": 1000,
+            "S0": 100,
+            "evals": (0.0015, 0.0003, 0.0003),
+            "hsph_dirs": 30,
+            "snr": None,
+            "vol_shape": (2, 2, 2),
+        },
+    ],
+    indirect=True,
+)
+@pytest.mark.parametrize("fit_method", ("NLLS", "WLS"))
+def test_closed_form_lovo_fallback(single_shell_test_data, fit_method):
+    """Nonlinear and (by default) weighted fits refit the model for every held-out volume."""
+    dataset, _, _, _ = setup_single_shell_fit_predict_data(
+        single_shell_test_data, ignore_bzero=False, use_mask=False
+    )
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=MASK_ABSENCE_WARN_MSG, category=UserWarning)
+        dtimodel = model.DTIModel(dataset, fit_method=fit_method)
+        predicted = dtimodel.fit_predict(4)
+
+    assert predicted is not None
+    assert dtimodel._lovo is None
+    assert len(dtimodel._models) == 1
+
+
 @pytest.mark.parametrize(
     "single_shell_test_data",
     [
@@ -1224,13 +1326,14 @@ def test_dti_parallel_matches_serial(single_shell_test_data, index):
 )
 @pytest.mark.parametrize("index", (4, 9))
 @pytest.mark.parametrize("method", ("standard", "gqi2"))
-def test_gqi_fit_predict(single_shell_test_data, index, method):
+def test_gqi_fit_predict(single_shell_test_data, index, method, monkeypatch):
     """GQI (a NiFreeze-custom model) parallelizes by chunking the data.
 
     Its ``fit`` does not accept the DIPY-native ``engine`` kwargs, so ``_fit``
     must fall back to the data-chunking path. The chunked (``n_jobs=2``) result
     must match the serial (``n_jobs=1``) path since voxel-wise fitting is
-    independent. Both GQI variants (``"standard"`` and ``"gqi2"``) are covered.
+    independent, and both must match the LOVO prediction from the kernels of all
+    volumes. Both GQI variants (``"standard"`` and ``"gqi2"``) are covered.
     """
     dataset, _, _, _ = setup_single_shell_fit_predict_data(
         single_shell_test_data, ignore_bzero=False, use_mask=False
@@ -1238,6 +1341,9 @@ def test_gqi_fit_predict(single_shell_test_data, index, method):
 
     with warnings.catch_warnings():
         warnings.filterwarnings("ignore", message=MASK_ABSENCE_WARN_MSG, category=UserWarning)
+        cached = model.dmri.GQIModel(dataset, method=method).fit_predict(index, n_jobs=1)
+        # Refit the held-in volumes instead
+        monkeypatch.setattr(model.dmri.GQIModel, "_lovo_predict", lambda *_, **__: None)
         serial = model.dmri.GQIModel(dataset, method=method).fit_predict(index, n_jobs=1)
         parallel = model.dmri.GQIModel(dataset, method=method).fit_predict(index, n_jobs=2)
 
@@ -1245,6 +1351,7 @@ def test_gqi_fit_predict(single_shell_test_data, index, method):
     assert parallel is not None
     assert serial.shape == parallel.shape
     assert np.allclose(serial, parallel, rtol=1e-5, atol=1e-6, equal_nan=True)
+    assert np.allclose(cached, serial, rtol=1e-5, atol=1e-6, equal_nan=True)
 
 
 @pytest.mark.parametrize(
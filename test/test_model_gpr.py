@@ -763,3 +763,159 @@ def test_multishellkernel_gp_optimizes(n_samples):
     mean = cast(np.ndarray, model.predict(X[:3]))
     assert mean.shape == (3,)
     assert np.isfinite(mean).all()
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+@pytest.mark.parametrize("dtype,atol", [(None, 1e-10), ("float32", 1e-4)])
+def test_blocked_gpr(dtype, atol):
+    """Blocked regression reproduces the optimum and predictions of DiffusionGPR."""
+    from sklearn.gaussian_process.kernels import WhiteKernel
+
+    rng = np.random.default_rng(1234)
+    y = 3.0 * _ORIENT[:, :1] ** 2 + rng.normal(size=(_ORIENT.shape[0], 50)) + 5.0
+    kernel = gpr.SphericalKriging(beta_a=1.0, beta_l=1.0) + WhiteKernel(noise_level=1.0)
+
+    reference = gpr.DiffusionGPR(kernel=kernel, alpha=1e-10, n_targets=50).fit(_ORIENT, y)
+    blocked = gpr.BlockedGPR(kernel, alpha=1e-10, block_size=16, dtype=dtype)
+    blocked.fit(_ORIENT, y)
+
+    assert np.allclose(blocked.kernel_.theta, reference.kernel_.theta, atol=1e-6)
+    assert np.isclose(
+        blocked.log_marginal_likelihood_value_, reference.log_marginal_likelihood_value_
+    )
+
+    mean, std = blocked.predict(_ORIENT[:3], return_std=True)
+    ref_mean, ref_std = reference.predict(_ORIENT[:3], return_std=True)
+    assert mean.dtype == np.dtype(dtype or np.float64)
+    assert np.allclose(mean, ref_mean, atol=atol)
+    assert np.allclose(std, ref_std, atol=atol)
+
+
+def test_gp_model_blocked():
+    """GaussianProcessModel fits with BlockedGPR when a block size is given."""
+    from nifreeze.model._dipy import GaussianProcessModel
+    from nifreeze.model.loo import gp_loo
+
+    rng = np.random.default_rng(1234)
+    data = rng.normal(size=(4, 5, _ORIENT.shape[0])) + 10.0
+
+    gpfit = GaussianProcessModel(block_size=8, dtype="float32").fit(data, _ORIENT)
+    assert isinstance(gpfit.model, gpr.BlockedGPR)
+
+    prediction = gpfit.predict(_ORIENT[:2])
+    assert prediction.shape == (2, 20)
+    assert prediction.dtype == np.float32
+
+    y = data.reshape(-1, _ORIENT.shape[0]).T
+    expected = gp_loo(gpfit.model.L_, y, center=True)
+    assert np.allclose(gpfit.loo_predict(), expected, atol=1e-4)
+
+
+@pytest.mark.parametrize(
+    "kernel,columns",
+    [
+        (gpr.SphericalKriging(beta_a=1.0, beta_l=2.0), slice(0, 3)),
+        (gpr.ExponentialKriging(beta_a=1.0, beta_l=2.0), slice(0, 3)),
+        (gpr.MultiShellKernel(radial_kernel=RBF(length_scale=0.5)), slice(None)),
+    ],
+)
+def test_kernel_geometry(kernel, columns, monkeypatch):
+    """Kernels slice the cached geometry of a table for any subset of its rows."""
+    X = _make_multishell_X(12)
+    fold, others = X[1:, columns], X[:1, columns]
+    expected = kernel(fold, eval_gradient=True), kernel(fold, others)
+
+    geometry = gpr.KernelGeometry(X)
+    calls = []
+    compute = gpr.compute_pairwise_angles
+
+    def _spy(*args, **kwargs):
+        calls.append(args)
+        return compute(*args, **kwargs)
+
+    monkeypatch.setattr(gpr, "compute_pairwise_angles", _spy)
+
+    with geometry:
+        K, K_gradient = kernel(fold, eval_gradient=True)
+        K_cross = kernel(fold, others)
+    assert not calls
+    assert np.allclose(K, expected[0][0])
+    assert np.allclose(K_gradient, expected[0][1])
+    assert np.allclose(K_cross, expected[1])
+
+    # Inputs outside the table are computed as usual
+    with geometry:
+        kernel(fold + 0.1)
+    assert calls
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+@pytest.mark.parametrize("block_size", [None, 8])
+def test_gp_model_hyper_voxels(block_size):
+    """Hyperparameters are optimized on a stratified subset and shared by all voxels."""
+    from nifreeze.model._dipy import GaussianProcessModel, stratified_subsample
+
+    rng = np.random.default_rng(1234)
+    data = rng.normal(size=(6, 5, _ORIENT.shape[0])) + rng.uniform(5, 50, size=(6, 5, 1))
+    y = data.reshape(-1, _ORIENT.shape[0]).T
+
+    gp = GaussianProcessModel(hyper_voxels=6, hyper_seed=3, block_size=block_size)
+    gpfit = gp.fit(data, _ORIENT)
+
+    assert gpfit.subset is not None
+    assert np.array_equal(gpfit.subset, stratified_subsample(y.mean(axis=0), 6, 3))
+    assert isinstance(gpfit.n_iter, int)
+
+    reference = gpr.DiffusionGPR(kernel=gp.kernel, alpha=1e-10).fit(_ORIENT, y[:, gpfit.subset])
+    assert np.allclose(gpfit.model.kernel_.theta, reference.kernel_.theta, atol=1e-6)
+    assert gpfit.predict(_ORIENT[:2]).shape == (2, 30)
+
+    # Without a subset (or with a subset as large as the mask), all voxels are used
+    assert GaussianProcessModel(hyper_voxels=30).fit(data, _ORIENT).subset is None
+
+
+def test_sparse_gpr():
+    """With the training inputs as inducing inputs, SoR is the exact GP."""
+    from sklearn.gaussian_process.kernels import WhiteKernel
+
+    from nifreeze.model.loo import gp_loo
+
+    rng = np.random.default_rng(1234)
+    X = gpr.inducing_directions(12)
+    y = 3.0 * X[:, :1] ** 2 + rng.normal(scale=0.1, size=(12, 4))
+    kernel = gpr.SphericalKriging(beta_a=2.0, beta_l=1.0) + WhiteKernel(noise_level=0.1)
+
+    sparse = gpr.SparseGPR(kernel, inducing=X, optimizer=None).fit(X, y)
+    exact = gpr.DiffusionGPR(kernel=kernel, alpha=1e-10, optimizer=None).fit(X, y)
+
+    mean, std = sparse.predict(X[:3] + 0.1, return_std=True)
+    ref_mean, ref_std = exact.predict(X[:3] + 0.1, return_std=True)
+    assert np.allclose(mean, ref_mean, atol=1e-6)
+    assert np.allclose(std, ref_std, atol=1e-6)
+    assert np.isclose(sparse.log_marginal_likelihood_value_, exact.log_marginal_likelihood_value_)
+    assert np.allclose(sparse.loo_predict(), gp_loo(exact.L_, y, center=True), atol=1e-6)
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+@pytest.mark.parametrize("kernel_model", ["spherical", "multishell"])
+def test_gp_model_sparse(kernel_model):
+    """GaussianProcessModel approximates the GP on inducing inputs when requested."""
+    from nifreeze.model._dipy import GaussianProcessModel
+
+    X = _make_multishell_X(40)
+    rng = np.random.default_rng(1234)
+    data = rng.normal(size=(3, 2, 40)) + 10.0
+
+    gp = GaussianProcessModel(kernel_model=kernel_model, approximation="sor", n_inducing=10)
+    gpfit = gp.fit(data, X)
+    assert isinstance(gpfit.model, gpr.SparseGPR)
+    assert gpfit.model.inducing.shape[1] == (4 if kernel_model == "multishell" else 3)
+    assert np.isfinite(gpfit.predict(X[:2])).all()
+    assert gpfit.loo_predict().shape == (40, 6)
+
+    # No approximation is needed with fewer orientations than inducing inputs
+    gp = GaussianProcessModel(approximation="sor", n_inducing=50)
+    assert isinstance(gp.fit(data, X).model, gpr.DiffusionGPR)
+
+    with pytest.raises(ValueError, match="Unknown GP approximation"):
+        GaussianProcessModel(approximation="nystrom")
@@ -32,6 +32,7 @@ with respect to the DIPY-branch version, i.e. with shape
 carry a ``.T`` on ``K_plus`` relative to the original tests.
 """
 
+import re
 import warnings
 
 import numpy as np
@@ -46,9 +47,12 @@ from nifreeze.data.dmri.base import DWI_B0_MULTIPLE_VOLUMES_WARN_MSG
 from nifreeze.data.dmri.utils import format_gradients
 from nifreeze.model.base import MASK_ABSENCE_WARN_MSG
 from nifreeze.model.gqi import (
+    SPECTRAL_ENERGY_ERROR_MSG,
     GeneralizedQSamplingModel,
+    LOVOKernel,
     gqi_kernel,
     prediction_kernel,
+    truncated_kernel,
 )
 
 SINGLE_VOXEL_CORRELATION_THRESHOLD = 0.8
@@ -473,6 +477,55 @@ def test_gqimodel_forwards_model_kwargs():
         assert model.dmri.GQIModel(dataset).fit_predict(index, n_jobs=1, method="gqi2") is not None
 
 
+@pytest.mark.parametrize("method", ("standard", "gqi2"))
+@pytest.mark.parametrize("index", (0, 57, [3, 40, 100]))
+def test_lovo_kernel_operator(method, index):
+    """The operators sliced from the Gram matrix of all gradients equal a refit's."""
+    _, gtab = dsi_voxels()
+    sphere = get_sphere(name="symmetric724")
+    held_out = np.zeros(len(gtab.bvals), dtype=bool)
+    held_out[index] = True
+
+    def subset(mask):
+        return gradient_table(bvals=gtab.bvals[mask], bvecs=gtab.bvecs[mask])
+
+    expected = (
+        prediction_kernel(subset(held_out), SAMPLING_LENGTH, sphere, method=method)
+        @ gqi_kernel(subset(~held_out), SAMPLING_LENGTH, sphere, method=method).T
+    )
+    lovo = LOVOKernel(gtab, method=method, sampling_length=SAMPLING_LENGTH, sphere=sphere)
+
+    assert np.allclose(lovo.operator(index), expected, rtol=1e-6, atol=1e-10)
+
+
+@pytest.mark.parametrize("energy", (0.999, 0.9999))
+def test_spectral_energy_prediction(energy):
+    """Truncating the kernel keeps the prediction within its reported error."""
+    data, gtab = dsi_voxels()
+    dw = ~gtab.b0s_mask
+    signal = data.reshape(-1, data.shape[-1])[:, dw].astype(float)
+    keep = np.arange(signal.shape[1]) != 10
+    train = gradient_table(bvals=gtab.bvals[dw][keep], bvecs=gtab.bvecs[dw][keep])
+    held_out = gradient_table(bvals=gtab.bvals[dw][~keep], bvecs=gtab.bvecs[dw][~keep])
+
+    exact = GeneralizedQSamplingModel(train, sampling_length=SAMPLING_LENGTH)
+    truncated = GeneralizedQSamplingModel(
+        train, sampling_length=SAMPLING_LENGTH, spectral_energy=energy
+    )
+    assert exact.rank == keep.sum()
+    assert exact.reconstruction_error == 0.0
+    assert 0 < truncated.rank < exact.rank
+    assert truncated.reconstruction_error <= np.sqrt(1 - energy)
+
+    expected = exact.fit(signal[:, keep]).predict(held_out)
+    predicted = truncated.fit(signal[:, keep]).predict(held_out)
+    deviation = np.linalg.norm(predicted - expected) / np.linalg.norm(expected)
+    assert deviation < truncated.reconstruction_error
+
+    with pytest.raises(ValueError, match=re.escape(SPECTRAL_ENERGY_ERROR_MSG.format(energy=1.5))):
+        truncated_kernel(exact.kernel, 1.5)
+
+
 # ---------------------------------------------------------------------------
 # Integration: GQIModel LOVO prediction on real Stanford HARDI brain data
 # ---------------------------------------------------------------------------
@@ -23,13 +23,16 @@
 
 import re
 import sys
+import warnings
 
 import numpy as np
 import pytest
 from scipy.interpolate import BSpline
+from scipy.linalg import lstsq as scipy_lstsq
 
 from nifreeze.data.base import BaseDataset
 from nifreeze.data.pet import PET
+from nifreeze.model.base import SingleFitCanaryWarning
 from nifreeze.model.pet import (
     BSPLINE_CTRL_POINT_SUFFICIENCY_ERROR_MESSAGE,
     BSPLINE_ORDER_SUFFICIENCY_ERROR_MESSAGE,
@@ -253,6 +256,78 @@ def test_petmodel_fit_predict(setup_random_pet_data):
         assert vol.dtype == pet_obj.dataobj.dtype
 
 
+@pytest.mark.parametrize("use_mask", (True, False))
+@pytest.mark.filterwarnings("ignore:No mask provided")
+@pytest.mark.random_pet_data(
+    7, (4, 4, 4), np.array([0.99, 10.01, 60.0, 100.15, 200.34, 400.0, 700.01])
+)
+def test_petmodel_fit_predict_matches_refit(setup_random_pet_data, use_mask):
+    """The cached LOVO operators reproduce a least-squares refit of each fold."""
+    pet_dataobj, affine, brainmask_dataobj, _, midframe, total_duration = setup_random_pet_data
+    brainmask = brainmask_dataobj if use_mask else None
+
+    pet_obj = PET(
+        dataobj=pet_dataobj,
+        affine=affine,
+        brainmask=brainmask,
+        midframe=midframe,
+        total_duration=total_duration,
+    )
+    model = BSplinePETModel(dataset=pet_obj)
+    design = BSpline.design_matrix(midframe, t=model._t, k=model._order, extrapolate=False)
+    design = design.toarray()
+    mask = np.ones(pet_obj.shape3d, dtype=bool) if brainmask is None else brainmask
+    data = pet_obj.dataobj[mask].astype("float64")
+
+    for index in range(len(pet_obj)):
+        keep = np.arange(len(pet_obj)) != index
+        coef = scipy_lstsq(design[keep], data[:, keep].T, lapack_driver="gelsd")[0]
+        expected = np.zeros(pet_obj.shape3d)
+        expected[mask] = design[index] @ coef
+
+        assert np.allclose(model.fit_predict(index), expected, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize(("n_tp", "canary"), ((12, False), (6, True)))
+def test_petmodel_single_fit(n_tp, canary):
+    """Single-fit locks the B-spline fit of all frames, and evaluates it per frame."""
+    shape = (3, 3, 3)
+    rng = np.random.default_rng(1234)
+    dataobj = rng.random(shape + (n_tp,), dtype=np.float32)
+    brainmask = np.zeros(shape, dtype=bool)
+    brainmask[1:, 1:, 1:] = True
+
+    pet_obj = PET(
+        dataobj=dataobj,
+        affine=np.eye(4),
+        brainmask=brainmask,
+        midframe=np.linspace(10, 600, n_tp, dtype="float32"),
+        total_duration=620.0,
+    )
+    model = BSplinePETModel(dataset=pet_obj)
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        assert model.fit_predict(None) is None
+    assert any(issubclass(w.category, SingleFitCanaryWarning) for w in caught) is canary
+    assert model.is_fitted
+
+    design = BSpline.design_matrix(
+        pet_obj.midframe, t=model._t, k=model._order, extrapolate=False
+    ).toarray()
+    # Only the voxels within the mask are fitted
+    assert model._locked_fit.shape == (brainmask.sum(), design.shape[1])
+    coef = scipy_lstsq(design, dataobj[brainmask].T.astype("float64"))[0]
+    for index in range(n_tp):
+        expected = np.zeros(shape)
+        expected[brainmask] = design[index] @ coef
+        predicted = model.fit_predict(index)
+        assert predicted.dtype == pet_obj.dataobj.dtype
+        assert np.allclose(predicted, expected, atol=1e-4)
+        if canary:
+            assert np.allclose(predicted[brainmask], dataobj[brainmask, index], atol=1e-4)
+
+
 @pytest.mark.random_pet_data(5, (4, 4, 4), np.asarray([10.0, 20.0, 30.0, 40.0, 50.0]))
 def test_min_timepoints_error(setup_random_pet_data):
     pet_dataobj, affine, brainmask_dataobj, _, midframe, total_duration = setup_random_pet_data
@@ -524,3 +599,9 @@ def test_petmodel_fit_predict_no_brainmask():
     vol = model.fit_predict(0)
     assert vol is not None
     assert vol.shape == shape
+
+    # Without a mask, the single fit covers every voxel
+    assert model.fit_predict(None) is None
+    assert model._locked_fit.shape == shape + (model._design.shape[1],)
+    expected = dataobj @ np.linalg.pinv(model._design).T @ model._design[0]
+    assert np.allclose(model.fit_predict(0), expected, atol=1e-4)
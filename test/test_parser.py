@@ -56,7 +56,7 @@ def test_parse_yaml_config(tmp_path):
 
 @pytest.mark.parametrize(
     ("model_name", "single_fit"),
-    [("singleDTI", True), ("PET", False)],
+    [("singleDTI", True), ("PET", False), ("singlePET", True)],
 )
 def test_determine_single_fit_mode(model_name, single_fit):
     assert _determine_single_fit_mode(model_name) == single_fit
@@ -64,7 +64,7 @@ def test_determine_single_fit_mode(model_name, single_fit):
 
 @pytest.mark.parametrize(
     ("model_name", "normalized_name"),
-    [("singleDTI", "dti"), ("PET", "pet")],
+    [("singleDTI", "dti"), ("PET", "pet"), ("singlePET", "pet")],
 )
 def test_normalize_model_name(model_name, normalized_name):
     assert _normalize_model_name(model_name) == normalized_name
@@ -74,6 +74,8 @@ def test_normalize_model_name(model_name, normalized_name):
     ("argv", "code"),
     [
         ([], 2),
+        (["data", "--shard", "4/4"], 2),
+        (["data", "--shard", "1"], 2),
     ],
 )
 def test_parser_errors(argv, code):
@@ -102,6 +104,17 @@ def test_parser_valid(tmp_path, argv):
     assert args.models == ["trivial"]
 
 
+def test_parser_shard(tmp_path):
+    """Check the parsing of shards."""
+    args = _build_parser().parse_args([str(tmp_path), "--shard", "1/4"])
+    assert args.shard == (1, 4)
+
+    with pytest.raises(SystemExit):
+        _build_parser().parse_args(
+            [str(tmp_path), "--shard", "1/4", "--merge-shards", str(tmp_path)]
+        )
+
+
 @pytest.mark.parametrize(
     ("input_filebasename", "models", "nthreads", "n_jobs", "seed"),
     [
@@ -0,0 +1,215 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Unit tests exercising the registration backends."""
+
+import asyncio
+import gc
+import os
+import pickle
+import re
+import sys
+
+import numpy as np
+import pytest
+
+from nifreeze.data.base import BaseDataset
+from nifreeze.estimator import Estimator
+from nifreeze.model.base import BaseModel
+from nifreeze.registration import ants
+from nifreeze.registration.base import (
+    UNSUPPORTED_BACKEND_ERROR_MSG,
+    RegistrationBackend,
+    RegistrationFactory,
+)
+
+
+class DummyModel(BaseModel):
+    def fit_predict(self, index: int | None = None, **kwargs):
+        return self._dataset.dataobj[..., index]
+
+
+class RecordingBackend(RegistrationBackend):
+    __slots__ = ("calls",)
+
+    def __init__(self):
+        self.calls = []
+
+    def register(self, fixed, moving, affine, index=0, fixedmask=None, init_affine=None):
+        self.calls.append(index)
+        return np.eye(4)
+
+
+def test_factory():
+    assert isinstance(RegistrationFactory.init(), ants.ANTsBackend)
+    assert isinstance(RegistrationFactory.init("ANTs", clip="none"), ants.ANTsBackend)
+
+    with pytest.raises(
+        NotImplementedError,
+        match=re.escape(UNSUPPORTED_BACKEND_ERROR_MSG.format(backend="elastix")),
+    ):
+        RegistrationFactory.init("elastix")
+
+
+def test_ants_backend(request, tmp_path, monkeypatch):
+    rng = request.node.rng
+    recorded = []
+
+    class DummyXForm:
+        matrix = np.diag([1.0, 2.0, 3.0, 1.0])
+
+    def fake_registration(fixed_path, moving_path, vol_idx, dirname, **kwargs):
+        recorded.append((fixed_path, moving_path, vol_idx, kwargs))
+        return DummyXForm()
+
+    monkeypatch.setattr(ants, "_run_registration", fake_registration)
+
+    backend = ants.ANTsBackend(workdir=tmp_path, clip="none", num_threads=2)
+    mask = rng.random((5, 5, 5)) > 0.5
+    for index in (1, 4):
+        matrix = backend.register(
+            rng.random((5, 5, 5)), rng.random((5, 5, 5)), np.eye(4), index=index, fixedmask=mask
+        )
+        assert np.allclose(matrix, DummyXForm.matrix)
+
+    assert [r[2] for r in recorded] == [1, 4]
+    assert recorded[0][0].name == "predicted_00001.nii.gz"
+    assert recorded[0][1].name == "sample_00001.nii.gz"
+    assert recorded[0][3]["num_threads"] == 2
+
+    # The mask is written only once
+    assert recorded[0][3]["fixedmask_path"] == recorded[1][3]["fixedmask_path"]
+    assert len(list(tmp_path.glob("mask-*.nii.gz"))) == 1
+
+
+def test_ants_backend_workdir(request, monkeypatch):
+    """Without a ``workdir``, the backend owns a temporary one, shared with its copies."""
+    rng = request.node.rng
+    monkeypatch.setattr(ants, "_run_registration", lambda *a, **k: ants.Affine())
+
+    backend = ants.ANTsBackend(clip="none")
+    workdir = backend._workdir
+    assert workdir.is_dir()
+
+    backend.register(rng.random((5, 5, 5)), rng.random((5, 5, 5)), np.eye(4), index=1)
+    assert (workdir / "predicted_00001.nii.gz").exists()
+
+    copied = pickle.loads(pickle.dumps(backend))
+    assert copied._workdir == workdir
+    copied.cleanup()
+    assert workdir.is_dir()
+
+    backend.cleanup()
+    assert not workdir.exists()
+
+    backend = ants.ANTsBackend(clip="none")
+    workdir = backend._workdir
+    del backend
+    gc.collect()
+    assert not workdir.exists()
+
+
+def test_aregister_default(request):
+    backend = RecordingBackend()
+    data = request.node.rng.random((5, 5, 5))
+    matrix = asyncio.run(backend.aregister(data, data, np.eye(4), index=3))
+    assert np.allclose(matrix, np.eye(4))
+    assert backend.calls == [3]
+
+
+@pytest.fixture
+def fake_ants(tmp_path, monkeypatch):
+    """Put an ``antsRegistration`` executable on the path, whose behavior is set by $FAKE_ANTS."""
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    script = bindir / "antsRegistration"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import os, shutil, sys, time\n"
+        "if '--version' in sys.argv:\n"
+        "    sys.exit(print('ANTs Version: 2.5.0'))\n"
+        "mode = os.environ['FAKE_ANTS']\n"
+        "if mode == 'hang':\n"
+        "    open(os.environ['FAKE_ANTS_PID'], 'w').write(str(os.getpid()))\n"
+        "    time.sleep(60)\n"
+        "if mode == 'fail':\n"
+        "    sys.exit(3)\n"
+        "prefix = sys.argv[sys.argv.index('--output') + 1]\n"
+        "shutil.copy(mode, prefix + '0GenericAffine.mat')\n"
+    )
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    return monkeypatch
+
+
+def test_ants_aregister(request, tmp_path, fake_ants):
+    from nitransforms.io.itk import ITKLinearTransform
+
+    rng = request.node.rng
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    backend = ants.ANTsBackend(workdir=workdir, clip="none", num_threads=2)
+    args = (rng.random((5, 5, 5)), rng.random((5, 5, 5)), np.eye(4))
+
+    expected = np.eye(4)
+    expected[0, 3] = 2.0
+    ITKLinearTransform.from_ras(expected).to_filename(tmp_path / "xfm.mat")
+    fake_ants.setenv("FAKE_ANTS", str(tmp_path / "xfm.mat"))
+    assert np.allclose(asyncio.run(backend.aregister(*args, index=1)), expected)
+    assert (workdir / "cmd-00001.sh").exists()
+
+    fake_ants.setenv("FAKE_ANTS", "fail")
+    with pytest.raises(RuntimeError, match="exit code 3"):
+        asyncio.run(backend.aregister(*args, index=2))
+
+    # Cancelling the coroutine kills ANTs
+    fake_ants.setenv("FAKE_ANTS", "hang")
+    fake_ants.setenv("FAKE_ANTS_PID", str(tmp_path / "pid"))
+
+    async def _cancel():
+        task = asyncio.create_task(backend.aregister(*args, index=3))
+        while not (tmp_path / "pid").exists():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(asyncio.wait_for(_cancel(), timeout=30))
+    pid = int((tmp_path / "pid").read_text())
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+
+@pytest.mark.parametrize("from_config", [False, True])
+def test_estimator_backend(request, from_config):
+    dataset = BaseDataset(
+        dataobj=request.node.rng.random((5, 5, 5, 4)),
+        affine=np.eye(4),
+        brainmask=np.ones((5, 5, 5), dtype=bool),
+    )
+    backend = RecordingBackend()
+    run_kwargs = {"align_kwargs": {"backend": backend}} if from_config else {"backend": backend}
+
+    Estimator(DummyModel(dataset), strategy="linear").run(dataset, **run_kwargs)
+
+    assert backend.calls == [0, 1, 2, 3]
+    assert dataset.motion_affines.shape == (4, 4, 4)
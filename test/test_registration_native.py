@@ -0,0 +1,134 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Unit tests exercising the native registration engine."""
+
+import re
+
+import numpy as np
+import pytest
+from nibabel.affines import from_matvec
+from nibabel.eulerangles import euler2mat
+from scipy.ndimage import gaussian_filter, map_coordinates
+
+from nifreeze.registration import native
+from nifreeze.registration.base import RegistrationFactory
+from nifreeze.registration.native import (
+    UNSUPPORTED_METRIC_ERROR_MSG,
+    NativeBackend,
+    _Parametrization,
+    register,
+)
+
+SHAPE = (36, 36, 28)
+
+
+@pytest.fixture
+def pair(request):
+    """A smooth random volume and a copy moved by a known rigid transform."""
+    rng = request.node.rng
+    fixed = gaussian_filter(rng.random(SHAPE), 3)
+    fixed = (fixed - fixed.min()) / np.ptp(fixed)
+    affine = np.diag([2.0, 2.0, 2.5, 1.0])
+    affine[:3, 3] = -0.5 * np.array(SHAPE) * np.diag(affine)[:3]
+
+    matrix = from_matvec(euler2mat(0.04, -0.03, 0.05), [1.5, -1.0, 0.8])
+    ijk = np.vstack((np.indices(SHAPE).reshape(3, -1), np.ones((1, fixed.size))))
+    source = np.linalg.inv(affine) @ np.linalg.inv(matrix) @ affine @ ijk
+    moving = map_coordinates(fixed, source[:3], order=3, mode="nearest").reshape(SHAPE)
+    return fixed, moving, affine, matrix
+
+
+@pytest.mark.parametrize("kind", ["Translation", "Rigid", "Affine"])
+def test_parametrization_derivatives(request, kind):
+    parametrization = _Parametrization(kind, np.array([1.0, -2.0, 3.0]), 10.0)
+    theta = 0.3 * request.node.rng.normal(size=parametrization.size)
+    matrix, deriv = parametrization(theta)
+
+    assert np.allclose(parametrization(np.zeros_like(theta))[0], np.eye(4))
+    for k, step in enumerate(1e-6 * np.eye(parametrization.size)):
+        numeric = (parametrization(theta + step)[0] - parametrization(theta - step)[0]) / 2e-6
+        assert np.allclose(numeric, deriv[k], atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    ("settings", "overrides"),
+    [
+        ("dwi-to-dwi_level0", {}),
+        ("dwi-to-b0_level0", {"sampling_strategy": "Regular"}),
+        ("pet-to-pet_level1", {}),
+        ("b0-to-b0_level0", {"metric": "Mattes", "number_of_iterations": [50]}),
+    ],
+)
+def test_register(pair, settings, overrides):
+    fixed, moving, affine, matrix = pair
+    estimated = register(
+        fixed, moving, affine, settings=settings, rng=np.random.default_rng(0), **overrides
+    )
+    assert np.abs(estimated[:3, :3] - matrix[:3, :3]).max() < 5e-3
+    assert np.abs(estimated[:3, 3] - matrix[:3, 3]).max() < 0.25
+
+
+def test_register_mask_and_init(pair):
+    fixed, moving, affine, matrix = pair
+    mask = np.zeros(SHAPE, dtype=bool)
+    mask[6:-6, 6:-6, 4:-4] = True
+
+    # Starting from the solution, iterations should not drift away
+    estimated = register(
+        fixed,
+        moving,
+        affine,
+        fixedmask=mask,
+        init_affine=matrix,
+        settings="dwi-to-dwi_level0",
+        rng=np.random.default_rng(0),
+    )
+    assert np.abs(estimated - matrix).max() < 0.05
+
+
+def test_unsupported_metric(pair):
+    fixed, moving, affine, _ = pair
+    with pytest.raises(
+        NotImplementedError, match=re.escape(UNSUPPORTED_METRIC_ERROR_MSG.format(metric="CC"))
+    ):
+        register(fixed, moving, affine, metric="CC")
+
+
+def test_native_backend(pair, monkeypatch):
+    fixed, moving, affine, matrix = pair
+    backend = RegistrationFactory.init(
+        "native", workdir="/not/used", clip="none", seed=1234, num_threads=4
+    )
+    assert isinstance(backend, NativeBackend)
+
+    calls = []
+    monkeypatch.setattr(native, "register", lambda *args, **kwargs: calls.append(kwargs))
+    backend.register(fixed[..., None], moving, affine, index=3)
+    assert calls[0]["settings"] == native.DEFAULT_SETTINGS
+    assert set(calls[0]) == {"fixedmask", "init_affine", "settings", "rng"}
+
+    monkeypatch.undo()
+    estimated = NativeBackend(ants_config="dwi-to-dwi_level0.json", seed=1234).register(
+        fixed, moving, affine, index=3
+    )
+    assert np.abs(estimated[:3, 3] - matrix[:3, 3]).max() < 0.2
@@ -24,9 +24,11 @@
 import os
 from pathlib import Path
 
+import numpy as np
 import pytest
 
 import nifreeze.cli.run as cli_run
+from nifreeze.data.base import BaseDataset
 
 
 @pytest.mark.parametrize(
@@ -86,3 +88,29 @@ def test_run_call(tmp_path, monkeypatch, write_hdf5):
         out_h5_filename = Path(Path(input_file).name).stem + ".h5"
         out_h5_path: Path = Path(tmp_path) / out_h5_filename
         assert out_h5_path.is_file()
+
+
+@pytest.mark.parametrize("checkpoint", [False, True])
+@pytest.mark.filterwarnings("ignore:no motion affines were found")
+def test_run_checkpoint(request, tmp_path, monkeypatch, checkpoint):
+    """Test that the CLI only keeps a checkpoint of the data when requested."""
+    input_file = tmp_path / "data.h5"
+    BaseDataset(
+        dataobj=request.node.rng.random((4, 4, 4, 5)).astype("float32"),
+        affine=np.eye(4),
+    ).to_filename(input_file)
+    called = {}
+
+    def smoke_estimator_run(self, dataset, **kwargs):
+        called["filename"] = dataset.get_filename()
+        called["checkpoint"] = kwargs["checkpoint"]
+
+    monkeypatch.setattr(cli_run.Estimator, "run", smoke_estimator_run)
+
+    argv = [str(input_file), "--output-dir", str(tmp_path)]
+    cli_run.main(argv + (["--checkpoint"] if checkpoint else []))
+
+    assert called["checkpoint"] is checkpoint
+    assert (called["filename"] == tmp_path / "data_checkpoint.h5") is checkpoint
+    assert (tmp_path / "data.nii.gz").is_file()
+    assert not list(tmp_path.glob("*checkpoint*"))
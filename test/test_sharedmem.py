@@ -0,0 +1,74 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+
+import pickle
+
+import numpy as np
+
+from nifreeze.utils.sharedmem import SharedArray, share_dataset
+
+
+class DummyDataset:
+    def __init__(self, rng):
+        self.dataobj = rng.random((4, 4, 4, 5)).astype("float32")
+        self.brainmask = np.ones((4, 4, 4), dtype=bool)
+        self.affine = np.eye(4)
+
+
+def test_shared_array_pickles_by_reference(request):
+    data = request.node.rng.random((10, 10, 10))
+    arr = SharedArray.from_array(data)
+
+    payload = pickle.dumps(arr)
+    assert len(payload) < data.nbytes // 10
+
+    clone = pickle.loads(payload)
+    assert np.array_equal(clone, data)
+    clone[0, 0, 0] = -1.0
+    assert arr[0, 0, 0] == -1.0
+
+    # Views are pickled by value
+    view = pickle.loads(pickle.dumps(arr[1:3]))
+    assert np.array_equal(view, data[1:3])
+
+    del clone
+    arr.release()
+
+
+def test_share_dataset(request):
+    dataset = DummyDataset(request.node.rng)
+    dataobj, brainmask, affine = dataset.dataobj, dataset.brainmask, dataset.affine
+
+    with share_dataset(dataset) as shared:
+        assert shared is dataset
+        assert isinstance(dataset.dataobj, SharedArray)
+        assert isinstance(dataset.brainmask, SharedArray)
+        assert dataset.affine is affine
+        assert np.array_equal(dataset.dataobj, dataobj)
+
+        restored = pickle.loads(pickle.dumps(dataset))
+        assert np.array_equal(restored.dataobj, dataobj)
+        del restored
+
+    assert dataset.dataobj is dataobj
+    assert dataset.brainmask is brainmask
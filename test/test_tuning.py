@@ -0,0 +1,231 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+#
+# Copyright The NiPreps Developers <nipreps@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We support and encourage derived works from this project, please read
+# about our expectations at
+#
+#     https://www.nipreps.org/community/licensing/
+#
+"""Unit tests exercising the planning of parallel execution."""
+
+import numpy as np
+import pytest
+
+from nifreeze.data.base import BaseDataset
+from nifreeze.estimator import Estimator
+from nifreeze.model.base import BaseModel
+from nifreeze.registration.base import RegistrationBackend
+from nifreeze.utils import tuning
+
+
+class DTIModel:
+    pass
+
+
+class GPModel:
+    pass
+
+
+class RecordingModel(BaseModel):
+    __slots__ = ("calls",)
+
+    def __init__(self, dataset, **kwargs):
+        super().__init__(dataset, **kwargs)
+        self.calls = []
+
+    def fit_predict(self, index: int | None = None, **kwargs):
+        self.calls.append((index, kwargs))
+        return self._dataset.dataobj[..., index]
+
+
+class IdentityBackend(RegistrationBackend):
+    def register(self, fixed, moving, affine, index=0, fixedmask=None, init_affine=None):
+        return np.eye(4)
+
+
+@pytest.mark.parametrize(
+    ("model", "num_voxels", "memory", "concurrency", "expected"),
+    [
+        (DTIModel(), 5000, 16 * 2**30, 1, 1),  # Too small to split
+        (DTIModel(), 100000, 16 * 2**30, 1, 5),  # Limited by voxels
+        (DTIModel(), 1000000, 16 * 2**30, 1, 16),  # Limited by cores
+        (DTIModel(), 1000000, 2 * 2**30, 1, 3),  # Limited by memory
+        (DTIModel(), 1000000, 16 * 2**30, 4, 4),  # Cores shared among volumes
+        (GPModel(), 1000000, 16 * 2**30, 1, 1),  # Serial fit
+        (object(), 1000000, 16 * 2**30, 1, 1),  # Unknown model
+    ],
+)
+def test_plan_execution(model, num_voxels, memory, concurrency, expected):
+    plan = tuning.plan_execution(
+        model, num_voxels, 60, cpus=16, memory=memory, concurrency=concurrency
+    )
+    assert plan.n_jobs == expected
+    assert plan.omp_nthreads == 16 // concurrency
+    assert 1 <= plan.chunk_size <= -(-num_voxels // plan.n_jobs)
+    assert type(model).__name__ in plan.reason
+
+
+def test_plan_execution_overrides():
+    plan = tuning.plan_execution(
+        DTIModel(), 1000000, 60, cpus=16, n_jobs=3, omp_nthreads=2, chunk_size=100
+    )
+    assert (plan.n_jobs, plan.omp_nthreads, plan.chunk_size) == (3, 2, 100)
+
+    # Registration workers share the cores
+    assert tuning.plan_execution(DTIModel(), 1000, 60, cpus=16, reg_workers=4).omp_nthreads == 4
+
+
+def test_available_memory(tmp_path, monkeypatch):
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text(
+        "MemTotal:       16384000 kB\nMemFree:         1024000 kB\nMemAvailable:    8192000 kB\n"
+    )
+    monkeypatch.setattr(tuning, "MEMINFO_PATH", meminfo)
+    assert tuning.available_memory() == 8192000 * 1024
+
+    # Older kernels (or other platforms) fall back to the free memory
+    meminfo.write_text("MemTotal:       16384000 kB\nMemFree:         1024000 kB\n")
+    monkeypatch.setattr(tuning.os, "sysconf", {"SC_PAGE_SIZE": 4096, "SC_AVPHYS_PAGES": 10}.get)
+    assert tuning.available_memory() == 40960
+
+    monkeypatch.setattr(tuning, "MEMINFO_PATH", tmp_path / "missing")
+    assert tuning.available_memory() == 40960
+
+
+def test_calibrate():
+    plan = tuning.ExecutionPlan(n_jobs=4, omp_nthreads=4, chunk_size=1000, reason="test")
+    timings = {1: 0.5, 4: 0.1}
+    calls = []
+
+    def _run(n_jobs):
+        calls.append(n_jobs)
+
+    clock = iter([0.0, timings[1], 0.0, timings[4]])
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(tuning, "timer", lambda: next(clock))
+        calibrated = tuning.calibrate(plan, _run)
+
+    assert calls == [1, 4]
+    assert calibrated.n_jobs == 4
+    assert "calibrated" in calibrated.reason
+
+    # Nothing to compare
+    assert tuning.calibrate(tuning.ExecutionPlan(1, 1, 1), _run).n_jobs == 1
+    assert calls == [1, 4]
+
+
+@pytest.mark.parametrize(("n_jobs", "calibrate"), [(None, False), (2, False), (None, True)])
+def test_estimator_plan(request, monkeypatch, n_jobs, calibrate):
+    dataset = BaseDataset(
+        dataobj=request.node.rng.random((5, 5, 5, 4)),
+        affine=np.eye(4),
+        brainmask=np.ones((5, 5, 5), dtype=bool),
+    )
+    model = RecordingModel(dataset)
+    monkeypatch.setattr(tuning, "available_cpus", lambda: 4)
+
+    Estimator(model, strategy="linear").run(
+        dataset, backend=IdentityBackend(), n_jobs=n_jobs, calibrate=calibrate
+    )
+
+    # Small datasets are fitted serially unless requested otherwise
+    assert [index for index, _ in model.calls] == [0, 1, 2, 3]
+    assert all(kwargs["n_jobs"] == (n_jobs or 1) for _, kwargs in model.calls)
+    assert all(kwargs["omp_nthreads"] == 4 for _, kwargs in model.calls)
+
+
+def test_estimator_calibrate(request, monkeypatch):
+    dataset = BaseDataset(
+        dataobj=request.node.rng.random((5, 5, 5, 4)),
+        affine=np.eye(4),
+        brainmask=np.ones((5, 5, 5), dtype=bool),
+    )
+    model = RecordingModel(dataset)
+    monkeypatch.setitem(
+        tuning.MODEL_COSTS, "RecordingModel", tuning.ModelCost(parallel=True, min_voxels=1)
+    )
+    monkeypatch.setattr(tuning, "available_cpus", lambda: 4)
+
+    Estimator(model, strategy="linear").run(dataset, backend=IdentityBackend(), calibrate=True)
+
+    # Every candidate is timed on a copy of the model, which is left untouched
+    assert [index for index, _ in model.calls] == [0, 1, 2, 3]
+    assert model._dataset is dataset
+
+
+def test_estimate_memory():
+    estimate = tuning.estimate_memory(DTIModel(), 100000, 60)
+    assert estimate > 2 * 100000 * 60 * 8
+
+    # Parallel workers, larger chunks, double precision and concurrent volumes cost more
+    assert tuning.estimate_memory(DTIModel(), 100000, 60, n_jobs=4) > estimate
+    assert tuning.estimate_memory(DTIModel(), 100000, 60, chunk_size=1000) < estimate
+    assert tuning.estimate_memory(DTIModel(), 100000, 60, dtype="float32") < estimate
+    assert tuning.estimate_memory(DTIModel(), 100000, 60, concurrency=2) > estimate
+    assert tuning.estimate_memory(DTIModel(), 100000, 60, base=2**20) > estimate + 2**20
+
+
+def test_plan_execution_max_memory():
+    plan = tuning.plan_execution(DTIModel(), 1000000, 60, cpus=16, memory=64 * 2**30)
+    assert plan.n_jobs == 16
+    assert plan.dtype is None
+
+    budget = 2**29
+    plan = tuning.plan_execution(DTIModel(), 1000000, 60, cpus=16, max_memory=budget)
+    assert plan.memory <= budget
+    assert plan.n_jobs < 16
+    assert plan.dtype == "float32"
+    assert plan.as_kwargs()["dtype"] == "float32"
+
+    # GP fits all voxels at once, in double precision: nothing to trade
+    with pytest.raises(MemoryError, match="GPModel needs an estimated"):
+        tuning.plan_execution(GPModel(), 1000000, 60, cpus=16, max_memory=budget)
+
+
+def test_estimator_max_memory(request):
+    dataset = BaseDataset(
+        dataobj=request.node.rng.random((5, 5, 5, 4)),
+        affine=np.eye(4),
+        brainmask=np.ones((5, 5, 5), dtype=bool),
+    )
+    first = RecordingModel(dataset)
+    estimator = Estimator(
+        RecordingModel(dataset), prev=Estimator(first, max_memory=1e-6), strategy="linear"
+    )
+
+    # The budget of any stage is checked before the cascade starts
+    with pytest.raises(MemoryError, match="exceeds the memory budget"):
+        estimator.run(dataset, backend=IdentityBackend())
+    assert first.calls == []
+
+    Estimator(first, strategy="linear", max_memory=1.0).run(dataset, backend=IdentityBackend())
+    assert len(first.calls) == 4
+
+
+@pytest.mark.parametrize(
+    ("name", "model_class"), (("gp", "GPModel"), ("DTI", "DTIModel"), ("avg", "ExpectationModel"))
+)
+def test_estimator_max_memory_model_name(request, name, model_class):
+    dataset = BaseDataset(
+        dataobj=request.node.rng.random((5, 5, 5, 4)),
+        affine=np.eye(4),
+        brainmask=np.ones((5, 5, 5), dtype=bool),
+    )
+
+    # Models given by name are costed as the class the factory would instantiate
+    with pytest.raises(MemoryError, match=f"^{model_class} needs an estimated"):
+        Estimator(name, strategy="linear", max_memory=1e-6).run(dataset, backend=IdentityBackend())